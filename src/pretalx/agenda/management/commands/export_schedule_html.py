@@ -1,28 +1,110 @@
+import hashlib
+import json
 import os.path
-from shutil import make_archive
+import shutil
+import time
+from contextlib import contextmanager, suppress
+from multiprocessing import Pool
 
 from bakery.management.commands.build import Command as BakeryBuildCommand
 from django.conf import settings
 from django.core.management.base import CommandError
+from django.db import connections
 from django.test import override_settings
 from django.urls import get_callable
 from django.utils import translation
-from django.utils.timezone import override as override_timezone
+from django.utils.timezone import now, override as override_timezone
+from whitenoise.compress import Compressor
 
+from pretalx.agenda.views.htmlexport import ExportManifest
+from pretalx.common.archive import ZipArchive
 from pretalx.event.models import Event
 
 
+def _file_hash(path):
+    checksum = hashlib.sha1()
+    with open(path, 'rb') as content:
+        for chunk in iter(lambda: content.read(65536), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def build_objects(
+    view_str, event_id, object_ids, manifest, overrides, timezone, language
+):
+    """Build the pages of some objects of an export view. This runs in the
+    worker processes of ``export_schedule_html --jobs``, and returns the
+    fingerprints of the pages it built."""
+    event = Event.objects.get(pk=event_id)
+    with override_settings(**overrides), override_timezone(timezone):
+        with translation.override(language):
+            view = get_callable(view_str)(_exporting_event=event, _manifest=manifest)
+            for obj in view.get_queryset().filter(pk__in=object_ids):
+                view.build_object(obj)
+    return manifest.pages
+
+
+class ExportStatus:
+    """The state of the latest HTML export of an event, as shown on the
+    organiser export page: whether it is running, which phase it is in, how
+    long each phase took, and how many views have been built.
+
+    Only the export holding the event's export lock writes the status."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+
+    @classmethod
+    def load(cls, path):
+        status = cls(path)
+        with suppress(FileNotFoundError, ValueError):
+            with open(path) as content:
+                status.data = json.load(content)
+        return status
+
+    def update(self, **values):
+        self.data.update(values)
+        with open(self.path + '.tmp', 'w') as content:
+            json.dump(self.data, content)
+        os.replace(self.path + '.tmp', self.path)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        self.update(phase=name)
+        yield
+        phases = self.data.get('phases', []) + [[name, time.monotonic() - start]]
+        self.update(phase=None, phases=phases)
+
+
 class Command(BakeryBuildCommand):
     help = 'Exports event schedule as a static HTML dump'
 
     def __init__(self, *args, **kwargs):
         self._exporting_event = None
+        self._manifest = None
+        self._overrides = {}
+        self.status = None
+        self.jobs = 1
+        self.timings = []
         super().__init__(*args, **kwargs)
 
     def add_arguments(self, parser):
         super().add_arguments(parser)
         parser.add_argument('event', type=str)
         parser.add_argument('--zip', action='store_true')
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only rebuild pages whose content has changed since the last export.',
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='Build talk and speaker pages in this many processes.',
+        )
 
     @classmethod
     def get_output_dir(cls, event):
@@ -34,12 +116,75 @@ class Command(BakeryBuildCommand):
     def get_output_zip_path(cls, event):
         return cls.get_output_dir(event) + '.zip'
 
+    @classmethod
+    def get_manifest_path(cls, event):
+        return cls.get_output_dir(event) + '.manifest.json'
+
+    @classmethod
+    def get_status_path(cls, event):
+        return cls.get_output_dir(event) + '.status.json'
+
+    @classmethod
+    def get_lock_path(cls, event):
+        return cls.get_output_dir(event) + '.lock'
+
+    @classmethod
+    def get_pending_path(cls, event):
+        """While this file exists, an export of the event has been requested
+        but not started yet."""
+        return cls.get_output_dir(event) + '.pending'
+
+    def build_static(self, *args, **options):
+        with self.status.phase('static'):
+            super().build_static(*args, **options)
+
     def build_media(self):
-        output_dir = self.get_output_dir(self._exporting_event)
-        os.makedirs(
-            os.path.join(output_dir, 'media', self._exporting_event.slug), exist_ok=True
-        )
-        return super().build_media()
+        """Mirror the event's media files into the export.
+
+        Files are hard linked instead of copied where possible. Files that
+        are unchanged since the last export are left alone, and files that
+        have been removed from the event are removed from the export."""
+        with self.status.phase('media'):
+            self.link_media()
+
+    def link_media(self):
+        target_dir = os.path.join(self.build_dir, settings.MEDIA_URL.lstrip('/'))
+        os.makedirs(target_dir, exist_ok=True)
+        file_names = set()
+        for path, _, names in os.walk(self.media_root):
+            for name in names:
+                source = os.path.join(path, name)
+                file_name = os.path.relpath(source, self.media_root)
+                file_names.add(file_name)
+                self.link_file(source, os.path.join(target_dir, file_name))
+        for path, _, names in os.walk(target_dir):
+            for name in names:
+                target = os.path.join(path, name)
+                file_name = os.path.relpath(target, target_dir)
+                original, extension = os.path.splitext(file_name)
+                if file_name not in file_names and not (
+                    extension in ('.gz', '.br') and original in file_names
+                ):
+                    os.remove(target)
+
+    @staticmethod
+    def link_file(source, target):
+        if os.path.exists(target):
+            if os.path.samefile(source, target):
+                return
+            source_stat, target_stat = os.stat(source), os.stat(target)
+            if source_stat.st_size == target_stat.st_size:
+                if source_stat.st_mtime == target_stat.st_mtime:
+                    return
+                if _file_hash(source) == _file_hash(target):
+                    shutil.copystat(source, target)
+                    return
+            os.remove(target)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:  # The media directory is on another file system
+            shutil.copy2(source, target)
 
     def handle(self, *args, **options):
         event_slug = options.get('event')
@@ -49,29 +194,143 @@ class Command(BakeryBuildCommand):
             raise CommandError(f'Could not find event with slug "{event_slug}".')
 
         self._exporting_event = event
+        self.jobs = max(options.get('jobs') or 1, 1)
         translation.activate(event.locale)
 
         output_dir = self.get_output_dir(event)
-        with override_settings(
+        self.status = ExportStatus(self.get_status_path(event))
+        self.status.update(
+            state='running',
+            started=now().isoformat(),
+            finished=None,
+            phase=None,
+            phases=[],
+            progress=[0, 0],
+            error=None,
+        )
+        try:
+            self.export(event, output_dir, *args, **options)
+        except Exception as e:
+            self.status.update(state='failed', finished=now().isoformat(), error=str(e))
+            raise
+        self.status.update(state='finished', finished=now().isoformat())
+        if self.verbosity > 1:
+            for view_str, duration in self.timings:
+                self.stdout.write(f'{view_str}: {duration:.2f} seconds')
+            for phase, duration in self.status.data['phases']:
+                self.stdout.write(f'{phase}: {duration:.2f} seconds')
+        if options.get('zip', False):
+            output_dir += '.zip'
+        self.stdout.write(output_dir)
+
+    def export(self, event, output_dir, *args, **options):
+        event_slug = options.get('event')
+        self._manifest = ExportManifest(
+            self.get_manifest_path(event),
+            event=event,
+            incremental=options.get('incremental', False),
+        )
+        if self._manifest.previous:
+            options['keep_build_dir'] = True
+        self._overrides = dict(
             COMPRESS_ENABLED=True,
             COMPRESS_OFFLINE=True,
             BUILD_DIR=output_dir,
             MEDIA_URL=os.path.join(settings.MEDIA_URL, event_slug),
             MEDIA_ROOT=os.path.join(settings.MEDIA_ROOT, event_slug),
-        ):
+        )
+        with override_settings(**self._overrides):
             with override_timezone(event.timezone):
                 super().handle(*args, **options)
+                with self.status.phase('compress'):
+                    self.compress_files(output_dir)
                 if options.get('zip', False):
-                    make_archive(
-                        base_name=output_dir,
-                        format='zip',
-                        root_dir=settings.HTMLEXPORT_ROOT,
-                        base_dir=event.slug,
-                    )
-                    output_dir += '.zip'
-        self.stdout.write(output_dir)
+                    with self.status.phase('zip'):
+                        self.make_zip(output_dir, self.get_output_zip_path(event))
+
+    @staticmethod
+    def compress_files(output_dir):
+        """Place gzip and brotli compressed siblings next to all files, so
+        that web servers can serve them without compressing each time.
+
+        Files that have not changed since they were last compressed are
+        skipped."""
+        compressor = Compressor(
+            extensions=Compressor.SKIP_COMPRESS_EXTENSIONS + ('br',), quiet=True
+        )
+        for path, _, file_names in os.walk(output_dir):
+            for file_name in file_names:
+                file_path = os.path.join(path, file_name)
+                if compressor.should_compress(file_name) and not (
+                    os.path.exists(file_path + '.gz')
+                    and os.path.getmtime(file_path + '.gz')
+                    >= os.path.getmtime(file_path)
+                ):
+                    compressor.compress(file_path)
+
+    @staticmethod
+    def make_zip(output_dir, zip_path):
+        """Pack the export into a zip file, unless nothing has changed since
+        the zip file was made. Pages are added with the data of their gzip
+        compressed siblings, so nothing is compressed again, and the
+        unchanged entries at the start of the previous zip file are kept
+        as they are: only the entries from the first changed file on are
+        written again."""
+        last_change = 0
+        for path, _, file_names in os.walk(output_dir):
+            last_change = max(last_change, os.path.getmtime(path))
+            for file_name in file_names:
+                file_path = os.path.join(path, file_name)
+                last_change = max(last_change, os.path.getmtime(file_path))
+        if os.path.exists(zip_path) and os.path.getmtime(zip_path) > last_change:
+            return
+        ZipArchive(
+            os.path.dirname(output_dir), os.path.basename(output_dir)
+        ).write(zip_path)
 
     def build_views(self):
-        for view_str in self.view_list:
-            view = get_callable(view_str)
-            view(_exporting_event=self._exporting_event).build_method()
+        with self.status.phase('views'):
+            self.build_all_views()
+
+    def build_all_views(self):
+        self.timings = []
+        self.status.update(progress=[0, len(self.view_list)])
+        for index, view_str in enumerate(self.view_list):
+            start = time.monotonic()
+            view = get_callable(view_str)(
+                _exporting_event=self._exporting_event, _manifest=self._manifest
+            )
+            if self.jobs > 1 and view.build_in_parallel:
+                self.build_view_in_parallel(view_str, view)
+            else:
+                view.build_method()
+            self.timings.append((view_str, time.monotonic() - start))
+            self.status.update(progress=[index + 1, len(self.view_list)])
+        self._manifest.remove_stale()
+        self._manifest.save()
+
+    def build_view_in_parallel(self, view_str, view):
+        """Split the objects of a view between ``--jobs`` worker processes.
+
+        The database connections are closed beforehand, so that every worker
+        opens its own connection instead of sharing ours."""
+        object_ids = list(
+            view.get_queryset().prefetch_related(None).values_list('pk', flat=True)
+        )
+        tasks = [
+            (
+                view_str,
+                self._exporting_event.pk,
+                object_ids[index::self.jobs],
+                self._manifest,
+                self._overrides,
+                self._exporting_event.timezone,
+                translation.get_language(),
+            )
+            for index in range(self.jobs)
+            if object_ids[index::self.jobs]
+        ]
+        connections.close_all()
+        with Pool(self.jobs) as pool:
+            for pages in pool.starmap(build_objects, tasks):
+                self._manifest.pages.update(pages)
@@ -1,14 +1,37 @@
+import fcntl
 import logging
+import os
+from contextlib import suppress
+
+from django.core.cache import cache
+from django.utils.translation import override
 
 from pretalx.celery_app import app
+from pretalx.common.exporter import compress_export, get_exporters
 from pretalx.event.models import Event
 
 LOGGER = logging.getLogger(__name__)
 
 
+def request_export_schedule_html(event):
+    """Queue an HTML export of the event.
+
+    Requests that come in while an export of the event is queued or running
+    are collapsed: the export task runs again once for all of them, instead
+    of once per request."""
+    from pretalx.agenda.management.commands.export_schedule_html import Command
+
+    with open(Command.get_pending_path(event), 'w'):
+        pass
+    export_schedule_html.apply_async(kwargs={'event_id': event.id, 'coalesce': True})
+
+
 @app.task()
-def export_schedule_html(*, event_id: int, make_zip=True):
+def export_schedule_html(
+    *, event_id: int, make_zip=False, incremental=True, coalesce=False
+):
     from django.core.management import call_command
+    from pretalx.agenda.management.commands.export_schedule_html import Command
 
     event = Event.objects.filter(pk=event_id).first()
     if not event:
@@ -21,4 +44,70 @@ def export_schedule_html(*, event_id: int, make_zip=True):
     cmd = ['export_schedule_html', event.slug]
     if make_zip:
         cmd.append('--zip')
-    call_command(*cmd)
+    if incremental:
+        cmd.append('--incremental')
+    pending_path = Command.get_pending_path(event)
+    # Only one export per event may run at a time, as they write to the same
+    # directory. Requested exports that find the lock taken leave it to the
+    # running export to start over once it is done.
+    with open(Command.get_lock_path(event), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | (fcntl.LOCK_NB if coalesce else 0))
+        except BlockingIOError:
+            return
+        if coalesce and not os.path.exists(pending_path):
+            return  # An export started after this one was requested
+        while True:
+            with suppress(FileNotFoundError):
+                os.remove(pending_path)
+            call_command(*cmd)
+            if not os.path.exists(pending_path):
+                break
+    # Requests that came in after the last check, but found the lock still
+    # taken, rely on us to run their export.
+    if os.path.exists(pending_path):
+        export_schedule_html.apply_async(kwargs={'event_id': event_id, 'coalesce': True})
+
+
+def get_public_exporters(event):
+    """Return all public exporters of the event, set up to export its current
+    schedule as it is shown to visitors."""
+    exporters = [
+        exporter(event) for exporter in get_exporters(event).values()
+    ]
+    for exporter in exporters:
+        exporter.schedule = event.current_schedule
+    return [exporter for exporter in exporters if exporter.public]
+
+
+@app.task()
+def prerender_exports(*, event_id: int):
+    event = Event.objects.filter(pk=event_id).first()
+    if not event:
+        LOGGER.error(f'In prerender_exports: Could not find Event ID {event_id}')
+        return
+    for exporter in get_public_exporters(event):
+        for locale in event.locales:
+            render_export.apply_async(
+                kwargs={
+                    'event_id': event_id,
+                    'identifier': exporter.identifier,
+                    'locale': locale,
+                }
+            )
+
+
+@app.task()
+def render_export(*, event_id: int, identifier: str, locale: str):
+    event = Event.objects.filter(pk=event_id).first()
+    if not event:
+        LOGGER.error(f'In render_export: Could not find Event ID {event_id}')
+        return
+    for exporter in get_public_exporters(event):
+        if exporter.identifier == identifier:
+            with override(locale):
+                cache_key = exporter.cache_key
+                if cache.get(cache_key) is None:
+                    cache.set(cache_key, compress_export(*exporter.render()))
+            return
+    LOGGER.error(f'In render_export: Could not find exporter {identifier}')
@@ -1,21 +1,120 @@
+import hashlib
+import json
 import os
+from collections import defaultdict
+from contextlib import suppress
 
 from bakery.views import BuildableDetailView
 from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import translation
 from django.utils.functional import cached_property
 
+from pretalx import __version__
 from pretalx.agenda.views.schedule import ExporterView, ScheduleView
 from pretalx.agenda.views.speaker import SpeakerView
 from pretalx.agenda.views.talk import SingleICalView, TalkView
-from pretalx.person.models import SpeakerProfile
+from pretalx.person.models import SpeakerProfile, User
 from pretalx.schedule.models import Schedule
+from pretalx.submission.models import Answer, QuestionTarget, Resource
+
+SLOT_FIELDS = ('start', 'end', 'is_visible')
+USER_FIELDS = ('code', 'name', 'email', 'avatar', 'get_gravatar')
+
+
+def _values(instance, fields=None):
+    """Return the given field values of a model instance, or all of them."""
+    if instance is None:
+        return None
+    fields = fields or [field.attname for field in instance._meta.concrete_fields]
+    return [getattr(instance, field) for field in fields]
+
+
+def _hash(data):
+    content = json.dumps(
+        data,
+        default=lambda value: getattr(value, 'data', None) or str(value),
+        sort_keys=True,
+    )
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+class ExportManifest:
+    """Keeps track of a fingerprint of the input data of every page in an
+    HTML export, so that incremental exports only rebuild changed pages.
+
+    The fingerprints of the previous export are read from a JSON file, and
+    replaced with those of the current export by ``save``."""
+
+    def __init__(self, path, event, incremental=False):
+        self.path = path
+        self.base = _hash([
+            __version__,
+            _values(
+                event,
+                [
+                    field.attname
+                    for field in event._meta.concrete_fields
+                    if field.attname != 'export_version'  # Changes on every save
+                ],
+            ),
+            event.settings.freeze(),
+            translation.get_language(),
+        ])
+        self.previous = {}
+        if incremental:
+            with suppress(FileNotFoundError, ValueError):
+                with open(path) as manifest:
+                    self.previous = json.load(manifest)
+        self.pages = {}
+
+    def is_current(self, build_path, data):
+        """Record the data a page is built from, and return whether the page
+        was already built from the same data by the previous export."""
+        key = os.path.relpath(build_path, settings.BUILD_DIR)
+        fingerprint = self.pages[key] = (
+            None if data is None else _hash([self.base, data])
+        )
+        return (
+            fingerprint is not None
+            and self.previous.get(key) == fingerprint
+            and os.path.exists(build_path)
+        )
+
+    def remove_stale(self):
+        """Remove pages of the previous export that are no longer part of it,
+        like those of talks that have been removed from the schedule."""
+        for key in set(self.previous) - set(self.pages):
+            path = os.path.join(settings.BUILD_DIR, key)
+            for file_name in (path, path + '.gz', path + '.br'):
+                with suppress(FileNotFoundError):
+                    os.remove(file_name)
+
+    def save(self):
+        with open(self.path, 'w') as manifest:
+            json.dump(self.pages, manifest)
 
 
 class PretalxExportContextMixin:
-    def __init__(self, *args, _exporting_event=None, **kwargs):
+    build_in_parallel = False  # Whether pages can be built by multiple processes
+
+    def __init__(self, *args, _exporting_event=None, _manifest=None, **kwargs):
         self._exporting_event = _exporting_event
+        self._manifest = _manifest
         super().__init__(*args, **kwargs)
 
+    def build_object(self, obj):
+        if self._manifest is not None and self._manifest.is_current(
+            self.get_build_path(obj), self.get_fingerprint_data(obj)
+        ):
+            return
+        super().build_object(obj)
+
+    def get_fingerprint_data(self, obj):
+        """Return all data the page of ``obj`` is built from, apart from the
+        event and its settings, or ``None`` to build it on every export."""
+        return None
+
     def create_request(self, *args, **kwargs):
         request = super().create_request(*args, **kwargs)
         request.event = self._exporting_event
@@ -62,7 +161,7 @@ class ExportFrabXmlView(PretalxExportContextMixin, BuildableDetailView, Exporter
         return obj.event.urls.frab_xml
 
     def get_content(self):
-        return self.get(self.request, self._exporting_event).content
+        return self.get(self.request, self._exporting_event).getvalue()
 
     def get_build_path(self, obj):
         return self.get_file_build_path(obj)
@@ -75,7 +174,7 @@ class ExportFrabXCalView(PretalxExportContextMixin, BuildableDetailView, Exporte
         return obj.event.urls.frab_xcal
 
     def get_content(self):
-        return self.get(self.request, self._exporting_event).content
+        return self.get(self.request, self._exporting_event).getvalue()
 
     def get_build_path(self, obj):
         return self.get_file_build_path(obj)
@@ -101,7 +200,7 @@ class ExportICalView(PretalxExportContextMixin, BuildableDetailView, ExporterVie
         return obj.event.urls.ical
 
     def get_content(self):
-        return self.get(self.request, self._exporting_event).content
+        return self.get(self.request, self._exporting_event).getvalue()
 
     def get_build_path(self, obj):
         return self.get_file_build_path(obj)
@@ -114,25 +213,89 @@ class ExportScheduleVersionsView(
     queryset = Schedule.objects.filter(version__isnull=False)
 
 
-class ExportTalkView(PretalxExportContextMixin, BuildableDetailView, TalkView):
+class ExportTalkMixin:
+    build_in_parallel = True
+
     def get_queryset(self):
-        return self._exporting_event.submissions.filter(
-            pk__in=self._exporting_event.current_schedule.slots.all().values_list(
-                'pk', flat=True
+        schedule = self._exporting_event.current_schedule
+        return (
+            self._exporting_event.submissions.filter(
+                pk__in=schedule.slots.all().values_list('pk', flat=True)
+            )
+            .select_related('track', 'submission_type')
+            .prefetch_related(
+                Prefetch(
+                    'slots',
+                    queryset=schedule.talks.filter(is_visible=True)
+                    .select_related('room')
+                    .order_by('start', 'room'),
+                    to_attr='current_slots',
+                ),
+                Prefetch('speakers', queryset=User.objects.order_by('code')),
+                Prefetch(
+                    'answers',
+                    queryset=Answer.objects.filter(
+                        question__is_public=True,
+                        question__target=QuestionTarget.SUBMISSION,
+                    )
+                    .select_related('question')
+                    .order_by('pk'),
+                ),
+                Prefetch('resources', queryset=Resource.objects.order_by('pk')),
             )
         )
 
-
-class ExportTalkICalView(
-    PretalxExportContextMixin, BuildableDetailView, SingleICalView
-):
-    def get_queryset(self):
-        return self._exporting_event.submissions.filter(
-            pk__in=self._exporting_event.current_schedule.slots.all().values_list(
-                'pk', flat=True
+    @cached_property
+    def biographies(self):
+        return dict(
+            SpeakerProfile.objects.filter(event=self._exporting_event).values_list(
+                'user', 'biography'
             )
         )
 
+    @cached_property
+    def speaker_talks(self):
+        result = defaultdict(list)
+        talks = (
+            self._exporting_event.talks.values_list('speakers', 'code', 'title')
+            .order_by('code')
+            .distinct()
+        )
+        for speaker, *talk in talks:
+            result[speaker].append(talk)
+        return result
+
+    def get_fingerprint_data(self, obj):
+        return [
+            _values(obj),
+            _values(obj.track),
+            _values(obj.submission_type),
+            [
+                [_values(slot, SLOT_FIELDS), _values(slot.room)]
+                for slot in obj.current_slots
+            ],
+            [
+                [_values(speaker, USER_FIELDS), self.biographies.get(speaker.pk)]
+                + self.speaker_talks[speaker.pk]
+                for speaker in obj.speakers.all()
+            ],
+            [
+                [_values(answer), _values(answer.question)]
+                for answer in obj.answers.all()
+            ],
+            [_values(resource) for resource in obj.resources.all()],
+        ]
+
+
+class ExportTalkView(
+    ExportTalkMixin, PretalxExportContextMixin, BuildableDetailView, TalkView
+):
+    pass
+
+
+class ExportTalkICalView(
+    ExportTalkMixin, PretalxExportContextMixin, BuildableDetailView, SingleICalView
+):
     @staticmethod
     def get_url(obj):
         return obj.urls.ical
@@ -145,6 +308,51 @@ class ExportTalkICalView(
 
 
 class ExportSpeakerView(PretalxExportContextMixin, BuildableDetailView, SpeakerView):
+    build_in_parallel = True
     queryset = SpeakerProfile.objects.filter(
         user__submissions__slots__schedule__published__isnull=False
     ).distinct()
+
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .select_related('user')
+            .prefetch_related(
+                Prefetch(
+                    'user__answers',
+                    queryset=Answer.objects.filter(
+                        question__event=self._exporting_event,
+                        question__is_public=True,
+                        question__target=QuestionTarget.SPEAKER,
+                    )
+                    .select_related('question')
+                    .order_by('pk'),
+                )
+            )
+        )
+
+    @cached_property
+    def speaker_talks(self):
+        result = defaultdict(list)
+        talks = (
+            self._exporting_event.talks.values_list(
+                'speakers', 'code', 'title', 'abstract'
+            )
+            .order_by('code')
+            .distinct()
+        )
+        for speaker, *talk in talks:
+            result[speaker].append(talk)
+        return result
+
+    def get_fingerprint_data(self, obj):
+        return [
+            _values(obj),
+            _values(obj.user, USER_FIELDS),
+            [
+                [_values(answer), _values(answer.question)]
+                for answer in obj.user.answers.all()
+            ],
+            self.speaker_talks[obj.user_id],
+        ]
@@ -1,18 +1,29 @@
 import hashlib
+import logging
 from datetime import timedelta
+from itertools import chain
 from urllib.parse import unquote
 
 import pytz
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
 from django.http import (
-    Http404, HttpResponse, HttpResponseNotModified, HttpResponsePermanentRedirect,
+    Http404, HttpResponse, HttpResponseNotModified,
+    HttpResponsePermanentRedirect, StreamingHttpResponse,
 )
 from django.urls import resolve, reverse
+from django.utils.cache import patch_vary_headers
 from django.utils.functional import cached_property
 from django.utils.timezone import now
+from django.utils.translation import get_language
 from django.views.generic import TemplateView
 
+from pretalx.common.exporter import (
+    compress_export, get_accepted_encoding, get_exporters,
+)
 from pretalx.common.mixins.views import EventPermissionRequired
-from pretalx.common.signals import register_data_exporters
+
+logger = logging.getLogger(__name__)
 
 
 class ScheduleDataView(EventPermissionRequired, TemplateView):
@@ -76,15 +87,47 @@ class ExporterView(ScheduleDataView):
         else:
             exporter = url.url_name
 
-        exporter = exporter.lstrip('export.')
-        responses = register_data_exporters.send(request.event)
-        for _, response in responses:
-            ex = response(request.event)
-            if ex.identifier == exporter:
-                if ex.public or request.is_orga:
-                    return ex
+        exporter = get_exporters(request.event).get(exporter.lstrip('export.'))
+        if exporter:
+            exporter = exporter(request.event)
+            if exporter.public or request.is_orga:
+                return exporter
         return None
 
+    # Streamed exports are only cached up to this size, as they have to be
+    # kept in memory until the last chunk has been sent.
+    max_cached_stream_size = 5 * 1024 * 1024
+
+    def cache_chunks(self, cache_key, file_name, file_type, chunks):
+        """Pass the chunks of a streamed export on, and cache the complete
+        export once the last chunk has been sent.
+
+        Chunks are only collected if the export is going to be cached: if a
+        cache is configured, no concurrent request is caching the same
+        export already, and the export is not larger than
+        ``max_cached_stream_size``."""
+        if isinstance(caches['default'], DummyCache) or not cache.add(
+            f'{cache_key}_streaming', True, timeout=300
+        ):
+            yield from chunks
+            return
+        try:
+            content = []
+            size = 0
+            for chunk in chunks:
+                yield chunk
+                if content is None:
+                    continue
+                size += len(chunk)
+                if size > self.max_cached_stream_size:
+                    content = None  # Stop collecting, it won't be cached
+                else:
+                    content.append(chunk)
+            if content is not None:
+                cache.set(cache_key, compress_export(file_name, file_type, ''.join(content)))
+        finally:
+            cache.delete(f'{cache_key}_streaming')
+
     def get(self, request, *args, **kwargs):
         exporter = self.get_exporter(request)
         if not exporter:
@@ -92,18 +135,53 @@ class ExporterView(ScheduleDataView):
         try:
             exporter.schedule = self.get_object()
             exporter.is_orga = getattr(self.request, 'is_orga', False)
-            file_name, file_type, data = exporter.render()
-            etag = hashlib.sha1(str(data).encode()).hexdigest()
-            if 'HTTP_IF_NONE_MATCH' in request.META:
-                if request.META['HTTP_IF_NONE_MATCH'] == etag:
-                    return HttpResponseNotModified()
-            resp = HttpResponse(data, content_type=file_type)
+            cache_key = exporter.cache_key
+            etag = cache_key[len('export_'):]
+            if request.META.get('HTTP_IF_NONE_MATCH') in (
+                etag, f'{etag}-br', f'{etag}-gzip',
+            ):
+                return HttpResponseNotModified()
+            result = cache.get(cache_key)
+            stream = exporter.render_stream() if result is None else None
+            if stream:
+                file_name, file_type, chunks = stream
+                # Exporters load their data before yielding the first chunk,
+                # so we render it right away to turn errors into a 404 before
+                # the response starts. Errors in later chunks cut the
+                # response short.
+                chunks = iter(chunks)
+                first_chunk = next(chunks, '')
+                resp = StreamingHttpResponse(
+                    self.cache_chunks(
+                        cache_key, file_name, file_type, chain([first_chunk], chunks)
+                    ),
+                    content_type=file_type,
+                )
+            else:
+                if result is None:
+                    result = exporter.render()
+                    if not isinstance(caches['default'], DummyCache):
+                        cache.set(cache_key, compress_export(*result))
+                file_name, file_type, data = result[:3]
+                # Exports rendered without a cache have no compressed variants
+                variants = result[3] if len(result) > 3 else {}
+                encoding = get_accepted_encoding(
+                    request.META.get('HTTP_ACCEPT_ENCODING', ''),
+                    (encoding for encoding in ('br', 'gzip') if encoding in variants),
+                )
+                if encoding:
+                    resp = HttpResponse(variants[encoding], content_type=file_type)
+                    resp['Content-Encoding'] = encoding
+                    etag = f'{etag}-{encoding}'
+                else:
+                    resp = HttpResponse(data, content_type=file_type)
+            patch_vary_headers(resp, ('Accept-Encoding',))
             resp['ETag'] = etag
             if file_type not in ['application/json', 'text/xml']:
                 resp['Content-Disposition'] = f'attachment; filename="{file_name}"'
             return resp
-        except Exception as export_exception:
-            print(export_exception)
+        except Exception:
+            logger.exception('Failed to render export.')
             raise Http404()
 
 
@@ -119,46 +197,95 @@ class ScheduleView(ScheduleDataView):
         return super().get_object()
 
     def get_context_data(self, **kwargs):
-        from pretalx.schedule.exporters import ScheduleData
-
         context = super().get_context_data(**kwargs)
         context['exporters'] = list(
             exporter(self.request.event)
-            for _, exporter in register_data_exporters.send(self.request.event)
+            for exporter in get_exporters(self.request.event).values()
         )
-        timezone = pytz.timezone(self.request.event.timezone)
         if 'schedule' not in context:
             return context
 
-        context['data'] = ScheduleData(
-            event=self.request.event, schedule=context['schedule']
-        ).data
+        context['data'] = self.get_schedule_grid(context['schedule'])
         context['search'] = self.request.GET.get('q', '').lower()
+        current_time = now()
         for date in context['data']:
-            if date.get('first_start') and date.get('last_end'):
-                start = (
-                    date.get('first_start')
-                    .astimezone(timezone)
-                    .replace(second=0, minute=0)
-                )
-                end = date.get('last_end').astimezone(timezone)
-                date['height'] = int((end - start).total_seconds() / 60 * 2)
-                date['hours'] = []
-                step = start
-                while step < end:
-                    date['hours'].append(step.strftime('%H:%M'))
-                    step += timedelta(hours=1)
-                for room in date['rooms']:
-                    for talk in room.get('talks', []):
-                        talk.top = int(
-                            (talk.start.astimezone(timezone) - start).total_seconds()
-                            / 60
-                            * 2
-                        )
-                        talk.height = int(talk.duration * 2)
-                        talk.is_active = talk.start <= now() <= talk.real_end
+            for room in date['rooms']:
+                for talk in room['talks']:
+                    talk['is_active'] = talk['start'] <= current_time <= talk['real_end']
+                    talk['is_personal'] = self.request.user.pk in talk['speaker_ids']
+                    talk['is_search_hit'] = (
+                        context['search'] in talk['title'].lower()
+                        or context['search'] in talk['speaker_names'].lower()
+                    )
         return context
 
+    def get_schedule_grid(self, schedule):
+        """The layout of the schedule is the same for all visitors, so we
+        cache it per schedule version, time zone and language. The work in
+        progress schedule changes all the time and is never cached."""
+        event = self.request.event
+        if not schedule.version:
+            return self.build_schedule_grid(schedule)
+        key = '_'.join(
+            str(part)
+            for part in (
+                event.pk,
+                event.export_version,
+                schedule.pk,
+                schedule.version,
+                event.timezone,
+                get_language(),
+            )
+        )
+        cache_key = 'schedule_grid_' + hashlib.sha1(key.encode()).hexdigest()
+        grid = cache.get(cache_key)
+        if grid is None:
+            grid = self.build_schedule_grid(schedule)
+            cache.set(cache_key, grid)
+        return grid
+
+    def build_schedule_grid(self, schedule):
+        from pretalx.schedule.exporters import ScheduleData
+
+        timezone = pytz.timezone(self.request.event.timezone)
+        grid = []
+        for date in ScheduleData(event=self.request.event, schedule=schedule).data:
+            day = {'start': date['start'], 'first_start': date['first_start'], 'rooms': []}
+            grid.append(day)
+            if not date['first_start'] or not date['last_end']:
+                continue
+            start = date['first_start'].astimezone(timezone).replace(second=0, minute=0)
+            end = date['last_end'].astimezone(timezone)
+            day['height'] = int((end - start).total_seconds() / 60 * 2)
+            day['hours'] = []
+            step = start
+            while step < end:
+                day['hours'].append(step.strftime('%H:%M'))
+                step += timedelta(hours=1)
+            for room in date['rooms']:
+                talks = []
+                for talk in room['talks']:
+                    submission = talk.submission
+                    talks.append({
+                        'code': submission.code,
+                        'title': submission.title,
+                        'url': str(submission.urls.public),
+                        'speaker_ids': [speaker.pk for speaker in submission.speakers.all()],
+                        'speaker_names': submission.display_speaker_names,
+                        'track_color': submission.track.color if submission.track else None,
+                        'do_not_record': submission.do_not_record,
+                        'is_deleted': submission.is_deleted,
+                        'start': talk.start,
+                        'end': talk.end,
+                        'real_end': talk.real_end,
+                        'top': int(
+                            (talk.start.astimezone(timezone) - start).total_seconds() / 60 * 2
+                        ),
+                        'height': int(talk.duration * 2),
+                    })
+                day['rooms'].append({'name': str(room['name']), 'talks': talks})
+        return grid
+
 
 class ChangelogView(EventPermissionRequired, TemplateView):
     template_name = 'agenda/changelog.html'
@@ -1,6 +1,5 @@
 from urllib.parse import urlparse
 
-import vobject
 from csp.decorators import csp_update
 from django.conf import settings
 from django.core.files.storage import Storage
@@ -8,6 +7,7 @@ from django.http import HttpResponse
 from django.utils.decorators import method_decorator
 from django.views.generic import DetailView
 
+from pretalx.common.ical import build_calendar
 from pretalx.common.mixins.views import PermissionRequired
 from pretalx.person.models import SpeakerProfile
 from pretalx.submission.models import QuestionTarget
@@ -59,15 +59,12 @@ class SpeakerTalksIcalView(PermissionRequired, DetailView):
             submission__speakers=speaker.user, is_visible=True
         )
 
-        cal = vobject.iCalendar()
-        cal.add(
-            'prodid'
-        ).value = f'-//pretalx//{netloc}//{request.event.slug}//{speaker.code}'
-
-        for slot in slots:
-            slot.build_ical(cal)
-
-        resp = HttpResponse(cal.serialize(), content_type='text/calendar')
+        cal = build_calendar(
+            prodid=f'-//pretalx//{netloc}//{request.event.slug}//{speaker.code}',
+            events=(slot.build_ical() for slot in slots),
+            zone=request.event.timezone,
+        )
+        resp = HttpResponse(''.join(cal), content_type='text/calendar')
         speaker_name = Storage().get_valid_name(name=speaker.user.name)
         resp[
             'Content-Disposition'
@@ -1,7 +1,6 @@
 from contextlib import suppress
 from urllib.parse import urlparse
 
-import vobject
 from django.conf import settings
 from django.contrib import messages
 from django.db.models import Q
@@ -13,6 +12,7 @@ from django.views.generic import DetailView, FormView, ListView
 
 from pretalx.agenda.signals import register_recording_provider
 from pretalx.cfp.views.event import EventPageMixin
+from pretalx.common.ical import build_calendar
 from pretalx.common.mixins.views import (
     EventPermissionRequired, Filterable, PermissionRequired,
 )
@@ -159,13 +159,13 @@ class SingleICalView(EventPageMixin, DetailView):
             raise Http404()
 
         netloc = urlparse(settings.SITE_URL).netloc
-        cal = vobject.iCalendar()
-        cal.add('prodid').value = '-//pretalx//{}//{}'.format(
-            netloc, talk.submission.code
-        )
-        talk.build_ical(cal)
         code = talk.submission.code
-        resp = HttpResponse(cal.serialize(), content_type='text/calendar')
+        cal = build_calendar(
+            prodid=f'-//pretalx//{netloc}//{code}',
+            events=[talk.build_ical()],
+            zone=request.event.timezone,
+        )
+        resp = HttpResponse(''.join(cal), content_type='text/calendar')
         resp[
             'Content-Disposition'
         ] = f'attachment; filename="{request.event.slug}-{code}.ics"'
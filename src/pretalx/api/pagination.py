@@ -0,0 +1,44 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class PrimaryKeyCursorPagination(CursorPagination):
+    """Cursor pagination ordered by primary key, which is unique, indexed,
+    and never changes, so every page is fetched with a single index range
+    scan no matter how deep into the list it is."""
+
+    ordering = 'pk'
+    page_size_query_param = 'limit'
+
+    def decode_cursor(self, request):
+        if not request.query_params.get(self.cursor_query_param):
+            return None  # ?cursor= asks for the first page
+        return super().decode_cursor(request)
+
+
+class ApiPagination(LimitOffsetPagination):
+    """Limit/offset pagination, or cursor pagination for clients that pass a
+    ``cursor`` parameter. Cursor pages do not include a total count, and
+    stay fast on deep pages of large lists."""
+
+    cursor_pagination_class = PrimaryKeyCursorPagination
+
+    def __init__(self):
+        self.cursor_pagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_pagination_class.cursor_query_param in request.query_params:
+            self.cursor_pagination = self.cursor_pagination_class()
+            page = self.cursor_pagination.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.cursor_pagination.display_page_controls
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_pagination:
+            return self.cursor_pagination.to_html()
+        return super().to_html()
@@ -12,11 +12,13 @@ class SubmitterSerializer(ModelSerializer):
 
     def get_biography(self, obj):
         if self.context.get('request') and self.context['request'].event:
-            return getattr(
-                obj.profiles.filter(event=self.context['request'].event).first(),
-                'biography',
-                '',
-            )
+            if hasattr(obj, 'event_profiles'):
+                profile = next(iter(obj.event_profiles), None)
+            else:
+                profile = obj.profiles.filter(
+                    event=self.context['request'].event
+                ).first()
+            return getattr(profile, 'biography', '')
         return ''
 
     class Meta:
@@ -1,3 +1,5 @@
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
 from i18nfield.rest_framework import I18nAwareModelSerializer
 from rest_framework.serializers import (
     ModelSerializer, SerializerMethodField, SlugRelatedField,
@@ -5,8 +7,9 @@ from rest_framework.serializers import (
 
 from pretalx.api.serializers.question import AnswerSerializer
 from pretalx.api.serializers.speaker import SubmitterSerializer
+from pretalx.person.models import User
 from pretalx.schedule.models import Schedule, TalkSlot
-from pretalx.submission.models import Answer, Submission, SubmissionStates
+from pretalx.submission.models import Submission, SubmissionStates
 
 
 class SlotSerializer(I18nAwareModelSerializer):
@@ -20,40 +23,64 @@ class SlotSerializer(I18nAwareModelSerializer):
 class SubmissionSerializer(I18nAwareModelSerializer):
     submission_type = SlugRelatedField(slug_field='name', read_only=True)
     track = SlugRelatedField(slug_field='name', read_only=True)
-    slot = SlotSerializer(TalkSlot.objects.filter(is_visible=True), read_only=True)
+    slot = SerializerMethodField()
     duration = SerializerMethodField()
     speakers = SerializerMethodField()
     answers = SerializerMethodField()
 
-    @property
+    @cached_property
     def is_orga(self):
+        return self._has_permission('orga.view_submissions')
+
+    @cached_property
+    def can_view_speakers(self):
+        return self._has_permission('orga.view_speakers')
+
+    def _has_permission(self, permission):
+        """Permissions are checked once per request: the view passes them in
+        the serializer context, and the serializer of a list is shared by all
+        of its objects, so the result is cached on it."""
+        if permission in self.context:
+            return self.context[permission]
         request = self.context.get('request')
         if request:
-            return request.user.has_perm('orga.view_submissions', request.event)
+            return request.user.has_perm(permission, request.event)
         return False
 
     @staticmethod
     def get_duration(obj):
         return obj.export_duration
 
+    def get_slot(self, obj):
+        if hasattr(obj, 'api_slots'):
+            schedule = obj.event.current_schedule
+            slot = next(
+                (
+                    slot
+                    for slot in obj.api_slots
+                    if schedule and slot.schedule_id == schedule.pk
+                ),
+                None,
+            )
+        else:
+            slot = obj.slot
+        return SlotSerializer(slot).data if slot else None
+
     def get_answers(self, obj):
         if self.is_orga:
-            return AnswerSerializer(
-                Answer.objects.filter(submission=obj), many=True
-            ).data
+            return AnswerSerializer(obj.answers.all(), many=True).data
         return []
 
     def get_speakers(self, obj):
-        request = self.context.get('request')
-        has_slots = (
-            obj.slots.filter(is_visible=True)
-            and obj.state == SubmissionStates.CONFIRMED
-        )
-        has_permission = request and request.user.has_perm(
-            'orga.view_speakers', request.event
-        )
-        if has_slots or has_permission:
-            return SubmitterSerializer(obj.speakers.all(), many=True).data
+        if hasattr(obj, 'api_slots'):
+            has_slots = any(slot.is_visible for slot in obj.api_slots)
+        else:
+            has_slots = obj.slots.filter(is_visible=True).exists()
+        has_slots = has_slots and obj.state == SubmissionStates.CONFIRMED
+        if has_slots or self.can_view_speakers:
+            return SubmitterSerializer(
+                obj.speakers.all(), many=True, context=self.context
+            ).data
         return []
 
     class Meta:
@@ -90,11 +117,69 @@ class ScheduleListSerializer(ModelSerializer):
         fields = ('version',)
 
 
+class CompactSlotSerializer(ModelSerializer):
+    submission = SlugRelatedField(slug_field='code', read_only=True)
+    speakers = SerializerMethodField()
+
+    @staticmethod
+    def get_speakers(obj):
+        return [speaker.code for speaker in obj.submission.speakers.all()]
+
+    class Meta:
+        model = TalkSlot
+        fields = ('submission', 'room', 'start', 'end', 'speakers')
+
+
+class CompactScheduleSerializer(ModelSerializer):
+    """A flat representation of a schedule, with one entry per scheduled
+    slot, that is serialized in a constant number of queries."""
+
+    version = SerializerMethodField()
+    slots = SerializerMethodField()
+
+    @staticmethod
+    def get_version(obj):
+        return obj.version or 'wip'
+
+    @staticmethod
+    def get_slots(obj):
+        slots = obj.scheduled_talks.prefetch_related(
+            Prefetch('submission__speakers', queryset=User.objects.only('code'))
+        ).order_by('start', 'room', 'pk')
+        return CompactSlotSerializer(slots, many=True).data
+
+    class Meta:
+        model = Schedule
+        fields = ('version', 'published', 'slots')
+
+
 class ScheduleSerializer(ModelSerializer):
     slots = SubmissionSerializer(
         Submission.objects.filter(state=SubmissionStates.CONFIRMED), many=True
     )
+    changes = SerializerMethodField()
+
+    @staticmethod
+    def get_changes(obj):
+        changes = obj.changes
+        return {
+            'action': changes['action'],
+            'new_talks': [talk.submission.code for talk in changes['new_talks']],
+            'canceled_talks': [
+                talk.submission.code for talk in changes['canceled_talks']
+            ],
+            'moved_talks': [
+                {
+                    'submission': talk['submission'].code,
+                    'old_start': talk['old_start'].isoformat(),
+                    'new_start': talk['new_start'].isoformat(),
+                    'old_room': str(talk['old_room']),
+                    'new_room': str(talk['new_room']),
+                }
+                for talk in changes['moved_talks']
+            ],
+        }
 
     class Meta:
         model = Schedule
-        fields = ('slots', 'version')
+        fields = ('slots', 'version', 'changes')
@@ -1,10 +1,20 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Prefetch, Q
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
 from pretalx.api.serializers.submission import (
-    ScheduleListSerializer, ScheduleSerializer, SubmissionSerializer,
+    CompactScheduleSerializer, ScheduleListSerializer,
+    ScheduleSerializer, SubmissionSerializer,
 )
-from pretalx.schedule.models import Schedule
-from pretalx.submission.models import Submission
+from pretalx.person.models import SpeakerProfile, User
+from pretalx.schedule.models import Schedule, TalkSlot
+from pretalx.submission.models import Answer, Submission
 
 
 class SubmissionViewSet(viewsets.ReadOnlyModelViewSet):
@@ -14,11 +24,30 @@ class SubmissionViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ('state', 'content_locale', 'submission_type')
     search_fields = ('title', 'speakers__name')
 
+    @cached_property
+    def permissions(self):
+        return {
+            permission: self.request.user.has_perm(permission, self.request.event)
+            for permission in (
+                'orga.view_submissions',
+                'orga.view_speakers',
+                'agenda.view_schedule',
+            )
+        }
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(self.permissions)
+        return context
+
     def get_base_queryset(self):
-        if self.request.user.has_perm('orga.view_submissions', self.request.event):
+        if self.permissions['orga.view_submissions']:
             return self.request.event.submissions.all()
+        return self.get_talk_queryset()
+
+    def get_talk_queryset(self):
         if (
-            not self.request.user.has_perm('agenda.view_schedule', self.request.event)
+            not self.permissions['agenda.view_schedule']
             or not self.request.event.current_schedule
         ):
             return Submission.objects.none()
@@ -27,19 +56,50 @@ class SubmissionViewSet(viewsets.ReadOnlyModelViewSet):
         )
 
     def get_queryset(self):
-        return self.get_base_queryset() or self.queryset
+        """Fetch everything the serializer needs for a page in a constant
+        number of queries, no matter how many submissions it contains."""
+        current_schedule = self.request.event.current_schedule
+        slots = Q(is_visible=True)
+        if current_schedule:
+            slots |= Q(schedule=current_schedule)
+        prefetches = [
+            Prefetch(
+                'slots',
+                queryset=TalkSlot.objects.filter(slots).select_related('room'),
+                to_attr='api_slots',
+            ),
+            Prefetch(
+                'speakers',
+                queryset=User.objects.prefetch_related(
+                    Prefetch(
+                        'profiles',
+                        queryset=SpeakerProfile.objects.filter(
+                            event=self.request.event
+                        ),
+                        to_attr='event_profiles',
+                    )
+                ),
+            ),
+        ]
+        if self.permissions['orga.view_submissions']:
+            prefetches.append(
+                Prefetch(
+                    'answers',
+                    queryset=Answer.objects.select_related(
+                        'question', 'person'
+                    ).prefetch_related('options', 'question__options'),
+                )
+            )
+        return (
+            self.get_base_queryset()
+            .select_related('submission_type', 'track')
+            .prefetch_related(*prefetches)
+        )
 
 
 class TalkViewSet(SubmissionViewSet):
-    def get_queryset(self):
-        if (
-            not self.request.user.has_perm('agenda.view_schedule', self.request.event)
-            or not self.request.event.current_schedule
-        ):
-            return Submission.objects.none()
-        return self.request.event.submissions.filter(
-            slots__in=self.request.event.current_schedule.talks.filter(is_visible=True)
-        )
+    def get_base_queryset(self):
+        return self.get_talk_queryset()
 
 
 class ScheduleViewSet(viewsets.ReadOnlyModelViewSet):
@@ -52,6 +112,8 @@ class ScheduleViewSet(viewsets.ReadOnlyModelViewSet):
             return ScheduleListSerializer
         if self.action == 'retrieve':
             return ScheduleSerializer
+        if self.action == 'compact':
+            return CompactScheduleSerializer
         raise Exception('Methods other than GET are not supported on this ressource.')
 
     def get_object(self):
@@ -76,6 +138,43 @@ class ScheduleViewSet(viewsets.ReadOnlyModelViewSet):
                 return self.request.event.current_schedule
             raise
 
+    # Cached compact schedules belong to one export version of the event, and
+    # are never used again once it changes, so they expire after a day.
+    compact_cache_timeout = 60 * 60 * 24
+
+    @action(detail=True)
+    def compact(self, request, **kwargs):
+        """A flat list of the slots of a schedule version. Released versions
+        are cached per export version of the event, like the schedule
+        exports, so the cache and ETag also follow changes to speakers.
+        There is no Last-Modified header, as the export version does not
+        tell when it last changed."""
+        schedule = self.get_object()
+        if not schedule.version:
+            return Response(self.get_serializer(schedule).data)
+
+        key = '_'.join(
+            str(part)
+            for part in (
+                schedule.pk,
+                schedule.published.timestamp(),
+                request.event.export_version,
+                request.event.timezone,
+            )
+        )
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        etag = f'"{digest}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            cache_key = f'api_compact_schedule_{digest}'
+            data = cache.get(cache_key)
+            if data is None:
+                data = self.get_serializer(schedule).data
+                cache.set(cache_key, data, timeout=self.compact_cache_timeout)
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+
     def get_queryset(self):
         qs = self.queryset
         is_public = (
@@ -0,0 +1,279 @@
+import os
+import struct
+import time
+import zipfile
+import zlib
+from functools import lru_cache
+from typing import Iterator
+
+CHUNK_SIZE = 64 * 1024
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<4sBBHHHHHIIIHHHHHII')
+END_RECORD = struct.Struct('<4sHHHHIIH')
+UTF8_NAMES = 0x800
+DEFLATED = 8
+STORED = 0
+
+
+@lru_cache(maxsize=4096)
+def _crc32(path: str, size: int, mtime: float) -> int:
+    """Return the CRC32 checksum of a file. Size and modification time are
+    part of the cache key, so that changed files are read again."""
+    checksum = 0
+    with open(path, 'rb') as content:
+        for chunk in iter(lambda: content.read(CHUNK_SIZE), b''):
+            checksum = zlib.crc32(chunk, checksum)
+    return checksum
+
+
+def _gzip_member(path: str, size: int):
+    """Return the offset and length of the deflate stream in a gzip file,
+    and the CRC32 checksum and size of its uncompressed content."""
+    with open(path, 'rb') as content:
+        header = content.read(10)
+        if header[:3] != b'\x1f\x8b\x08':
+            raise ValueError(f'{path} is not a gzip file.')
+        flags = header[3]
+        if flags & 4:  # FEXTRA
+            content.seek(struct.unpack('<H', content.read(2))[0], os.SEEK_CUR)
+        for flag in (8, 16):  # FNAME, FCOMMENT
+            if flags & flag:
+                while content.read(1) not in (b'\x00', b''):
+                    pass
+        if flags & 2:  # FHCRC
+            content.read(2)
+        offset = content.tell()
+        content.seek(-8, os.SEEK_END)
+        crc, original_size = struct.unpack('<II', content.read(8))
+    return offset, size - offset - 8, crc, original_size
+
+
+def _dos_time(mtime: float):
+    year, month, day, hour, minute, second = time.localtime(mtime)[:6]
+    if year < 1980:
+        return 0, (1 << 5) | 1
+    return (
+        (hour << 11) | (minute << 5) | (second // 2),
+        ((year - 1980) << 9) | (month << 5) | day,
+    )
+
+
+class ZipEntry:
+    def __init__(self, name: str, path: str, stat):
+        self.name = name.encode()
+        self.path = path
+        self.mtime = stat.st_mtime
+        self.mode = stat.st_mode
+        self.size = self.compressed_size = stat.st_size
+        self.data_path = path
+        self.data_offset = 0
+        self.method = STORED
+        self._crc = None
+        self.header_offset = 0
+
+    def use_gzip(self, gzip_path: str, gzip_stat) -> bool:
+        """Use the deflate stream of an up to date gzip compressed sibling of
+        the file as the entry's data, instead of storing the file as it is."""
+        if gzip_stat.st_mtime < self.mtime:
+            return False
+        try:
+            offset, length, crc, size = _gzip_member(gzip_path, gzip_stat.st_size)
+        except (OSError, ValueError, struct.error):
+            return False
+        if size != self.size:
+            return False
+        self.method = DEFLATED
+        self.data_path, self.data_offset = gzip_path, offset
+        self.compressed_size = length
+        self._crc = crc
+        return True
+
+    @property
+    def crc(self) -> int:
+        if self._crc is None:
+            self._crc = _crc32(self.path, self.size, self.mtime)
+        return self._crc
+
+    def local_header(self) -> bytes:
+        return LOCAL_HEADER.pack(
+            b'PK\x03\x04',
+            20,
+            UTF8_NAMES,
+            self.method,
+            *_dos_time(self.mtime),
+            self.crc,
+            self.compressed_size,
+            self.size,
+            len(self.name),
+            0,
+        ) + self.name
+
+    def central_header(self) -> bytes:
+        return CENTRAL_HEADER.pack(
+            b'PK\x01\x02',
+            20,
+            3,  # Created on Unix, so that file modes are kept
+            20,
+            UTF8_NAMES,
+            self.method,
+            *_dos_time(self.mtime),
+            self.crc,
+            self.compressed_size,
+            self.size,
+            len(self.name),
+            0,
+            0,
+            0,
+            0,
+            (self.mode & 0xFFFF) << 16,
+            self.header_offset,
+        ) + self.name
+
+
+class ZipArchive:
+    """A zip file of a directory, which is written on the fly.
+
+    All entry sizes are known before anything is written, so the archive
+    can be served with a ``Content-Length``, and any byte range of it can be
+    written without writing what comes before. Files with an up to date
+    gzip compressed sibling (``file.gz`` next to ``file``) are written as
+    deflated entries using the sibling's compressed data, all others are
+    stored as they are. Archives larger than 4 GiB (ZIP64) are not
+    supported."""
+
+    def __init__(self, root_dir: str, base_dir: str):
+        path = os.path.join(root_dir, base_dir)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f'{path} does not exist.')
+        self.entries = []
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            stats = {
+                file_name: os.stat(os.path.join(dir_path, file_name))
+                for file_name in file_names
+            }
+            for file_name in sorted(file_names):
+                file_path = os.path.join(dir_path, file_name)
+                entry = ZipEntry(
+                    os.path.relpath(file_path, root_dir).replace(os.sep, '/'),
+                    file_path,
+                    stats[file_name],
+                )
+                if file_name + '.gz' in stats:
+                    entry.use_gzip(file_path + '.gz', stats[file_name + '.gz'])
+                self.entries.append(entry)
+
+        # Segments are (offset, length, content), where the content is either
+        # a ZipEntry, whose data is read from disk, or a function returning
+        # the bytes of a header.
+        self.segments = []
+        offset = 0
+        for entry in self.entries:
+            entry.header_offset = offset
+            offset = self._add_segment(
+                offset, LOCAL_HEADER.size + len(entry.name), entry.local_header
+            )
+            offset = self._add_segment(offset, entry.compressed_size, entry)
+        self.central_directory_offset = offset
+        for entry in self.entries:
+            offset = self._add_segment(
+                offset, CENTRAL_HEADER.size + len(entry.name), entry.central_header
+            )
+        self.size = self._add_segment(offset, END_RECORD.size, self.end_record)
+
+    def _add_segment(self, offset, length, content):
+        self.segments.append((offset, length, content))
+        return offset + length
+
+    def end_record(self) -> bytes:
+        return END_RECORD.pack(
+            b'PK\x05\x06',
+            0,
+            0,
+            len(self.entries),
+            len(self.entries),
+            self.size - self.central_directory_offset - END_RECORD.size,
+            self.central_directory_offset,
+            0,
+        )
+
+    @staticmethod
+    def _read(entry, start, stop) -> Iterator[bytes]:
+        with open(entry.data_path, 'rb') as content:
+            content.seek(entry.data_offset + start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = content.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f'{entry.data_path} changed while it was read.')
+                remaining -= len(chunk)
+                yield chunk
+
+    def _unchanged_size(self, path: str) -> int:
+        """Return how many bytes at the start of the archive at ``path`` are
+        the same as in this archive: all entries up to the first changed
+        one. Files that have the same size and modification time as in the
+        previous archive keep its checksum, instead of being read again."""
+        try:
+            with zipfile.ZipFile(path) as previous:
+                infos = previous.infolist()
+        except (OSError, zipfile.BadZipFile):
+            return 0
+        for entry, info in zip(self.entries, infos):
+            year, month, day, hour, minute, second = info.date_time
+            if (
+                info.filename.encode() != entry.name
+                or info.header_offset != entry.header_offset
+                or info.flag_bits != UTF8_NAMES
+                or info.extract_version != 20
+                or info.extra
+                or info.compress_type != entry.method
+                or info.compress_size != entry.compressed_size
+                or info.file_size != entry.size
+                or info.external_attr != (entry.mode & 0xFFFF) << 16
+                or _dos_time(entry.mtime)
+                != (
+                    (hour << 11) | (minute << 5) | (second // 2),
+                    ((year - 1980) << 9) | (month << 5) | day,
+                )
+            ):
+                return entry.header_offset
+            if entry._crc is None:
+                entry._crc = info.CRC
+            elif entry._crc != info.CRC:
+                return entry.header_offset
+        if len(infos) < len(self.entries):
+            return self.entries[len(infos)].header_offset
+        return self.central_directory_offset
+
+    def write(self, path: str) -> int:
+        """Write the archive to ``path``. If the file is an archive of the
+        same directory already, the unchanged entries at its start are kept
+        where they are, and only what comes after them is written. Returns
+        the number of bytes written."""
+        start = self._unchanged_size(path)
+        with open(path, 'r+b' if start else 'wb') as archive:
+            # Cut the previous archive off first, so that an interrupted
+            # write leaves a broken archive behind, which is then replaced
+            # completely, instead of one with a misleading central directory.
+            archive.truncate(start)
+            archive.seek(start)
+            for chunk in self.iter_range(start):
+                archive.write(chunk)
+        return self.size - start
+
+    def iter_range(self, start: int = 0, stop: int = None) -> Iterator[bytes]:
+        """Yield the bytes of the archive from ``start`` up to, but not
+        including, ``stop``."""
+        stop = self.size if stop is None else min(stop, self.size)
+        for offset, length, content in self.segments:
+            if offset + length <= start:
+                continue
+            if offset >= stop:
+                break
+            segment_start = max(start - offset, 0)
+            segment_stop = min(stop - offset, length)
+            if isinstance(content, ZipEntry):
+                yield from self._read(content, segment_start, segment_stop)
+            else:
+                yield content()[segment_start:segment_stop]
@@ -1,4 +1,6 @@
-from typing import Tuple
+import hashlib
+from contextlib import suppress
+from typing import Dict, Iterable, Optional, Tuple
 from urllib.parse import quote
 from xml.etree import ElementTree
 
@@ -6,13 +8,19 @@ import qrcode
 import qrcode.image.svg
 from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+from whitenoise.compress import Compressor, brotli_installed
 
 from pretalx.common.urls import EventUrls
 
+_exporters = {}
+
 
 class BaseExporter:
     """The base class for all data exporters."""
 
+    is_orga = False
+
     def __init__(self, event):
         self.event = event
 
@@ -62,6 +70,30 @@ class BaseExporter:
         """Render the exported file and return a tuple consisting of a file name, a file type and file content."""
         raise NotImplementedError()  # NOQA
 
+    def render_stream(self, **kwargs) -> Optional[Tuple[str, str, Iterable[str]]]:
+        """Like ``render``, but return the file content as an iterable of strings, so that large files can be streamed to the client. Return None (the default) if the exporter does not support streaming."""
+        return None
+
+    @property
+    def cache_key(self) -> str:
+        """The key under which the output of ``render`` is cached in the
+        current language. It changes whenever the event's exports become
+        outdated, see ``Event.invalidate_export_cache``."""
+        schedule = getattr(self, 'schedule', None)
+        key = '_'.join(
+            str(part)
+            for part in (
+                self.event.pk,
+                self.event.export_version,
+                schedule.pk if schedule else None,
+                schedule.version if schedule else None,
+                self.identifier,
+                self.is_orga,
+                get_language(),
+            )
+        )
+        return 'export_' + hashlib.sha1(key.encode()).hexdigest()
+
     class urls(EventUrls):
         """
         The urls.base attribute contains the relative URL where this exporter's
@@ -74,3 +106,50 @@ class BaseExporter:
     def get_qrcode(self):
         image = qrcode.make(self.urls.base.full(), image_factory=qrcode.image.svg.SvgImage)
         return mark_safe(ElementTree.tostring(image.get_image()).decode())
+
+
+def get_exporters(event) -> Dict[str, type]:
+    """Return the exporter classes available for the event, by identifier.
+
+    Sending ``register_data_exporters`` checks every receiver against the
+    event's plugins, so we keep the result per event, and only ask again
+    once the event's active plugins have changed."""
+    from pretalx.common.signals import register_data_exporters
+
+    plugins, exporters = _exporters.get(event.pk, (None, None))
+    if exporters is None or plugins != event.plugins:
+        exporters = {
+            exporter(event).identifier: exporter
+            for _, exporter in register_data_exporters.send(event)
+        }
+        _exporters[event.pk] = (event.plugins, exporters)
+    return exporters
+
+
+def compress_export(file_name: str, file_type: str, content) -> Tuple[str, str, str, Dict[str, bytes]]:
+    """Add pre-compressed variants to the result of an exporter's ``render``,
+    by content coding, for storing it in the export cache. Brotli is only
+    available if the brotli package is installed."""
+    data = content.encode() if isinstance(content, str) else content
+    variants = {'gzip': Compressor.compress_gzip(data)}
+    if brotli_installed:
+        variants['br'] = Compressor.compress_brotli(data)
+    return file_name, file_type, content, variants
+
+
+def get_accepted_encoding(accept_encoding: str, encodings: Iterable[str]) -> Optional[str]:
+    """Return the first of the given content codings that is acceptable
+    according to an ``Accept-Encoding`` header, or None."""
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            with suppress(ValueError):
+                quality = float(params[2:])
+        qualities[coding.strip().lower()] = quality
+    for encoding in encodings:
+        if qualities.get(encoding, qualities.get('*', 0)) > 0:
+            return encoding
+    return None
@@ -0,0 +1,66 @@
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+import pytz
+from vobject.icalendar import TimezoneComponent
+
+
+def escape(value: str) -> str:
+    """Escape a TEXT property value (RFC 5545, section 3.3.11)."""
+    value = value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+    return value.replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+
+
+def fold(line: str) -> str:
+    """Fold a content line into lines of at most 75 octets, without breaking
+    up multi-byte characters, and terminate it (RFC 5545, section 3.1)."""
+    if len(line.encode()) <= 75:
+        return line + '\r\n'
+    lines = []
+    start = size = 0
+    for index, char in enumerate(line):
+        char_size = len(char.encode())
+        if size + char_size > 75:
+            lines.append(line[start:index])
+            start, size = index, 1  # Continuation lines start with a space
+        size += char_size
+    lines.append(line[start:])
+    return '\r\n '.join(lines) + '\r\n'
+
+
+@lru_cache(maxsize=None)
+def get_timezone(zone: str):
+    """Return the TZID and VTIMEZONE component for a time zone name.
+
+    Time zones equivalent to UTC have neither, as their times are written
+    in UTC. Deriving the VTIMEZONE rules is expensive, so we do it only
+    once per time zone."""
+    tz = pytz.timezone(zone)
+    tzid = TimezoneComponent.pickTzid(tz)
+    if not tzid:
+        return None, ''
+    return tzid, TimezoneComponent(tz).serialize()
+
+
+def format_datetime(value, zone: str = 'UTC') -> str:
+    """Return the parameters and value of a DATE-TIME property in the given
+    time zone, e.g. ``;TZID=Europe/Berlin:20190101T100000``."""
+    tzid, _ = get_timezone(zone)
+    if not tzid:
+        return value.astimezone(pytz.utc).strftime(':%Y%m%dT%H%M%SZ')
+    return value.astimezone(pytz.timezone(zone)).strftime(f';TZID={tzid}:%Y%m%dT%H%M%S')
+
+
+def build_calendar(prodid: str, events: Iterable[str], zone: str) -> Iterator[str]:
+    """Yield an iCalendar file containing the given serialized VEVENT
+    components, whose times are in the given time zone."""
+    # Fetch the first event before anything is written, so that errors
+    # surface before the response starts.
+    events = (event for event in events if event)
+    first_event = next(events, None)
+    yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\n' + fold('PRODID:' + escape(prodid))
+    if first_event:
+        yield get_timezone(zone)[1]
+        yield first_event
+        yield from events
+    yield 'END:VCALENDAR\r\n'
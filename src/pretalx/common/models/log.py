@@ -51,6 +51,7 @@ LOG_NAMES = {
     'pretalx.question.option.delete': _('A question option was deleted.'),
     'pretalx.question.option.update': _('A question option was modified.'),
     'pretalx.room.create': _('A new room was added.'),
+    'pretalx.schedule.auto': _('Talks were scheduled automatically.'),
     'pretalx.schedule.release': _('A new schedule version was released.'),
     'pretalx.submission.accept': _('The submission was accepted.'),
     'pretalx.submission.cancel': _('The submission was cancelled.'),
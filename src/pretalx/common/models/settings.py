@@ -37,6 +37,7 @@ hierarkey.add_default('show_on_dashboard', 'True', bool)
 hierarkey.add_default('show_schedule', 'True', bool)
 hierarkey.add_default('show_sneak_peek', 'True', bool)
 hierarkey.add_default('export_html_on_schedule_release', 'False', bool)
+hierarkey.add_default('compact_schedule_versions', 'False', bool)
 hierarkey.add_default('html_export_url', '', str)
 hierarkey.add_default('custom_domain', '', str)
 hierarkey.add_default('use_tracks', 'False', bool)
@@ -148,5 +148,8 @@ register_data_exporters = EventPluginSignal(providing_args=[])
 This signal is sent out to get all known data exporters. Receivers should return a
 subclass of pretalx.common.exporter.BaseExporter
 
+The exporters are remembered per event until its active plugins change, so
+receivers should return the same exporter for an event every time.
+
 As with all event plugin signals, the ``sender`` keyword argument will contain the event.
 """
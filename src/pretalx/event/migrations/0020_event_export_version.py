@@ -0,0 +1,18 @@
+# Generated by Django 2.1.15 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0019_auto_20190224_0856'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='export_version',
+            field=models.CharField(default='', editable=False, max_length=16),
+        ),
+    ]
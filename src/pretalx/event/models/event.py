@@ -7,6 +7,7 @@ from django.core.mail import get_connection
 from django.core.mail.backends.base import BaseEmailBackend
 from django.core.validators import RegexValidator
 from django.db import models, transaction
+from django.utils.crypto import get_random_string
 from django.utils.functional import cached_property
 from django.utils.timezone import make_aware
 from django.utils.translation import ugettext_lazy as _
@@ -171,6 +172,7 @@ class Event(LogMixin, models.Model):
         blank=True,
     )
     plugins = models.TextField(null=True, blank=True, verbose_name=_('Plugins'))
+    export_version = models.CharField(max_length=16, default='', editable=False)
 
     template_names = [
         f'{t}_template' for t in ('accept', 'ack', 'reject', 'update', 'question')
@@ -235,6 +237,7 @@ class Event(LogMixin, models.Model):
         release_schedule = '{schedule}release'
         reset_schedule = '{schedule}reset'
         toggle_schedule = '{schedule}toggle'
+        auto_schedule = '{schedule}auto'
         reviews = '{base}reviews/'
         schedule_api = '{base}schedule/api/'
         talks_api = '{schedule_api}talks/'
@@ -272,11 +275,21 @@ class Event(LogMixin, models.Model):
 
     def save(self, *args, **kwargs):
         was_created = not bool(self.pk)
+        self.export_version = get_random_string(16)
         super().save(*args, **kwargs)
 
         if was_created:
             self.build_initial_data()
 
+    def invalidate_export_cache(self):
+        """Schedule exports are cached per ``export_version``. Call this
+        whenever data shown in the exports changes. Changes to released
+        submissions, their speakers, rooms, tracks and public answers are
+        handled by ``pretalx.event.services.invalidate_export_cache`` once
+        the transaction is committed."""
+        self.export_version = get_random_string(16)
+        Event.objects.filter(pk=self.pk).update(export_version=self.export_version)
+
     def get_plugins(self):
         if not self.plugins:
             return []
@@ -589,5 +602,7 @@ class Event(LogMixin, models.Model):
         ]
 
         self._delete_mail_templates()
+        # Compacted schedule versions protect their delta base from deletion
+        self.schedules.update(delta_base=None)
         for entry in deletion_order:
             entry.delete()
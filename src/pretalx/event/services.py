@@ -1,11 +1,20 @@
 from datetime import timedelta
+from threading import local
 
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils.crypto import get_random_string
 from django.utils.timezone import now
 
 from pretalx.celery_app import app
 from pretalx.common.signals import periodic_task
 from pretalx.event.models import Event
+from pretalx.person.models import SpeakerProfile, User
+from pretalx.schedule.models import Room, TalkSlot
+from pretalx.submission.models import (
+    Answer, AnswerOption, Question, Resource, Submission, SubmissionType, Track,
+)
 
 
 @app.task()
@@ -52,3 +61,141 @@ def task_periodic_event_services(event_slug):
 def periodic_event_services(sender, **kwargs):
     for event in Event.objects.all().values_list('slug', flat=True):
         task_periodic_event_services.apply_async(args=(event,))
+
+
+def released_events(**filters):
+    """Return the ids of events with released schedule versions containing
+    slots that match the filters."""
+    return set(
+        TalkSlot.objects.filter(schedule__version__isnull=False, **filters)
+        .values_list('schedule__event_id', flat=True)
+        .distinct()
+    )
+
+
+def get_exported_events(instance):
+    """Return the ids of the events whose released schedule exports show the
+    given object. Unreleased submissions, and answers to questions that are
+    not public, don't show up in any of them."""
+    if isinstance(instance, User):
+        return released_events(submission__speakers=instance)
+    if isinstance(instance, SpeakerProfile):
+        return released_events(
+            submission__speakers=instance.user_id, schedule__event=instance.event_id
+        )
+    if isinstance(instance, Submission):
+        return released_events(submission=instance)
+    if isinstance(instance, Resource):
+        return released_events(submission=instance.submission_id)
+    if isinstance(instance, Answer):
+        if not instance.question.is_public:
+            return set()
+        if instance.submission_id:
+            return released_events(submission=instance.submission_id)
+        if instance.person_id:
+            return released_events(
+                submission__speakers=instance.person_id,
+                schedule__event=instance.question.event_id,
+            )
+        return set()
+    if isinstance(instance, AnswerOption):
+        if not instance.question.is_public:
+            return set()
+        return {instance.question.event_id}
+    if isinstance(instance, Question):
+        if not (instance.is_public or getattr(instance, '_was_public', False)):
+            return set()
+        return {instance.event_id}
+    return set(
+        Event.objects.filter(
+            pk=instance.event_id, schedules__version__isnull=False
+        ).values_list('pk', flat=True)
+    )
+
+
+_pending = local()
+
+
+def _flush_export_cache_invalidation():
+    event_ids = getattr(_pending, 'event_ids', set())
+    _pending.event_ids = set()
+    if event_ids:
+        Event.objects.filter(pk__in=event_ids).update(
+            export_version=get_random_string(16)
+        )
+
+
+def queue_export_cache_invalidation(event_ids):
+    """Invalidate the export caches of the given events once the current
+    transaction is committed. Events changed multiple times in a transaction
+    are only updated once, by the first of the queued callbacks."""
+    if not event_ids:
+        return
+    if not hasattr(_pending, 'event_ids'):
+        _pending.event_ids = set()
+    _pending.event_ids |= set(event_ids)
+    transaction.on_commit(_flush_export_cache_invalidation)
+
+
+def remember_question_visibility(sender, instance, raw=False, **kwargs):
+    """Answers to questions that are no longer public need to be removed from
+    the exports, too, so we remember if the question was public before."""
+    if instance.pk and not raw:
+        instance._was_public = (
+            Question.all_objects.filter(pk=instance.pk, is_public=True).exists()
+        )
+
+
+def invalidate_export_cache(sender, instance, **kwargs):
+    """Cached schedule exports and pages show rooms, tracks, speakers and
+    answers, too, so changes to any of them outdate the cache. See
+    ``Event.invalidate_export_cache``.
+
+    Deletions are handled before the fact, while the deleted object's slots
+    and speakers can still be found."""
+    action = kwargs.get('action')
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('raw') or action not in (None, 'post_add', 'post_remove', 'pre_clear'):
+        return
+    if update_fields and update_fields <= {'last_login'}:
+        return
+    events = get_exported_events(instance)
+    if kwargs.get('model') is Submission and kwargs.get('pk_set'):
+        # Speakers removed from submissions are not linked to their events
+        events |= released_events(submission__pk__in=kwargs['pk_set'])
+    queue_export_cache_invalidation(events)
+
+
+pre_save.connect(
+    remember_question_visibility,
+    sender=Question,
+    dispatch_uid='remember_question_visibility',
+)
+for model in (
+    Answer,
+    AnswerOption,
+    Question,
+    Resource,
+    Room,
+    SpeakerProfile,
+    Submission,
+    SubmissionType,
+    Track,
+    User,
+):
+    post_save.connect(
+        invalidate_export_cache,
+        sender=model,
+        dispatch_uid=f'invalidate_export_cache_save_{model.__name__}',
+    )
+    pre_delete.connect(
+        invalidate_export_cache,
+        sender=model,
+        dispatch_uid=f'invalidate_export_cache_delete_{model.__name__}',
+    )
+for through in (Submission.speakers.through, Answer.options.through):
+    m2m_changed.connect(
+        invalidate_export_cache,
+        sender=through,
+        dispatch_uid=f'invalidate_export_cache_m2m_{through.__name__}',
+    )
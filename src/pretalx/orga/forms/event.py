@@ -144,6 +144,13 @@ class EventSettingsForm(ReadOnlyFlag, I18nFormMixin, HierarkeyForm):
         ),
         required=False,
     )
+    compact_schedule_versions = forms.BooleanField(
+        label=_('Store only changes of old schedule versions'),
+        help_text=_(
+            'When a new schedule version is released, the previous version will only keep the talks that differ from the new version. This saves a lot of database space for events with many releases, at the cost of slightly slower access to old schedule versions.'
+        ),
+        required=False,
+    )
     html_export_url = forms.URLField(
         label=_('HTML Export URL'),
         help_text=_(
@@ -134,6 +134,7 @@ urlpatterns = [
         url(r'^schedule/quick/(?P<code>\w+)/$', schedule.QuickScheduleView.as_view(), name='schedule.quick'),
         url('^schedule/reset$', schedule.ScheduleResetView.as_view(), name='schedule.reset'),
         url('^schedule/toggle$', schedule.ScheduleToggleView.as_view(), name='schedule.toggle'),
+        url('^schedule/auto$', schedule.ScheduleAutoView.as_view(), name='schedule.auto'),
         url('^schedule/resend_mails$', schedule.ScheduleResendMailsView.as_view(), name='schedule.resend_mails'),
         url('^schedule/rooms/$', schedule.RoomList.as_view(), name='schedule.rooms.list'),
         url('^schedule/rooms/new$', schedule.RoomDetail.as_view(), name='schedule.rooms.create'),
@@ -142,6 +143,7 @@ urlpatterns = [
         url('^schedule/rooms/(?P<pk>[0-9]+)/up$', schedule.room_move_up, name='schedule.rooms.up'),
         url('^schedule/rooms/(?P<pk>[0-9]+)/down$', schedule.room_move_down, name='schedule.rooms.down'),
         url('^schedule/api/talks/$', schedule.TalkList.as_view(), name='schedule.api.talks'),
+        url('^schedule/api/talks/batch/$', schedule.TalkBatchUpdate.as_view(), name='schedule.api.batch_update'),
         url('^schedule/api/talks/(?P<pk>[0-9]+)/$', schedule.TalkUpdate.as_view(), name='schedule.api.update'),
         url(
             '^schedule/api/availabilities/(?P<talkid>[0-9]+)/(?P<roomid>[0-9]+)/$',
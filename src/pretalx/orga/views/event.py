@@ -83,6 +83,7 @@ class EventDetail(ActionFromUrl, EventSettingsPermission, UpdateView):
         result = super().form_valid(form)
 
         self.sform.save()
+        form.instance.invalidate_export_cache()
         form.instance.log_action(
             'pretalx.event.update', person=self.request.user, orga=True
         )
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os.path
 import xml.etree.ElementTree as ET
@@ -5,31 +6,42 @@ from contextlib import suppress
 from datetime import timedelta
 
 import dateutil.parser
+import pytz
 from csp.decorators import csp_update
 from django.contrib import messages
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
 from django.db import transaction
+from django.db.models import (
+    Case, Count, DateTimeField, IntegerField, Max, Q, Value, When,
+)
 from django.db.models.deletion import ProtectedError
-from django.http import FileResponse, Http404, JsonResponse
+from django.http import (
+    Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import redirect
 from django.utils.decorators import method_decorator
 from django.utils.functional import cached_property
-from django.utils.translation import ugettext_lazy as _
+from django.utils.timezone import is_naive, now
+from django.utils.translation import override, ugettext_lazy as _
 from django.views.generic import FormView, TemplateView, UpdateView, View
 from i18nfield.utils import I18nJSONEncoder
 
 from pretalx.agenda.management.commands.export_schedule_html import (
-    Command as ExportScheduleHtml,
+    Command as ExportScheduleHtml, ExportStatus,
 )
-from pretalx.agenda.tasks import export_schedule_html
+from pretalx.agenda.tasks import get_public_exporters, request_export_schedule_html
 from pretalx.api.serializers.room import AvailabilitySerializer
+from pretalx.common.archive import ZipArchive
+from pretalx.common.exporter import get_exporters
 from pretalx.common.mixins.views import (
     ActionFromUrl, EventPermissionRequired, PermissionRequired,
 )
-from pretalx.common.signals import register_data_exporters
 from pretalx.common.views import CreateOrUpdateView
 from pretalx.orga.forms.schedule import ScheduleImportForm, ScheduleReleaseForm
 from pretalx.schedule.forms import QuickScheduleForm, RoomForm
 from pretalx.schedule.models import Availability, Room
+from pretalx.schedule.services import auto_schedule
 from pretalx.schedule.utils import guess_schedule_version
 
 
@@ -58,16 +70,55 @@ class ScheduleExportView(EventPermissionRequired, TemplateView):
         context = super().get_context_data(**kwargs)
         context['exporters'] = list(
             exporter(self.request.event)
-            for _, exporter in register_data_exporters.send(self.request.event)
+            for exporter in get_exporters(self.request.event).values()
         )
+        context['exports_ready'] = self.exports_ready
+        context['html_export'] = self.html_export
         return context
 
+    @property
+    def html_export(self):
+        """The state, timings and progress of the latest HTML export."""
+        event = self.request.event
+        status = ExportStatus.load(ExportScheduleHtml.get_status_path(event)).data
+        phase_names = {
+            'static': _('Static files'),
+            'media': _('Media files'),
+            'views': _('Pages'),
+            'compress': _('Compression'),
+            'zip': _('ZIP file'),
+        }
+        for key in ('started', 'finished'):
+            if status.get(key):
+                status[key] = dateutil.parser.parse(status[key])
+        status['phase'] = phase_names.get(status.get('phase'))
+        status['phases'] = [
+            (phase_names.get(name, name), duration)
+            for name, duration in status.get('phases', [])
+        ]
+        status['pending'] = os.path.exists(ExportScheduleHtml.get_pending_path(event))
+        return status
+
+    @property
+    def exports_ready(self):
+        """Whether all public exports of the current schedule have been
+        rendered to the cache, or None if they are not cached at all."""
+        event = self.request.event
+        if not event.current_schedule or isinstance(caches['default'], DummyCache):
+            return None
+        keys = []
+        for exporter in get_public_exporters(event):
+            for locale in event.locales:
+                with override(locale):
+                    keys.append(exporter.cache_key)
+        return len(cache.get_many(keys)) == len(keys)
+
 
 class ScheduleExportTriggerView(EventPermissionRequired, View):
     permission_required = 'orga.view_schedule'
 
     def post(self, request, event):
-        export_schedule_html.apply_async(kwargs={'event_id': self.request.event.id})
+        request_export_schedule_html(self.request.event)
         messages.success(
             self.request,
             _('A new export is being generated and will be available soon.'),
@@ -75,14 +126,55 @@ class ScheduleExportTriggerView(EventPermissionRequired, View):
         return redirect(self.request.event.orga_urls.schedule_export)
 
 
+def parse_byte_range(header, size):
+    """Return the start and stop of the range requested in an HTTP Range
+    header. Headers we do not understand, including those asking for more
+    than one range, are ignored by returning ``None``. Ranges that lie
+    outside of the content raise a ``ValueError``."""
+    unit, _, byte_range = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in byte_range:
+        return None
+    first, _, last = byte_range.partition('-')
+    try:
+        first = int(first) if first.strip() else None
+        last = int(last) if last.strip() else None
+    except ValueError:
+        return None
+    if (first is None and last is None) or (last is not None and last < (first or 0)):
+        return None
+    if first is None:
+        start, stop = max(size - last, 0), size
+    else:
+        start, stop = first, size if last is None else min(last + 1, size)
+    if start >= stop:
+        raise ValueError(f'Range {header} is not satisfiable.')
+    return start, stop
+
+
 class ScheduleExportDownloadView(EventPermissionRequired, View):
+    """Serve the HTML export as a zip file that is written while it is being
+    downloaded, instead of keeping a zip file around next to the export.
+    Interrupted downloads can be resumed with range requests."""
+
     permission_required = 'orga.view_schedule'
 
     def get(self, request, event):
+        # The zip file is assembled from the export directory while it is
+        # sent, so it must not change in the meantime.
+        status_path = ExportScheduleHtml.get_status_path(self.request.event)
+        if ExportStatus.load(status_path).data.get('state') == 'running':
+            messages.error(
+                request,
+                _(
+                    'The export is being updated right now. Please try again once it is finished.'
+                ),
+            )
+            return redirect(self.request.event.orga_urls.schedule_export)
         try:
-            zip_path = ExportScheduleHtml.get_output_zip_path(self.request.event)
-            zip_name = os.path.basename(zip_path)
-            response = FileResponse(open(zip_path, 'rb'), as_attachment=True)
+            output_dir = ExportScheduleHtml.get_output_dir(self.request.event)
+            archive = ZipArchive(
+                os.path.dirname(output_dir), os.path.basename(output_dir)
+            )
         except Exception as e:
             messages.error(
                 request,
@@ -91,7 +183,37 @@ class ScheduleExportDownloadView(EventPermissionRequired, View):
                 ).format(error=str(e)),
             )
             return redirect(self.request.event.orga_urls.schedule_export)
-        response['Content-Disposition'] = 'attachment; filename=' + zip_name
+        checksum = hashlib.sha1()
+        for entry in archive.entries:
+            checksum.update(entry.name + f':{entry.size}:{entry.mtime}\n'.encode())
+        etag = f'"{checksum.hexdigest()}"'
+
+        start, stop = 0, archive.size
+        byte_range = None
+        if request.META.get('HTTP_IF_RANGE', etag) == etag:
+            try:
+                byte_range = parse_byte_range(
+                    request.META.get('HTTP_RANGE', ''), archive.size
+                )
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{archive.size}'
+                return response
+        if byte_range:
+            start, stop = byte_range
+        response = StreamingHttpResponse(
+            archive.iter_range(start, stop),
+            status=206 if byte_range else 200,
+            content_type='application/zip',
+        )
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{stop - 1}/{archive.size}'
+        response['Content-Length'] = str(stop - start)
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Content-Disposition'] = (
+            f'attachment; filename={os.path.basename(output_dir)}.zip'
+        )
         return response
 
 
@@ -162,6 +284,27 @@ class ScheduleToggleView(EventPermissionRequired, View):
         return redirect(self.request.event.orga_urls.schedule)
 
 
+class ScheduleAutoView(EventPermissionRequired, View):
+    permission_required = 'orga.edit_schedule'
+
+    def post(self, request, event):
+        placed, unplaced = auto_schedule(
+            self.request.event.wip_schedule, user=self.request.user
+        )
+        messages.success(
+            self.request,
+            _('{count} talks have been scheduled.').format(count=len(placed)),
+        )
+        if unplaced:
+            messages.warning(
+                self.request,
+                _(
+                    '{count} talks could not be scheduled, as no room was free while all their speakers were available.'
+                ).format(count=len(unplaced)),
+            )
+        return redirect(self.request.event.orga_urls.schedule)
+
+
 class ScheduleResendMailsView(EventPermissionRequired, View):
     permission_required = 'orga.edit_schedule'
 
@@ -180,7 +323,11 @@ class ScheduleResendMailsView(EventPermissionRequired, View):
         return redirect(self.request.event.orga_urls.schedule)
 
 
-def serialize_slot(slot):
+def serialize_slot(slot, submissions_url=None):
+    if submissions_url:
+        url = f'{submissions_url}{slot.submission.code}/'
+    else:
+        url = slot.submission.orga_urls.base
     return {
         'id': slot.pk,
         'title': str(slot.submission.title),
@@ -199,7 +346,7 @@ def serialize_slot(slot):
         'room': slot.room.pk if slot.room else None,
         'start': slot.start.isoformat() if slot.start else None,
         'end': slot.end.isoformat() if slot.end else None,
-        'url': slot.submission.orga_urls.base,
+        'url': url,
         'warnings': slot.warnings,
     }
 
@@ -207,11 +354,45 @@ def serialize_slot(slot):
 class TalkList(EventPermissionRequired, View):
     permission_required = 'orga.edit_schedule'
 
+    def get_since(self):
+        since = self.request.GET.get('since')
+        if since:
+            with suppress(ValueError, OverflowError):
+                since = dateutil.parser.parse(since)
+                if is_naive(since):
+                    since = pytz.timezone(self.request.event.timezone).localize(since)
+                return since
+
+    def get_etag(self, schedule, since):
+        """Build the ETag from aggregates that change whenever the response
+        would, so that unchanged talk lists can be answered without loading
+        any talks. Slots are marked as updated when their talk data changes,
+        see ``pretalx.schedule.signals``, and availabilities are always
+        replaced instead of changed."""
+        slots = schedule.talks.aggregate(count=Count('pk'), updated=Max('updated'))
+        availabilities = self.request.event.availabilities.aggregate(
+            count=Count('pk'), last=Max('pk')
+        )
+        fingerprint = '_'.join(
+            str(part)
+            for part in (
+                schedule.pk,
+                slots['count'],
+                slots['updated'].isoformat() if slots['updated'] else None,
+                availabilities['count'],
+                availabilities['last'],
+                self.request.event.export_version,
+                since.isoformat() if since else None,
+            )
+        )
+        return hashlib.sha1(fingerprint.encode()).hexdigest()
+
     def get(self, request, event):
         result = {
             'start': request.event.datetime_from.isoformat(),
             'end': request.event.datetime_to.isoformat(),
             'timezone': request.event.timezone,
+            'now': now().isoformat(),
             'results': [],
         }
         version = self.request.GET.get('version')
@@ -222,8 +403,63 @@ class TalkList(EventPermissionRequired, View):
 
         if not schedule:
             return JsonResponse(result)
-        result['results'] = [serialize_slot(slot) for slot in schedule.talks.all()]
-        return JsonResponse(result, encoder=I18nJSONEncoder)
+
+        since = self.get_since()
+        etag = self.get_etag(schedule, since)
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            return HttpResponseNotModified()
+        response = self.get_response(result, schedule, since)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def get_response(self, result, schedule, since):
+        changed = None
+        if since:
+            # Slots are deleted without a trace, so instead of a list of deleted
+            # slots we send the ids of all remaining ones.
+            slots = list(schedule.talks.values_list('pk', 'updated'))
+            result['ids'] = [pk for pk, updated in slots]
+            changed = {pk for pk, updated in slots if updated and updated >= since}
+            if not changed:
+                return JsonResponse(result)
+
+        talks = list(
+            schedule.talks.select_related(
+                'submission', 'submission__event', 'submission__submission_type', 'room'
+            ).prefetch_related('submission__speakers')
+        )
+        schedule.get_talk_warnings(talks)
+        submissions_url = self.request.event.orga_urls.submissions
+        if changed is None:
+            result['results'] = [serialize_slot(slot, submissions_url) for slot in talks]
+        else:
+            # Moving a talk can add or remove warnings of other talks, too.
+            result['results'] = [
+                serialize_slot(slot, submissions_url)
+                for slot in talks
+                if slot.pk in changed
+            ]
+            result['warnings'] = {
+                slot.pk: slot.warnings for slot in talks if slot.warnings
+            }
+        return HttpResponse(
+            json.dumps(result, cls=I18nJSONEncoder), content_type='application/json'
+        )
+
+
+def move_slot(slot, data, rooms):
+    if data.get('start'):
+        slot.start = dateutil.parser.parse(data.get('start'))
+        slot.end = slot.start + timedelta(minutes=slot.submission.get_duration())
+    else:
+        slot.start = None
+        slot.end = None
+
+    if data.get('room'):
+        slot.room = rooms[str(data.get('room'))]
+    else:
+        slot.room = None
 
 
 class TalkUpdate(PermissionRequired, View):
@@ -239,22 +475,86 @@ class TalkUpdate(PermissionRequired, View):
         if not talk:
             return JsonResponse({'error': 'Talk not found'})
         data = json.loads(request.body.decode())
+        rooms = {str(room.pk): room for room in request.event.rooms.all()}
+        move_slot(talk, data, rooms)
+        talk.save(update_fields=['start', 'end', 'room', 'updated'])
 
-        if data.get('start'):
-            talk.start = dateutil.parser.parse(data.get('start'))
-            talk.end = talk.start + timedelta(minutes=talk.submission.get_duration())
-        else:
-            talk.start = None
-            talk.end = None
+        return JsonResponse(serialize_slot(talk))
 
-        if data.get('room'):
-            talk.room = request.event.rooms.get(pk=data.get('room'))
-        else:
-            talk.room = None
 
-        talk.save(update_fields=['start', 'end', 'room'])
+class TalkBatchUpdate(EventPermissionRequired, View):
+    """Moves many talks at once, given a list of objects with the keys
+    ``id``, ``room`` and ``start``, like the ones sent to ``TalkUpdate``.
 
-        return JsonResponse(serialize_slot(talk))
+    Moving talks can add or remove overlap warnings of other talks in their
+    old and new rooms and of their speakers, so the current warnings of
+    those talks are sent along as ``warnings``, like in ``TalkList``."""
+
+    permission_required = 'orga.edit_schedule'
+
+    def patch(self, request, event):
+        data = json.loads(request.body.decode())
+        moves = {str(move.get('id')): move for move in data.get('talks', [])}
+        schedule = request.event.wip_schedule
+        talks = list(
+            schedule.talks.filter(pk__in=[pk for pk in moves if pk.isdigit()])
+            .select_related('submission', 'submission__submission_type')
+            .prefetch_related('submission__speakers')
+        )
+        if len(talks) != len(moves):
+            return JsonResponse({'error': 'Talk not found'}, status=404)
+        if not talks:
+            return JsonResponse({'results': [], 'warnings': {}})
+        rooms = {str(room.pk): room for room in request.event.rooms.all()}
+        room_ids = {talk.room_id for talk in talks if talk.room_id}
+        speaker_ids = {
+            speaker.pk for talk in talks for speaker in talk.submission.speakers.all()
+        }
+        for talk in talks:
+            move = moves[str(talk.pk)]
+            if move.get('room') and str(move['room']) not in rooms:
+                return JsonResponse({'error': 'Room not found'}, status=400)
+            move_slot(talk, move, rooms)
+        room_ids |= {talk.room_id for talk in talks if talk.room_id}
+
+        # Django 2.1 has no bulk_update, so we build its single UPDATE query
+        # ourselves.
+        def values(attribute, output_field):
+            return Case(
+                *[
+                    When(pk=talk.pk, then=Value(getattr(talk, attribute)))
+                    for talk in talks
+                ],
+                output_field=output_field,
+            )
+
+        updated = now()
+        schedule.talks.filter(pk__in=[talk.pk for talk in talks]).update(
+            start=values('start', DateTimeField()),
+            end=values('end', DateTimeField()),
+            room=values('room_id', IntegerField()),
+            updated=updated,
+        )
+        for talk in talks:
+            talk.updated = updated
+        other_talks = list(
+            schedule.talks.filter(
+                Q(room_id__in=room_ids) | Q(submission__speakers__in=speaker_ids),
+                start__isnull=False,
+            )
+            .exclude(pk__in=[talk.pk for talk in talks])
+            .distinct()
+            .select_related('submission', 'submission__submission_type')
+            .prefetch_related('submission__speakers')
+        )
+        schedule.get_talk_warnings(talks + other_talks)
+        submissions_url = request.event.orga_urls.submissions
+        return JsonResponse(
+            {
+                'results': [serialize_slot(talk, submissions_url) for talk in talks],
+                'warnings': {talk.pk: talk.warnings for talk in other_talks},
+            }
+        )
 
 
 class QuickScheduleView(PermissionRequired, UpdateView):
@@ -116,7 +116,7 @@ class User(PermissionsMixin, AbstractBaseUser):
         self.email = self.email.lower()
         if not self.code:
             assign_code(self)
-        return super().save(args, kwargs)
+        return super().save(*args, **kwargs)
 
     def event_profile(self, event):
         return self.profiles.get_or_create(event=event)[0]
@@ -3,14 +3,16 @@ from datetime import datetime, time, timedelta
 from urllib.parse import urlparse
 
 import pytz
-import vobject
+from django.db.models import Prefetch
 from django.template.loader import get_template
 from django.utils.functional import cached_property
 from i18nfield.utils import I18nJSONEncoder
 
 from pretalx import __version__
 from pretalx.common.exporter import BaseExporter
+from pretalx.common.ical import build_calendar
 from pretalx.common.urls import get_base_url
+from pretalx.person.models import SpeakerProfile
 
 
 class ScheduleData(BaseExporter):
@@ -34,11 +36,24 @@ class ScheduleData(BaseExporter):
         tz = pytz.timezone(event.timezone)
 
         talks = (
-            schedule.talks.filter(is_visible=True)
-            .select_related('submission', 'submission__event', 'room')
-            .prefetch_related('submission__speakers')
+            schedule.resolved_talks.filter(is_visible=True)
+            .select_related(
+                'submission', 'submission__track', 'submission__submission_type', 'room'
+            )
+            .prefetch_related(
+                'submission__speakers',
+                Prefetch(
+                    'submission__speakers__profiles',
+                    queryset=SpeakerProfile.objects.filter(event=event),
+                    to_attr='event_profiles',
+                ),
+            )
             .order_by('start')
         )
+        if getattr(self, 'is_orga', False):
+            talks = talks.prefetch_related(
+                'submission__answers__options', 'submission__speakers__answers__options'
+            )
         data = {
             current_date.date(): {
                 'index': index + 1,
@@ -61,6 +76,8 @@ class ScheduleData(BaseExporter):
         for talk in talks:
             if not talk.start or not talk.room:
                 continue
+            # Sharing the event object saves loading its settings for each talk
+            talk.submission.event = event
             talk_date = talk.start.astimezone(tz).date()
             if talk.start.astimezone(tz).hour < 3 and talk_date != event.date_from:
                 talk_date -= timedelta(days=1)
@@ -87,6 +104,23 @@ class ScheduleData(BaseExporter):
             )
         return data.values()
 
+    def render_days(self, template_name, day_template_name, closing_tag, context):
+        """Render the export from ``template_name`` one day at a time, so that
+        large schedules can be streamed without being held in memory as a
+        whole.
+
+        The template includes ``day_template_name`` for each day at the start
+        of the line containing ``closing_tag``, so we render it without any
+        days, and send the fragments of all days in between."""
+        data = self.data  # Fail before the response starts if this fails
+        document = get_template(template_name).render(context={**context, 'data': []})
+        split = document.rindex('\n', 0, document.rindex(closing_tag)) + 1
+        yield document[:split]
+        day_template = get_template(day_template_name)
+        for day in data:
+            yield day_template.render(context={**context, 'day': day})
+        yield document[split:]
+
 
 class FrabXmlExporter(ScheduleData):
     identifier = 'schedule.xml'
@@ -95,17 +129,31 @@ class FrabXmlExporter(ScheduleData):
     show_qrcode = True
     icon = 'fa-code'
 
-    def render(self, **kwargs):
-        context = {
+    def get_context(self):
+        return {
             'data': self.data,
             'metadata': self.metadata,
             'schedule': self.schedule,
             'event': self.event,
             'version': __version__,
         }
-        content = get_template('agenda/schedule.xml').render(context=context)
+
+    def render(self, **kwargs):
+        content = get_template('agenda/schedule.xml').render(context=self.get_context())
         return f'{self.event.slug}-schedule.xml', 'text/xml', content
 
+    def render_stream(self, **kwargs):
+        return (
+            f'{self.event.slug}-schedule.xml',
+            'text/xml',
+            self.render_days(
+                'agenda/schedule.xml',
+                'agenda/schedule_day.xml',
+                '</schedule>',
+                self.get_context(),
+            ),
+        )
+
 
 class FrabXCalExporter(ScheduleData):
     identifier = 'schedule.xcal'
@@ -113,12 +161,26 @@ class FrabXCalExporter(ScheduleData):
     public = True
     icon = 'fa-calendar'
 
-    def render(self, **kwargs):
+    def get_context(self):
         url = get_base_url(self.event)
-        context = {'data': self.data, 'url': url, 'domain': urlparse(url).netloc}
-        content = get_template('agenda/schedule.xcal').render(context=context)
+        return {'data': self.data, 'url': url, 'domain': urlparse(url).netloc}
+
+    def render(self, **kwargs):
+        content = get_template('agenda/schedule.xcal').render(context=self.get_context())
         return f'{self.event.slug}.xcal', 'text/xml', content
 
+    def render_stream(self, **kwargs):
+        return (
+            f'{self.event.slug}.xcal',
+            'text/xml',
+            self.render_days(
+                'agenda/schedule.xcal',
+                'agenda/schedule_day.xcal',
+                '</vcalendar>',
+                self.get_context(),
+            ),
+        )
+
 
 class FrabJsonExporter(ScheduleData):
     identifier = 'schedule.json'
@@ -175,15 +237,13 @@ class FrabJsonExporter(ScheduleData):
                                             'id': person.id,
                                             'public_name': person.get_display_name(),
                                             'biography': getattr(
-                                                person.profiles.filter(
-                                                    event=self.event
-                                                ).first(),
+                                                next(iter(person.event_profiles), None),
                                                 'biography',
                                                 '',
                                             ),
                                             'answers': [
                                                 {
-                                                    'question': answer.question.id,
+                                                    'question': answer.question_id,
                                                     'answer': answer.answer,
                                                     'options': [
                                                         option.answer
@@ -201,7 +261,7 @@ class FrabJsonExporter(ScheduleData):
                                     'attachments': [],
                                     'answers': [
                                         {
-                                            'question': answer.question.id,
+                                            'question': answer.question_id,
                                             'answer': answer.answer,
                                             'options': [
                                                 option.answer
@@ -241,18 +301,26 @@ class ICalExporter(BaseExporter):
         self.schedule = schedule
 
     def render(self, **kwargs):
+        file_name, file_type, content = self.render_stream(**kwargs)
+        return file_name, file_type, ''.join(content)
+
+    def render_stream(self, **kwargs):
         netloc = urlparse(get_base_url(self.event)).netloc
-        cal = vobject.iCalendar()
-        cal.add('prodid').value = '-//pretalx//{}//'.format(netloc)
-        creation_time = datetime.now(pytz.utc)
+        return f'{self.event.slug}.ics', 'text/calendar', build_calendar(
+            prodid=f'-//pretalx//{netloc}//',
+            events=self._events(netloc),
+            zone=self.event.timezone,
+        )
 
+    def _events(self, netloc):
+        creation_time = datetime.now(pytz.utc)
         talks = (
-            self.schedule.talks.filter(is_visible=True)
+            self.schedule.resolved_talks.filter(is_visible=True)
             .prefetch_related('submission__speakers')
             .select_related('submission', 'room')
             .order_by('start')
         )
         for talk in talks:
-            talk.build_ical(cal, creation_time=creation_time, netloc=netloc)
-
-        return f'{self.event.slug}.ics', 'text/calendar', cal.serialize()
+            # Sharing the event object saves loading its settings for each talk
+            talk.submission.event = self.event
+            yield talk.build_ical(creation_time=creation_time, netloc=netloc)
@@ -0,0 +1,121 @@
+from bisect import bisect_right
+from heapq import merge
+from typing import Iterable, List, Tuple
+
+Interval = Tuple
+
+
+def overlaps(one: Interval, other: Interval, strict: bool) -> bool:
+    """ Test if two (start, end) intervals overlap. Includes direct adjacency, if not in strict mode """
+    if strict:
+        return (
+            (one[0] <= other[0] < one[1])
+            or (one[0] < other[1] <= one[1])
+            or (other[0] <= one[0] < other[1])
+            or (other[0] < one[1] <= other[1])
+        )
+    return (
+        (one[0] <= other[0] <= one[1])
+        or (one[0] <= other[1] <= one[1])
+        or (other[0] <= one[0] <= other[1])
+        or (other[0] <= one[1] <= other[1])
+    )
+
+
+class IntervalSet:
+    """A set of (start, end) intervals, stored as a sorted list of disjoint
+    intervals. Overlapping and adjacent intervals are merged on creation.
+
+    Union, intersection and difference walk both sorted lists side by side
+    and run in linear time. Intervals can be any comparable values, usually
+    datetimes."""
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        self.intervals = self._merge(sorted(intervals, key=lambda interval: interval[0]))
+
+    @classmethod
+    def _from_merged(cls, intervals: List[Interval]) -> 'IntervalSet':
+        result = cls.__new__(cls)
+        result.intervals = intervals
+        return result
+
+    @staticmethod
+    def _merge(intervals: Iterable[Interval]) -> List[Interval]:
+        """ Merge a list of intervals which is sorted by start """
+        result = []
+        for interval in intervals:
+            if result and overlaps(result[-1], interval, False):
+                last = result[-1]
+                result[-1] = (min(last[0], interval[0]), max(last[1], interval[1]))
+            else:
+                result.append(tuple(interval))
+        return result
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    def __eq__(self, other):
+        return isinstance(other, IntervalSet) and self.intervals == other.intervals
+
+    def __repr__(self):
+        return f'IntervalSet({self.intervals})'
+
+    def union(self, other: 'IntervalSet') -> 'IntervalSet':
+        """ Return the intervals which are covered by at least one of the two sets """
+        return self._from_merged(
+            self._merge(merge(self.intervals, other.intervals, key=lambda i: i[0]))
+        )
+
+    def intersection(self, other: 'IntervalSet') -> 'IntervalSet':
+        """ Return the intervals which are covered by both sets """
+        result = []
+        mine, theirs = self.intervals, other.intervals
+        i = j = 0
+        while i < len(mine) and j < len(theirs):
+            one, two = mine[i], theirs[j]
+            if overlaps(one, two, True):
+                result.append((max(one[0], two[0]), min(one[1], two[1])))
+            if one[1] < two[1]:
+                i += 1
+            else:
+                j += 1
+        return self._from_merged(result)
+
+    def difference(self, other: 'IntervalSet') -> 'IntervalSet':
+        """ Return the intervals which are covered by this set, but not by the other one """
+        result = []
+        theirs = other.intervals
+        j = 0
+        for start, end in self.intervals:
+            while j < len(theirs) and theirs[j][1] <= start:
+                j += 1
+            k = j
+            while k < len(theirs) and theirs[k][0] < end:
+                if theirs[k][0] > start:
+                    result.append((start, theirs[k][0]))
+                start = max(start, theirs[k][1])
+                k += 1
+            if start < end:
+                result.append((start, end))
+        return self._from_merged(result)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def contains(self, start, end) -> bool:
+        """ Test if the interval from start to end is fully covered by this set """
+        index = bisect_right(self.intervals, (start, end))
+        # An interval with the same start, but a later end, sorts after (start, end)
+        if index < len(self.intervals) and self.intervals[index][0] == start:
+            index += 1
+        if not index:
+            return False
+        first, last = self.intervals[index - 1]
+        return first <= start and last >= end
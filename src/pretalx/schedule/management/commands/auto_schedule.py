@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pretalx.event.models import Event
+from pretalx.schedule.services import auto_schedule
+
+
+class Command(BaseCommand):
+    help = 'Place all unscheduled talks of an event in the current draft schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event', type=str)
+
+    def handle(self, *args, **options):
+        event_slug = options.get('event')
+        try:
+            event = Event.objects.get(slug__iexact=event_slug)
+        except Event.DoesNotExist:
+            raise CommandError(f'Could not find event with slug "{event_slug}".')
+
+        begin = time.monotonic()
+        placed, unplaced = auto_schedule(event.wip_schedule)
+        duration = time.monotonic() - begin
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Scheduled {len(placed)} of {len(placed) + len(unplaced)} talks in {duration:.2f} seconds.'
+            )
+        )
+        for talk in unplaced:
+            self.stdout.write(
+                self.style.WARNING(f'Could not find a place for "{talk.submission.title}".')
+            )
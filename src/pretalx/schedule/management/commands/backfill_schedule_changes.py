@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from pretalx.event.models import Event
+from pretalx.schedule.models import Schedule
+
+
+class Command(BaseCommand):
+    help = 'Store the changelog of already released schedule versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=str)
+        parser.add_argument('--force', action='store_true', dest='force')
+
+    def handle(self, *args, **options):
+        schedules = Schedule.objects.filter(version__isnull=False)
+        event = options.get('event')
+        if event:
+            try:
+                event = Event.objects.get(slug__iexact=event)
+            except Event.DoesNotExist:
+                self.stdout.write(self.style.ERROR('This event does not exist.'))
+                return
+            schedules = schedules.filter(event=event)
+        if not options.get('force'):
+            schedules = schedules.filter(changes_data__isnull=True)
+
+        count = 0
+        for schedule in schedules.select_related('event').order_by('event', 'published'):
+            schedule.changes_data = None
+            schedule.changes_data = json.dumps(schedule.serialize_changes())
+            schedule.save(update_fields=['changes_data'])
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Stored the changes of {count} schedule versions.'))
@@ -0,0 +1,131 @@
+import time
+import tracemalloc
+from datetime import datetime
+from urllib.parse import urlparse
+
+import pytz
+import vobject
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+
+from pretalx.common.urls import get_base_url
+from pretalx.event.models import Event
+from pretalx.schedule.exporters import FrabXCalExporter, FrabXmlExporter, ICalExporter
+
+
+def consume(chunks):
+    """Pass over the chunks of a streamed export like a client would,
+    without keeping them around."""
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+    return size
+
+
+def render_vobject_calendar(event, schedule):
+    """Build the iCal export with vobject, the way ``ICalExporter`` used
+    to."""
+    netloc = urlparse(get_base_url(event)).netloc
+    tz = pytz.timezone(event.timezone)
+    creation_time = datetime.now(pytz.utc)
+    calendar = vobject.iCalendar()
+    calendar.add('prodid').value = f'-//pretalx//{netloc}//'
+    talks = (
+        schedule.resolved_talks.filter(is_visible=True)
+        .prefetch_related('submission__speakers')
+        .select_related('submission', 'room')
+        .order_by('start')
+    )
+    for talk in talks:
+        if not talk.start or not talk.end or not talk.room:
+            continue
+        submission = talk.submission
+        submission.event = event
+        vevent = calendar.add('vevent')
+        vevent.add('summary').value = (
+            f'{submission.title} - {submission.display_speaker_names}'
+        )
+        vevent.add('dtstamp').value = creation_time
+        vevent.add('location').value = str(talk.room.name)
+        vevent.add('uid').value = f'pretalx-{event.slug}-{submission.code}@{netloc}'
+        vevent.add('dtstart').value = talk.start.astimezone(tz)
+        vevent.add('dtend').value = talk.end.astimezone(tz)
+        vevent.add('description').value = submission.abstract or ''
+        vevent.add('url').value = submission.urls.public.full()
+    return calendar.serialize()
+
+
+class Command(BaseCommand):
+    help = 'Compare the time and peak memory of the schedule export writers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event', type=str)
+        parser.add_argument('--schedule', type=str)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def get_candidates(self, event, schedule):
+        """Return pairs of a name and a function rendering an export, the
+        previous implementation first."""
+
+        def template(exporter_class, template_name):
+            def render():
+                exporter = exporter_class(event, schedule=schedule)
+                return get_template(template_name).render(
+                    context=exporter.get_context()
+                )
+
+            return render
+
+        def stream(exporter_class):
+            def render():
+                exporter = exporter_class(event, schedule=schedule)
+                return consume(exporter.render_stream()[2])
+
+            return render
+
+        return [
+            ('XML, template', template(FrabXmlExporter, 'agenda/schedule.xml')),
+            ('XML, streamed', stream(FrabXmlExporter)),
+            ('xCal, template', template(FrabXCalExporter, 'agenda/schedule.xcal')),
+            ('xCal, streamed', stream(FrabXCalExporter)),
+            ('iCal, vobject', lambda: render_vobject_calendar(event, schedule)),
+            ('iCal, streamed', stream(ICalExporter)),
+        ]
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(slug__iexact=options['event'])
+        except Event.DoesNotExist:
+            self.stdout.write(self.style.ERROR('This event does not exist.'))
+            return
+        version = options.get('schedule')
+        schedule = (
+            event.schedules.filter(version=version).first()
+            if version
+            else event.current_schedule
+        )
+        if not schedule:
+            self.stdout.write(self.style.ERROR('This schedule does not exist.'))
+            return
+
+        talk_count = schedule.talks.filter(is_visible=True).count()
+        self.stdout.write(
+            f'Exporting {talk_count} talks of {event.slug}, version {schedule.version}, '
+            f'best of {options["repeat"]} runs:'
+        )
+        for name, render in self.get_candidates(event, schedule):
+            render()  # Warm up caches and template loaders
+            durations = []
+            for __ in range(options['repeat']):
+                start = time.perf_counter()
+                render()
+                durations.append(time.perf_counter() - start)
+            # Tracing allocations slows everything down, so we measure the
+            # memory in a separate run.
+            tracemalloc.start()
+            render()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.stdout.write(
+                f'{name:<20} {min(durations):8.3f} s {peak / 1024 / 1024:10.2f} MiB'
+            )
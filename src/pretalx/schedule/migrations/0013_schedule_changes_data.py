@@ -0,0 +1,18 @@
+# Generated by Django 2.1.15 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0012_auto_20190303_2358'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='changes_data',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.1.15 on 2026-10-16 20:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0013_schedule_changes_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='delta_base',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='delta_schedules', to='schedule.Schedule'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='delta_excluded',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.15 on 2026-10-16 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0014_schedule_delta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='talkslot',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.db import models
 from django.utils.functional import cached_property
 
 from pretalx.common.mixins import LogMixin
+from pretalx.schedule.intervals import IntervalSet, overlaps
 
 zerotime = datetime.time(0, 0)
 
@@ -59,19 +60,7 @@ class Availability(LogMixin, models.Model):
         if not isinstance(other, Availability):
             raise Exception('Please provide an Availability object')
 
-        if strict:
-            return (
-                (self.start <= other.start < self.end)
-                or (self.start < other.end <= self.end)
-                or (other.start <= self.start < other.end)
-                or (other.start < self.end <= other.end)
-            )
-        return (
-            (self.start <= other.start <= self.end)
-            or (self.start <= other.end <= self.end)
-            or (other.start <= self.start <= other.end)
-            or (other.start <= self.end <= other.end)
-        )
+        return overlaps((self.start, self.end), (other.start, other.end), strict)
 
     def contains(self, other: 'Availability') -> bool:
         return self.start <= other.start and self.end >= other.end
@@ -107,57 +96,38 @@ class Availability(LogMixin, models.Model):
         return self.intersect_with(other)
 
     @classmethod
-    def union(cls, availabilities: List['Availability']) -> List['Availability']:
-        """ Return the minimal list of Availability objects which are covered by at least one given Availability """
-        if not availabilities:
-            return []
-
-        availabilities = sorted(availabilities, key=lambda a: a.start)
-        result = [availabilities[0]]
-        availabilities = availabilities[1:]
-
-        for avail in availabilities:
-            if avail.overlaps(result[-1], False):
-                result[-1] = result[-1].merge_with(avail)
-            else:
-                result.append(avail)
-
-        return result
-
-    @classmethod
-    def _pair_intersection(
-        cls,
-        availabilities_a: List['Availability'],
-        availabilities_b: List['Availability'],
+    def _from_intervals(
+        cls, intervals: IntervalSet, availabilities: List['Availability'] = ()
     ) -> List['Availability']:
-        """ return the list of Availabilities, which are covered by each of the given sets """
-        result = []
-
-        # yay for O(b*a) time! I am sure there is some fancy trick to make this faster,
-        # but we're dealing with less than 100 items in total, sooo.. ¯\_(ツ)_/¯
-        for a in availabilities_a:
-            for b in availabilities_b:
-                if a.overlaps(b, True):
-                    result.append(a.intersect_with(b))
+        """ Turn an IntervalSet into Availabilities, reusing given Availabilities with identical ranges """
+        known = {}
+        for availability in availabilities:
+            known.setdefault((availability.start, availability.end), availability)
+        return [
+            known.get(interval) or Availability(start=interval[0], end=interval[1])
+            for interval in intervals
+        ]
 
-        return result
+    @classmethod
+    def union(cls, availabilities: List['Availability']) -> List['Availability']:
+        """ Return the minimal list of Availability objects which are covered by at least one given Availability """
+        intervals = IntervalSet((avail.start, avail.end) for avail in availabilities)
+        return cls._from_intervals(intervals, availabilities)
 
     @classmethod
     def intersection(
         cls, *availabilitysets: List['Availability']
     ) -> List['Availability']:
         """ Return the list of Availabilities which are covered by all of the given sets """
-
-        # get rid of any overlaps and unmerged ranges in each set
-        availabilitysets = [cls.union(avialset) for avialset in availabilitysets]
-        # bail out for obvious cases (there are no sets given, one of the sets is empty)
         if not availabilitysets:
             return []
-        if not all(availabilitysets):
-            return []
-        # start with the very first set ...
-        result = availabilitysets[0]
-        for availset in availabilitysets[1:]:
-            # ... subtract each of the other sets
-            result = cls._pair_intersection(result, availset)
-        return result
+        if len(availabilitysets) == 1:
+            return cls.union(availabilitysets[0])
+        intervalsets = [
+            IntervalSet((avail.start, avail.end) for avail in availset)
+            for availset in availabilitysets
+        ]
+        result = intervalsets[0]
+        for intervalset in intervalsets[1:]:
+            result = result & intervalset
+        return cls._from_intervals(result)
@@ -1,15 +1,24 @@
+import json
+from bisect import bisect_right
 from collections import defaultdict
 from contextlib import suppress
+from datetime import timedelta
+from heapq import heappop, heappush
 from urllib.parse import quote
 
 import pytz
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
 from django.db import models, transaction
+from django.db.models import Q
 from django.template.loader import get_template
+from django.utils.dateparse import parse_datetime
 from django.utils.functional import cached_property
 from django.utils.timezone import now, override as tzoverride
 from django.utils.translation import override, ugettext_lazy as _
+from i18nfield.strings import LazyI18nString
 
-from pretalx.agenda.tasks import export_schedule_html
+from pretalx.agenda.tasks import prerender_exports, request_export_schedule_html
 from pretalx.common.mixins import LogMixin
 from pretalx.common.urls import EventUrls
 from pretalx.mail.context import template_context_from_event
@@ -25,6 +34,15 @@ class Schedule(LogMixin, models.Model):
         max_length=190, null=True, blank=True, verbose_name=_('version')
     )
     published = models.DateTimeField(null=True, blank=True)
+    changes_data = models.TextField(null=True, blank=True)
+    delta_base = models.ForeignKey(
+        to='schedule.Schedule',
+        on_delete=models.PROTECT,
+        related_name='delta_schedules',
+        null=True,
+        blank=True,
+    )
+    delta_excluded = models.TextField(null=True, blank=True)
 
     class Meta:
         ordering = ('-published',)
@@ -50,24 +68,34 @@ class Schedule(LogMixin, models.Model):
         self.published = now()
         self.save(update_fields=['published', 'version'])
         self.log_action('pretalx.schedule.release', person=user, orga=True)
+        self.event.invalidate_export_cache()
 
         wip_schedule = Schedule.objects.create(event=self.event)
 
         # Set visibility
+        # Queryset updates skip auto_now, so we set the change time ourselves
         self.talks.filter(
             start__isnull=False,
             submission__state=SubmissionStates.CONFIRMED,
             is_visible=False,
-        ).update(is_visible=True)
+        ).update(is_visible=True, updated=now())
         self.talks.filter(is_visible=True).exclude(
             start__isnull=False, submission__state=SubmissionStates.CONFIRMED
-        ).update(is_visible=False)
+        ).update(is_visible=False, updated=now())
+
+        with suppress(AttributeError):
+            del self.changes
+        self.changes_data = json.dumps(self.serialize_changes())
+        self.save(update_fields=['changes_data'])
 
         talks = []
         for talk in self.talks.select_related('submission', 'room').all():
             talks.append(talk.copy_to_schedule(wip_schedule, save=False))
         TalkSlot.objects.bulk_create(talks)
 
+        if self.event.settings.compact_schedule_versions and self.previous_schedule:
+            self.previous_schedule.compact(base=self)
+
         if notify_speakers:
             self.notify_speakers()
 
@@ -77,7 +105,14 @@ class Schedule(LogMixin, models.Model):
             del wip_schedule.event.current_schedule
 
         if self.event.settings.export_html_on_schedule_release:
-            export_schedule_html.apply_async(kwargs={'event_id': self.event.id})
+            request_export_schedule_html(self.event)
+        # Warm the export cache before the first visitors arrive, unless there
+        # is no cache to warm. The tasks need to see the new schedule version.
+        if not isinstance(caches['default'], DummyCache):
+            event_id = self.event.id
+            transaction.on_commit(
+                lambda: prerender_exports.apply_async(kwargs={'event_id': event_id})
+            )
 
         return self, wip_schedule
 
@@ -89,10 +124,10 @@ class Schedule(LogMixin, models.Model):
             raise Exception('Cannot unfreeze schedule version: not released yet.')
 
         # collect all talks, which have been added since this schedule (#72)
-        submission_ids = self.talks.all().values_list('submission_id', flat=True)
+        submission_ids = self.resolved_talks.values_list('submission_id', flat=True)
         talks = self.event.wip_schedule.talks.exclude(
             submission_id__in=submission_ids
-        ).union(self.talks.all())
+        ).union(self.resolved_talks)
 
         wip_schedule = Schedule.objects.create(event=self.event)
         new_talks = []
@@ -108,9 +143,114 @@ class Schedule(LogMixin, models.Model):
 
         return self, wip_schedule
 
+    @staticmethod
+    def _slot_keys(queryset):
+        """Return the pks of a queryset's slots, grouped by submission and
+        sorted by everything that makes a slot distinct."""
+        result = defaultdict(list)
+        for pk, submission_id, *key in queryset.values_list(
+            'pk', 'submission_id', 'room_id', 'start', 'end', 'is_visible'
+        ):
+            result[submission_id].append((tuple(str(value) for value in key), pk))
+        for slots in result.values():
+            slots.sort()
+        return result
+
+    @transaction.atomic
+    def compact(self, base):
+        """Turn this released schedule version into a delta against the
+        ``base`` version, which needs to be a full schedule version.
+
+        All slots of a submission are removed if the ``base`` version contains
+        exactly the same slots for it. Submissions without slots in this
+        version are recorded in ``delta_excluded``. ``resolved_talks`` can
+        then rebuild the full version from the chain of delta bases."""
+        from pretalx.schedule.models import TalkSlot
+
+        if not self.version or self.delta_base_id or base.delta_base_id:
+            return
+        own_slots = self._slot_keys(self.talks.all())
+        base_slots = self._slot_keys(base.talks.all())
+        replacements = {}
+        for submission_id, slots in own_slots.items():
+            other_slots = base_slots.get(submission_id, [])
+            if [key for key, _ in slots] == [key for key, _ in other_slots]:
+                replacements.update(
+                    {pk: other_pk for (_, pk), (_, other_pk) in zip(slots, other_slots)}
+                )
+        TalkSlot.objects.filter(pk__in=replacements.keys()).delete()
+
+        # Stored changes of this and older versions may refer to the removed slots
+        for schedule in self.event.schedules.filter(changes_data__isnull=False):
+            data = json.loads(schedule.changes_data)
+            for key in ('new_talks', 'canceled_talks'):
+                data[key] = [replacements.get(pk, pk) for pk in data[key]]
+            schedule.changes_data = json.dumps(data)
+            if schedule == self:
+                self.changes_data = schedule.changes_data
+            else:
+                schedule.save(update_fields=['changes_data'])
+        self.delta_base = base
+        self.delta_excluded = json.dumps(sorted(base_slots.keys() - own_slots.keys()))
+        self.save(update_fields=['changes_data', 'delta_base', 'delta_excluded'])
+
+    def _resolve_chain(self):
+        """Return the ids of this schedule version and its chain of delta
+        bases, each with the submission ids excluded from its base."""
+        schedules = {
+            pk: (delta_base_id, json.loads(delta_excluded or '[]'))
+            for pk, delta_base_id, delta_excluded in self.event.schedules.filter(
+                version__isnull=False
+            ).values_list('pk', 'delta_base_id', 'delta_excluded')
+        }
+        chain = [self.pk]
+        while schedules[chain[-1]][0]:
+            chain.append(schedules[chain[-1]][0])
+        return [(pk, schedules[pk][1]) for pk in chain]
+
+    @cached_property
+    def resolved_talks(self):
+        """All slots of this schedule version.
+
+        Compacted versions only contain the slots that differ from their delta
+        base, so their slots are collected along the chain of delta bases
+        instead: each version contributes the slots of all submissions that
+        have no slots in the versions before it in the chain, and that none
+        of these versions exclude. The chain is cached until the next
+        schedule release. Please note that resolved slots may belong to a
+        newer version, so don't rely on ``slot.schedule``."""
+        from pretalx.schedule.models import TalkSlot
+
+        if not self.delta_base_id:
+            return self.talks.all()
+        current_schedule = self.event.current_schedule
+        cache_key = f'schedule_{self.pk}_chain_{current_schedule.pk if current_schedule else None}'
+        chain = cache.get(cache_key)
+        if chain is None:
+            chain = self._resolve_chain()
+            cache.set(cache_key, chain)
+
+        condition = Q()
+        previous = []
+        excluded = set()
+        for schedule_id, delta_excluded in chain:
+            own_slots = Q(schedule_id=schedule_id)
+            if previous:
+                own_slots &= ~Q(
+                    submission_id__in=TalkSlot.objects.filter(
+                        schedule_id__in=previous
+                    ).values('submission_id')
+                )
+            if excluded:
+                own_slots &= ~Q(submission_id__in=sorted(excluded))
+            condition |= own_slots
+            previous.append(schedule_id)
+            excluded.update(delta_excluded)
+        return TalkSlot.objects.filter(condition)
+
     @cached_property
     def scheduled_talks(self):
-        return self.talks.select_related(
+        return self.resolved_talks.select_related(
             'submission', 'submission__event', 'room',
         ).filter(
             room__isnull=False, start__isnull=False, is_visible=True
@@ -131,14 +271,21 @@ class Schedule(LogMixin, models.Model):
             queryset = queryset.filter(published__lt=self.published)
         return queryset.order_by('-published').first()
 
-    def _handle_submission_move(self, submission_pk, old_slots, new_slots):
+    def _handle_submission_move(self, old_slots, new_slots):
+        """Diff the slot lists of a single submission in both schedule
+        versions.
+
+        Slots present at the same room and start time in both versions are
+        ignored. Surplus slots on either side are reported as new or
+        canceled, the remaining ones are paired up in chronological order and
+        reported as moved."""
         new = []
         canceled = []
         moved = []
-        all_old_slots = list(old_slots.filter(submission__pk=submission_pk))
-        all_new_slots = list(new_slots.filter(submission__pk=submission_pk))
-        old_slots = [slot for slot in all_old_slots if not any(slot.is_same_slot(other_slot) for other_slot in all_new_slots)]
-        new_slots = [slot for slot in all_new_slots if not any(slot.is_same_slot(other_slot) for other_slot in all_old_slots)]
+        old_keys = {(slot.room_id, slot.start) for slot in old_slots}
+        new_keys = {(slot.room_id, slot.start) for slot in new_slots}
+        old_slots = [slot for slot in old_slots if (slot.room_id, slot.start) not in new_keys]
+        new_slots = [slot for slot in new_slots if (slot.room_id, slot.start) not in old_keys]
         diff = len(old_slots) - len(new_slots)
         if diff > 0:
             canceled = old_slots[:diff]
@@ -147,9 +294,7 @@ class Schedule(LogMixin, models.Model):
             diff = -diff
             new = new_slots[:diff]
             new_slots = new_slots[diff:]
-        for move in zip(old_slots, new_slots):
-            old_slot = move[0]
-            new_slot = move[1]
+        for old_slot, new_slot in zip(old_slots, new_slots):
             moved.append({
                 'submission': new_slot.submission,
                 'old_start': old_slot.start.astimezone(self.tz),
@@ -160,12 +305,28 @@ class Schedule(LogMixin, models.Model):
             })
         return new, canceled, moved
 
+    @staticmethod
+    def _group_slots(queryset):
+        """Load all slots of a queryset in one query, and return them grouped by
+        submission and sorted by start time."""
+        result = defaultdict(list)
+        for slot in queryset.prefetch_related('submission__speakers').order_by(
+            'start', 'pk'
+        ):
+            result[slot.submission_id].append(slot)
+        return result
+
     @cached_property
     def tz(self):
         return pytz.timezone(self.event.timezone)
 
     @cached_property
     def changes(self):
+        if self.changes_data:
+            return self._load_changes(json.loads(self.changes_data))
+        return self._compute_changes()
+
+    def _compute_changes(self):
         result = {
             'count': 0,
             'action': 'update',
@@ -177,39 +338,16 @@ class Schedule(LogMixin, models.Model):
             result['action'] = 'create'
             return result
 
-        old_slots = self.previous_schedule.scheduled_talks
-        new_slots = self.scheduled_talks
-        old_slot_set = set(old_slots.values_list('submission', 'room', 'start', named=True))
-        new_slot_set = set(new_slots.values_list('submission', 'room', 'start', named=True))
-        old_submissions = set(old_slots.values_list('submission__id', flat=True))
-        new_submissions = set(new_slots.values_list('submission__id', flat=True))
-        handled_submissions = set()
-
-        moved_or_missing = old_slot_set - new_slot_set
-        moved_or_new = new_slot_set - old_slot_set
-
-        for entry in moved_or_missing:
-            if entry.submission in handled_submissions:
-                continue
-            if entry.submission not in new_submissions:
-                result['canceled_talks'] += list(old_slots.filter(submission__pk=entry.submission))
-            else:
-                new, canceled, moved = self._handle_submission_move(entry.submission, old_slots, new_slots)
-                result['new_talks'] += new
-                result['canceled_talks'] += canceled
-                result['moved_talks'] += moved
-            handled_submissions.add(entry.submission)
-        for entry in moved_or_new:
-            if entry.submission in handled_submissions:
-                continue
-            if entry.submission not in old_submissions:
-                result['new_talks'] += list(new_slots.filter(submission__pk=entry.submission))
-            else:
-                new, canceled, moved = self._handle_submission_move(entry.submission, old_slots, new_slots)
-                result['new_talks'] += new
-                result['canceled_talks'] += canceled
-                result['moved_talks'] += moved
-            handled_submissions.add(entry.submission)
+        old_slots = self._group_slots(self.previous_schedule.scheduled_talks)
+        new_slots = self._group_slots(self.scheduled_talks)
+
+        for submission_pk in sorted(old_slots.keys() | new_slots.keys()):
+            new, canceled, moved = self._handle_submission_move(
+                old_slots.get(submission_pk, []), new_slots.get(submission_pk, [])
+            )
+            result['new_talks'] += new
+            result['canceled_talks'] += canceled
+            result['moved_talks'] += moved
 
         result['count'] = (
             len(result['new_talks'])
@@ -218,6 +356,248 @@ class Schedule(LogMixin, models.Model):
         )
         return result
 
+    def serialize_changes(self):
+        """Return a compact, JSON serializable representation of
+        ``self.changes``, as stored in ``changes_data`` upon release."""
+        changes = self.changes
+        return {
+            'action': changes['action'],
+            'new_talks': [talk.pk for talk in changes['new_talks']],
+            'canceled_talks': [talk.pk for talk in changes['canceled_talks']],
+            'moved_talks': [
+                {
+                    'submission': talk['submission'].pk,
+                    'old_start': talk['old_start'].isoformat(),
+                    'new_start': talk['new_start'].isoformat(),
+                    'old_room': getattr(talk['old_room'], 'data', talk['old_room']),
+                    'new_room': getattr(talk['new_room'], 'data', talk['new_room']),
+                    'new_info': getattr(talk['new_info'], 'data', talk['new_info']),
+                }
+                for talk in changes['moved_talks']
+            ],
+        }
+
+    def _load_changes(self, data):
+        from pretalx.schedule.models import TalkSlot
+        from pretalx.submission.models import Submission
+
+        slots = TalkSlot.objects.select_related(
+            'submission', 'submission__event', 'room'
+        ).prefetch_related('submission__speakers').in_bulk(
+            data['new_talks'] + data['canceled_talks']
+        )
+        submissions = Submission.objects.select_related('event').prefetch_related(
+            'speakers'
+        ).in_bulk([talk['submission'] for talk in data['moved_talks']])
+        result = {
+            'action': data['action'],
+            'new_talks': [slots[pk] for pk in data['new_talks'] if pk in slots],
+            'canceled_talks': [
+                slots[pk] for pk in data['canceled_talks'] if pk in slots
+            ],
+            'moved_talks': [
+                {
+                    'submission': submissions[talk['submission']],
+                    'old_start': parse_datetime(talk['old_start']).astimezone(self.tz),
+                    'new_start': parse_datetime(talk['new_start']).astimezone(self.tz),
+                    'old_room': LazyI18nString(talk['old_room']),
+                    'new_room': LazyI18nString(talk['new_room']),
+                    'new_info': LazyI18nString(talk['new_info']),
+                }
+                for talk in data['moved_talks']
+                if talk['submission'] in submissions
+            ],
+        }
+        result['count'] = (
+            len(result['new_talks'])
+            + len(result['canceled_talks'])
+            + len(result['moved_talks'])
+        )
+        return result
+
+    @staticmethod
+    def _index_availabilities(availabilities):
+        """Turn a list of (start, end) tuples into a sorted list of starts and
+        the maximum end up to each position, for quick containment checks."""
+        availabilities = sorted(availabilities)
+        starts = [start for start, __ in availabilities]
+        max_ends = []
+        for __, end in availabilities:
+            max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+        return starts, max_ends
+
+    @staticmethod
+    def _is_contained(index, start, end):
+        starts, max_ends = index
+        position = bisect_right(starts, start)
+        return bool(position) and max_ends[position - 1] >= end
+
+    @staticmethod
+    def _find_collisions(slots):
+        """Takes an iterable of (start, end, pk) tuples and yields a (pk,
+        other_pk) pair for every two overlapping slots, in both directions.
+
+        Sorts the slots by start and sweeps over them, keeping the slots that
+        are still running in a heap ordered by their end."""
+        running = []
+        for start, end, pk in sorted(slots):
+            while running and running[0][0] <= start:
+                heappop(running)
+            for __, other_pk in running:
+                yield pk, other_pk
+                yield other_pk, pk
+            heappush(running, (end, pk))
+
+    def get_overlap_warnings(self, room_ids=None, speaker_ids=None):
+        """Find all talks in this schedule that overlap with another talk in
+        the same room, or with another talk of one of their speakers.
+
+        Loads all scheduled talks with a single query and returns a dictionary
+        of talk pk to warning list. If ``room_ids`` and ``speaker_ids`` are
+        given, only overlaps in these rooms and of these speakers are checked,
+        and only the talks concerned are loaded."""
+        slots = {}
+        rooms = defaultdict(set)
+        speakers = defaultdict(set)
+        speaker_names = {}
+        talks = self.talks.filter(start__isnull=False)
+        if room_ids is not None and speaker_ids is not None:
+            talks = talks.filter(
+                Q(room_id__in=room_ids) | Q(submission__speakers__in=speaker_ids)
+            )
+        for (
+            pk, room_id, start, end, title, duration, default_duration,
+            speaker_id, speaker_name,
+        ) in talks.values_list(
+            'pk', 'room_id', 'start', 'end', 'submission__title',
+            'submission__duration',
+            'submission__submission_type__default_duration',
+            'submission__speakers__id', 'submission__speakers__name',
+        ):
+            if pk not in slots:
+                if duration is None:
+                    duration = default_duration
+                end = end or start + timedelta(minutes=duration)
+                slots[pk] = (start, end, pk, title)
+            # Talks found through one of the given speakers may come with rooms
+            # and speakers that we only know partially, so we skip those.
+            if room_id and (room_ids is None or room_id in room_ids):
+                rooms[room_id].add(slots[pk][:3])
+            if speaker_id and (speaker_ids is None or speaker_id in speaker_ids):
+                speakers[speaker_id].add(slots[pk][:3])
+                speaker_names[speaker_id] = speaker_name
+
+        result = defaultdict(list)
+        for room_slots in rooms.values():
+            for pk, other_pk in self._find_collisions(room_slots):
+                result[pk].append(
+                    {
+                        'type': 'room_overlap',
+                        'talk': {'id': other_pk, 'title': slots[other_pk][3]},
+                        'message': _(
+                            'Another talk is scheduled in this room at the same time: {title}'
+                        ).format(title=slots[other_pk][3]),
+                    }
+                )
+        for speaker_id, speaker_slots in speakers.items():
+            name = speaker_names[speaker_id] or str(_('Unnamed user'))
+            for pk, other_pk in self._find_collisions(speaker_slots):
+                result[pk].append(
+                    {
+                        'type': 'speaker_overlap',
+                        'speaker': {'name': name, 'id': speaker_id},
+                        'talk': {'id': other_pk, 'title': slots[other_pk][3]},
+                        'message': _(
+                            '{speaker} is giving another talk at the same time: {title}'
+                        ).format(speaker=name, title=slots[other_pk][3]),
+                    }
+                )
+        return result
+
+    def get_talk_warnings(self, talks=None):
+        """Return the warnings of the given talks (by default, of all talks in
+        this schedule) as a dictionary of talk pk to warning list.
+
+        All relevant room and speaker availabilities are loaded at once, so
+        use this instead of ``TalkSlot.warnings`` when handling many talks.
+        Overlaps with other talks in this schedule are included, see
+        ``get_overlap_warnings``.
+        The warnings are cached as ``warnings`` on the given talk objects."""
+        from pretalx.schedule.models import Availability
+
+        all_talks = talks is None
+        if all_talks:
+            talks = self.talks.select_related('submission', 'room').prefetch_related(
+                'submission__speakers'
+            )
+        talks = [talk for talk in talks if talk.start]
+        room_ids = {talk.room_id for talk in talks if talk.room_id}
+        speaker_ids = {
+            speaker.pk for talk in talks for speaker in talk.submission.speakers.all()
+        }
+
+        room_availabilities = defaultdict(list)
+        speaker_availabilities = defaultdict(list)
+        for room_id, speaker_id, start, end in Availability.objects.filter(
+            Q(room_id__in=room_ids)
+            | Q(person__user_id__in=speaker_ids, person__event_id=self.event_id)
+        ).values_list('room_id', 'person__user_id', 'start', 'end'):
+            if room_id:
+                room_availabilities[room_id].append((start, end))
+            if speaker_id:
+                speaker_availabilities[speaker_id].append((start, end))
+        room_availabilities = {
+            key: self._index_availabilities(value)
+            for key, value in room_availabilities.items()
+        }
+        speaker_availabilities = {
+            key: self._index_availabilities(value)
+            for key, value in speaker_availabilities.items()
+        }
+
+        if all_talks:
+            overlap_warnings = self.get_overlap_warnings()
+        else:
+            overlap_warnings = self.get_overlap_warnings(
+                room_ids=room_ids, speaker_ids=speaker_ids
+            )
+
+        result = {}
+        for talk in talks:
+            warnings = []
+            start, end = talk.start, talk.real_end
+            if talk.room_id and not self._is_contained(
+                room_availabilities.get(talk.room_id, ([], [])), start, end
+            ):
+                warnings.append(
+                    {
+                        'type': 'room',
+                        'message': _(
+                            'The room is not available at the scheduled time.'
+                        ),
+                    }
+                )
+            for speaker in talk.submission.speakers.all():
+                availabilities = speaker_availabilities.get(speaker.pk)
+                if availabilities and not self._is_contained(
+                    availabilities, start, end
+                ):
+                    warnings.append(
+                        {
+                            'type': 'speaker',
+                            'speaker': {
+                                'name': speaker.get_display_name(),
+                                'id': speaker.pk,
+                            },
+                            'message': _(
+                                'A speaker is not available at the scheduled time.'
+                            ),
+                        }
+                    )
+            warnings += overlap_warnings.get(talk.pk, [])
+            result[talk.pk] = talk.warnings = warnings
+        return result
+
     @cached_property
     def warnings(self):
         warnings = {
@@ -226,14 +606,21 @@ class Schedule(LogMixin, models.Model):
             'unconfirmed': [],
             'no_track': [],
         }
-        for talk in self.talks.all():
+        use_tracks = self.event.settings.use_tracks
+        talks = list(
+            self.talks.select_related(
+                'submission', 'submission__track', 'room'
+            ).prefetch_related('submission__speakers')
+        )
+        talk_warnings = self.get_talk_warnings(talks)
+        for talk in talks:
             if not talk.start:
                 warnings['unscheduled'].append(talk)
-            elif talk.warnings:
+            elif talk_warnings.get(talk.pk):
                 warnings['talk_warnings'].append(talk)
             if talk.submission.state != SubmissionStates.CONFIRMED:
                 warnings['unconfirmed'].append(talk)
-            if talk.submission.event.settings.use_tracks and not talk.submission.track:
+            if use_tracks and not talk.submission.track:
                 warnings['no_track'].append(talk)
         return warnings
 
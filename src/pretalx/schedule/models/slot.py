@@ -4,8 +4,8 @@ from urllib.parse import urlparse
 import pytz
 from django.db import models
 from django.utils.functional import cached_property
-from django.utils.translation import ugettext_lazy as _
 
+from pretalx.common.ical import escape as ical_escape, fold, format_datetime
 from pretalx.common.mixins import LogMixin
 from pretalx.common.urls import get_base_url
 
@@ -27,6 +27,7 @@ class TalkSlot(LogMixin, models.Model):
     is_visible = models.BooleanField(default=False)
     start = models.DateTimeField(null=True)
     end = models.DateTimeField(null=True)
+    updated = models.DateTimeField(null=True, auto_now=True)
 
     def __str__(self):
         """Help when debugging."""
@@ -75,40 +76,7 @@ class TalkSlot(LogMixin, models.Model):
     def warnings(self):
         if not self.start:
             return []
-        warnings = []
-        availability = self.as_availability
-        if self.room:
-            if not any(
-                room_availability.contains(availability)
-                for room_availability in self.room.availabilities.all()
-            ):
-                warnings.append(
-                    {
-                        'type': 'room',
-                        'message': _(
-                            'The room is not available at the scheduled time.'
-                        ),
-                    }
-                )
-        for speaker in self.submission.speakers.all():
-            profile = speaker.event_profile(event=self.submission.event)
-            if profile.availabilities.exists() and not any(
-                speaker_availability.contains(availability)
-                for speaker_availability in profile.availabilities.all()
-            ):
-                warnings.append(
-                    {
-                        'type': 'speaker',
-                        'speaker': {
-                            'name': speaker.get_display_name(),
-                            'id': speaker.pk,
-                        },
-                        'message': _(
-                            'A speaker is not available at the scheduled time.'
-                        ),
-                    }
-                )
-        return warnings
+        return self.schedule.get_talk_warnings([self])[self.pk]
 
     def copy_to_schedule(self, new_schedule, save=True):
         new_slot = TalkSlot(schedule=new_schedule)
@@ -123,24 +91,26 @@ class TalkSlot(LogMixin, models.Model):
     def is_same_slot(self, other_slot):
         return self.room == other_slot.room and self.start == other_slot.start
 
-    def build_ical(self, calendar, creation_time=None, netloc=None):
+    def build_ical(self, creation_time=None, netloc=None):
+        """Return the slot as serialized iCalendar VEVENT, or an empty string
+        if it is not scheduled."""
         if not self.start or not self.end or not self.room:
-            return
+            return ''
         creation_time = creation_time or datetime.now(pytz.utc)
         netloc = netloc or urlparse(get_base_url(self.event)).netloc
-        tz = pytz.timezone(self.submission.event.timezone)
-
-        vevent = calendar.add('vevent')
-        vevent.add(
-            'summary'
-        ).value = f'{self.submission.title} - {self.submission.display_speaker_names}'
-        vevent.add('dtstamp').value = creation_time
-        vevent.add('location').value = str(self.room.name)
-        vevent.add('uid').value = 'pretalx-{}-{}@{}'.format(
-            self.submission.event.slug, self.submission.code, netloc
-        )
-
-        vevent.add('dtstart').value = self.start.astimezone(tz)
-        vevent.add('dtend').value = self.end.astimezone(tz)
-        vevent.add('description').value = self.submission.abstract or ""
-        vevent.add('url').value = self.submission.urls.public.full()
+        submission = self.submission
+        zone = submission.event.timezone
+        uid = f'pretalx-{submission.event.slug}-{submission.code}@{netloc}'
+        summary = f'{submission.title} - {submission.display_speaker_names}'
+        return ''.join((
+            'BEGIN:VEVENT\r\n',
+            fold('UID:' + ical_escape(uid)),
+            fold('DTSTART' + format_datetime(self.start, zone)),
+            fold('DTEND' + format_datetime(self.end, zone)),
+            fold('DESCRIPTION:' + ical_escape(submission.abstract or '')),
+            fold('DTSTAMP' + format_datetime(creation_time)),
+            fold('LOCATION:' + ical_escape(str(self.room.name))),
+            fold('SUMMARY:' + ical_escape(summary)),
+            fold('URL:' + ical_escape(submission.urls.public.full())),
+            'END:VEVENT\r\n',
+        ))
@@ -0,0 +1,193 @@
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+
+from pretalx.submission.models import SubmissionStates
+
+RESOLUTION = timedelta(minutes=5)
+
+
+class TimeGrid:
+    """Maps the time span of an event onto blocks of five minutes, so that sets
+    of blocks can be stored as integer bitmasks: bit ``n`` stands for the block
+    starting ``n`` resolution steps after the start of the grid."""
+
+    def __init__(self, start, end, resolution=RESOLUTION):
+        self.start = start
+        self.resolution = resolution
+        self.size = math.ceil((end - start) / resolution)
+        self.full = (1 << self.size) - 1
+
+    def _block(self, moment, round_up):
+        value = (moment - self.start) / self.resolution
+        value = math.ceil(value) if round_up else math.floor(value)
+        return min(max(value, 0), self.size)
+
+    def mask(self, start, end, inner=True):
+        """Return the blocks between start and end. In ``inner`` mode, only
+        blocks fully covered by the interval are included, otherwise all
+        blocks touched by it."""
+        first = self._block(start, round_up=inner)
+        last = self._block(end, round_up=not inner)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def moment(self, block):
+        return self.start + block * self.resolution
+
+    def length(self, minutes):
+        return max(math.ceil(timedelta(minutes=minutes) / self.resolution), 1)
+
+    @staticmethod
+    def find_run(mask, length):
+        """Return the first block starting ``length`` consecutive set blocks in
+        the mask, or None."""
+        runs = mask
+        covered = 1
+        while runs and covered < length:
+            shift = min(covered, length - covered)
+            runs &= runs >> shift
+            covered += shift
+        if not runs:
+            return None
+        return (runs & -runs).bit_length() - 1
+
+
+def place_talks(talks, rooms, speakers, track_rooms=None):
+    """Place talks into the free blocks of rooms, first come, first fit.
+
+    ``talks`` is a list of (key, length, track, speaker ids) tuples, with the
+    length counted in blocks. ``rooms`` maps room ids to bitmasks of their free
+    blocks, in order of preference, and ``speakers`` maps speaker ids to
+    bitmasks of the blocks during which they are available and not busy yet.
+    Both are updated in place.
+
+    Talks of the same track are placed in the rooms that already hold most of
+    their track, if possible. Returns a dictionary of talk key to (room id,
+    first block)."""
+    track_rooms = track_rooms if track_rooms is not None else defaultdict(Counter)
+    room_order = list(rooms)
+    shortest_misfit = {}
+    result = {}
+    for key, length, track, speaker_ids in talks:
+        available = -1
+        for speaker_id in speaker_ids:
+            available &= speakers[speaker_id]
+        candidates = room_order
+        if track is not None and track_rooms[track]:
+            candidates = sorted(room_order, key=lambda room: -track_rooms[track][room])
+        for room in candidates:
+            # Rooms only ever fill up, so a room without space for a talk has
+            # no space for longer talks either.
+            if length >= shortest_misfit.get(room, math.inf):
+                continue
+            if TimeGrid.find_run(rooms[room], length) is None:
+                shortest_misfit[room] = length
+                continue
+            block = TimeGrid.find_run(rooms[room] & available, length)
+            if block is None:
+                continue
+            mask = ((1 << length) - 1) << block
+            rooms[room] &= ~mask
+            for speaker_id in speaker_ids:
+                speakers[speaker_id] &= ~mask
+            if track is not None:
+                track_rooms[track][room] += 1
+            result[key] = (room, block)
+            break
+    return result
+
+
+def auto_schedule(schedule, user=None):
+    """Give all unscheduled talks in the schedule (usually the WIP schedule) a
+    room and a start time.
+
+    Talks are only placed where their room is available, all of their
+    speakers are available (if they have entered availabilities), and none of
+    their speakers gives another talk. Talks of the same track end up in the
+    same rooms, if possible. Returns the list of newly scheduled talks and the
+    list of talks that could not be placed."""
+    from pretalx.schedule.models import Availability
+
+    event = schedule.event
+    grid = TimeGrid(event.datetime_from, event.datetime_to)
+    rooms = {pk: 0 for pk in event.rooms.order_by('position', 'pk').values_list('pk', flat=True)}
+    speaker_availabilities = {}
+    for room_id, user_id, start, end in Availability.objects.filter(
+        event=event
+    ).values_list('room_id', 'person__user_id', 'start', 'end'):
+        mask = grid.mask(start, end)
+        if room_id in rooms:
+            rooms[room_id] |= mask
+        elif user_id:
+            speaker_availabilities[user_id] = speaker_availabilities.get(user_id, 0) | mask
+    speakers = defaultdict(lambda: grid.full)
+    speakers.update(speaker_availabilities)
+
+    talks = list(
+        schedule.talks.filter(
+            submission__state__in=[SubmissionStates.ACCEPTED, SubmissionStates.CONFIRMED]
+        )
+        .select_related('submission', 'submission__submission_type')
+        .prefetch_related('submission__speakers')
+        .order_by('pk')
+    )
+    track_rooms = defaultdict(Counter)
+    unscheduled = []
+    for talk in talks:
+        if not talk.start:
+            unscheduled.append(talk)
+            continue
+        busy = grid.mask(talk.start, talk.real_end, inner=False)
+        for speaker in talk.submission.speakers.all():
+            speakers[speaker.pk] &= ~busy
+        if talk.room_id in rooms:
+            rooms[talk.room_id] &= ~busy
+            if talk.submission.track_id:
+                track_rooms[talk.submission.track_id][talk.room_id] += 1
+
+    requests = []
+    for talk in unscheduled:
+        speaker_ids = [speaker.pk for speaker in talk.submission.speakers.all()]
+        requests.append(
+            (
+                talk.pk,
+                grid.length(talk.submission.get_duration()),
+                talk.submission.track_id,
+                speaker_ids,
+            )
+        )
+    # Place the talks with the fewest options first: talks whose speakers have
+    # limited availability, then long talks. Sorting by track keeps tracks
+    # together.
+    requests.sort(
+        key=lambda request: (
+            not any(speaker in speaker_availabilities for speaker in request[3]),
+            request[2] is None,
+            request[2] or 0,
+            -request[1],
+            request[0],
+        )
+    )
+    placements = place_talks(requests, rooms, speakers, track_rooms)
+
+    placed = []
+    with transaction.atomic():
+        for talk in unscheduled:
+            if talk.pk not in placements:
+                continue
+            room, block = placements[talk.pk]
+            talk.room_id = room
+            talk.start = grid.moment(block)
+            talk.end = talk.start + timedelta(minutes=talk.submission.get_duration())
+            talk.save(update_fields=['start', 'end', 'room', 'updated'])
+            placed.append(talk)
+        if placed:
+            schedule.log_action(
+                'pretalx.schedule.auto', person=user, orga=True,
+                data={'count': len(placed)},
+            )
+    return placed, [talk for talk in unscheduled if talk.pk not in placements]
@@ -1,6 +1,10 @@
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
+from django.utils.timezone import now
 
 from pretalx.common.signals import register_data_exporters
+from pretalx.person.models import User
+from pretalx.submission.models import Submission, SubmissionType
 
 
 @receiver(register_data_exporters, dispatch_uid="exporter_builtin_ical")
@@ -29,3 +33,44 @@ def register_json_exporter(sender, **kwargs):
     from .exporters import FrabJsonExporter
 
     return FrabJsonExporter
+
+
+def touch_unreleased_slots(**filters):
+    """The schedule editor only loads talks whose slots have changed since
+    its last request, so we mark the unreleased slots of talks as changed
+    when the talk data shown in the editor changes."""
+    from .models import TalkSlot
+
+    TalkSlot.objects.filter(schedule__version__isnull=True, **filters).update(
+        updated=now()
+    )
+
+
+@receiver(post_save, sender=Submission, dispatch_uid="touch_slots_submission")
+def touch_submission_slots(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_unreleased_slots(submission=instance)
+
+
+@receiver(post_save, sender=SubmissionType, dispatch_uid="touch_slots_submission_type")
+def touch_submission_type_slots(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_unreleased_slots(submission__submission_type=instance)
+
+
+@receiver(post_save, sender=User, dispatch_uid="touch_slots_speaker")
+def touch_speaker_slots(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and not (update_fields and update_fields <= {'last_login'}):
+        touch_unreleased_slots(submission__speakers=instance)
+
+
+@receiver(m2m_changed, sender=Submission.speakers.through, dispatch_uid="touch_slots_speakers")
+def touch_speakers_slots(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        touch_unreleased_slots(submission=instance)
+    elif pk_set:
+        touch_unreleased_slots(submission__pk__in=pk_set)
+    else:
+        touch_unreleased_slots(submission__speakers=instance)
@@ -3,6 +3,7 @@ from datetime import timedelta
 
 from dateutil.parser import parse
 from django.db import transaction
+from django.utils.timezone import now
 
 from pretalx.person.models import SpeakerProfile, User
 from pretalx.schedule.models import Room, TalkSlot
@@ -46,7 +47,7 @@ def process_frab(root, event):
             f'Could not import "{event.name}" schedule version "{schedule_version}": failed creating schedule release.'
         )
 
-    schedule.talks.update(is_visible=True)
+    schedule.talks.update(is_visible=True, updated=now())
     start = schedule.talks.order_by('start').first().start
     end = schedule.talks.order_by('-end').first().end
     event.date_from = start.date()
@@ -444,7 +444,7 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'pretalx.api.pagination.ApiPagination',
     'PAGE_SIZE': 25,
     'SEARCH_PARAM': 'q',
     'ORDERING_PARAM': 'o',
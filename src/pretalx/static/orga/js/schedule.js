@@ -29,6 +29,10 @@ var api = {
     var url = [window.location.protocol, '//', window.location.host, window.location.pathname, 'api/talks/', window.location.search].join('')
     return api.http('GET', url, null)
   },
+  fetchTalkChanges (since) {
+    var url = [window.location.protocol, '//', window.location.host, window.location.pathname, 'api/talks/?since=', encodeURIComponent(since)].join('')
+    return api.http('GET', url, null)
+  },
   fetchRooms (eventSlug) {
     const url = [window.location.protocol, '//', window.location.host, '/api/events/', eventSlug, '/rooms'].join('')
     return api.http('GET', url, null)
@@ -292,6 +296,7 @@ var app = new Vue({
       start: null,
       end: null,
       timezone: null,
+      since: null,
       search: '',
       dragController: dragController,
     }
@@ -302,6 +307,10 @@ var app = new Vue({
       this.timezone = result.timezone
       this.start = moment.tz(result.start, this.timezone)
       this.end = moment.tz(result.end, this.timezone)
+      this.since = result.now
+      if (!window.location.search) {
+        window.setInterval(this.fetchChanges, 10000)
+      }
     })
     api.fetchRooms(this.eventSlug).then((result) => {
       this.rooms = result.results
@@ -329,6 +338,27 @@ var app = new Vue({
     }
   },
   methods: {
+    fetchChanges () {
+      if (dragController.draggedTalk)
+        return
+      api.fetchTalkChanges(this.since).then((result) => {
+        this.since = result.now
+        if (!result.ids)
+          return
+        const changed = {}
+        result.results.forEach((talk) => { changed[talk.id] = talk })
+        this.talks = this.talks.filter(talk => result.ids.indexOf(talk.id) > -1)
+        this.talks.forEach((talk) => {
+          if (changed[talk.id]) {
+            Object.assign(talk, changed[talk.id])
+            delete changed[talk.id]
+          } else if (result.warnings) {
+            talk.warnings = result.warnings[talk.id] || []
+          }
+        })
+        Object.keys(changed).forEach((id) => { this.talks.push(changed[id]) })
+      })
+    },
     onMouseMove (event) {
       if (dragController.draggedTalk) {
         dragController.event = event
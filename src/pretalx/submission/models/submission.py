@@ -2,6 +2,7 @@ import re
 import string
 import uuid
 import warnings
+from collections import defaultdict
 from datetime import timedelta
 
 from django.conf import settings
@@ -497,10 +498,12 @@ class Submission(LogMixin, models.Model):
     def availabilities(self):
         from pretalx.schedule.models.availability import Availability
 
-        all_availabilities = self.event.availabilities.filter(
+        availabilitysets = defaultdict(list)
+        for availability in self.event.availabilities.filter(
             person__in=self.speaker_profiles
-        )
-        return Availability.intersection(all_availabilities)
+        ):
+            availabilitysets[availability.person_id].append(availability)
+        return Availability.intersection(*availabilitysets.values())
 
     @cached_property
     def created(self):
@@ -137,6 +137,7 @@ setup(
             'pytest-django',
             'pytest-mock',
         ],
+        'brotli': ['brotli'],
         'mysql': ['mysqlclient'],
         'postgres': ['psycopg2-binary'],
     },
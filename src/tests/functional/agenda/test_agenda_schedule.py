@@ -10,7 +10,7 @@ def test_can_see_schedule(
 ):
     del event.current_schedule
     assert user.has_perm('agenda.view_schedule', event)
-    with django_assert_num_queries(18):
+    with django_assert_num_queries(14):
         response = client.get(event.urls.schedule, follow=True)
     assert event.schedules.count() == 2
     assert response.status_code == 200
@@ -44,12 +44,46 @@ def test_schedule_page(
     client, django_assert_num_queries, event, speaker, slot, schedule, other_slot
 ):
     url = event.urls.schedule
-    with django_assert_num_queries(18):
+    with django_assert_num_queries(14):
         response = client.get(url, follow=True)
     assert response.status_code == 200
     assert slot.submission.title in response.content.decode()
 
 
+@pytest.mark.django_db
+def test_schedule_page_grid_is_cached(client, mocker, event, slot, schedule, other_slot):
+    from django.core.cache.backends.locmem import LocMemCache
+    from pretalx.agenda.views.schedule import ScheduleView
+
+    mocker.patch('pretalx.agenda.views.schedule.cache', LocMemCache('grid', {}))
+    build = mocker.spy(ScheduleView, 'build_schedule_grid')
+    response = client.get(event.urls.schedule, follow=True)
+    assert slot.submission.title in response.content.decode()
+    assert 'search-hit' not in response.content.decode()
+
+    response = client.get(
+        event.urls.schedule + '?q=' + quote(slot.submission.title), follow=True
+    )
+    content = response.content.decode()
+    assert content.count('search-hit') == 1
+    assert content.count('search-fail') == 1
+    assert build.call_count == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_schedule_page_grid_cache_sees_room_changes(client, mocker, event, slot):
+    from django.core.cache.backends.locmem import LocMemCache
+
+    mocker.patch('pretalx.agenda.views.schedule.cache', LocMemCache('grid', {}))
+    response = client.get(event.urls.schedule, follow=True)
+    assert str(slot.room.name) in response.content.decode()
+
+    slot.room.name = 'The Great Hall'
+    slot.room.save()
+    response = client.get(event.urls.schedule, follow=True)
+    assert 'The Great Hall' in response.content.decode()
+
+
 @pytest.mark.django_db
 def test_versioned_schedule_page(
     client, django_assert_num_queries, event, speaker, slot, schedule, other_slot
@@ -63,12 +97,12 @@ def test_versioned_schedule_page(
     assert slot.submission.title not in response.content.decode()
 
     url = schedule.urls.public
-    with django_assert_num_queries(13):
+    with django_assert_num_queries(9):
         response = client.get(url, follow=True)
     assert response.status_code == 200
     assert slot.submission.title in response.content.decode()
 
     url = f'/{event.slug}/schedule?version={quote(schedule.version)}'
-    with django_assert_num_queries(20):
+    with django_assert_num_queries(16):
         redirected_response = client.get(url, follow=True)
     assert redirected_response._request.path == response._request.path
@@ -1,9 +1,15 @@
+import gzip
 import json
+import zipfile
+from datetime import timedelta
 from glob import glob
+from io import BytesIO
 
 import pytest
 from django.core.management.base import CommandError
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from lxml import etree
 
@@ -14,37 +20,147 @@ from pretalx.event.models import Event
 
 @pytest.mark.django_db
 def test_schedule_frab_xml_export(
-    slot, client, django_assert_num_queries, schedule_schema
+    slot, client, django_assert_num_queries, schedule_schema, mocker
 ):
-    with django_assert_num_queries(25):
+    with django_assert_num_queries(22):
         response = client.get(
             reverse(
-                f'agenda:export.schedule.xml',
+                'agenda:export.schedule.xml',
                 kwargs={'event': slot.submission.event.slug},
             ),
             follow=True,
         )
-    assert response.status_code == 200, str(response.content.decode())
+        raw_content = b''.join(response.streaming_content)
+    assert response.status_code == 200
     assert 'ETag' in response
 
-    content = response.content.decode()
+    content = raw_content.decode()
     assert slot.submission.title in content
     assert slot.submission.urls.public.full() in content
 
     parser = etree.XMLParser(schema=schedule_schema)
     etree.fromstring(
-        response.content, parser
+        raw_content, parser
     )  # Will raise if the schedule does not match the schema
-    with django_assert_num_queries(15):
+    render = mocker.patch('pretalx.schedule.exporters.FrabXmlExporter.render')
+    response = client.get(
+        reverse(
+            'agenda:export.schedule.xml',
+            kwargs={'event': slot.submission.event.slug},
+        ),
+        HTTP_IF_NONE_MATCH=response['ETag'],
+        follow=True,
+    )
+    assert response.status_code == 304
+    assert not render.called
+
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'export',
+    }
+}
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_schedule_export_compressed_variants(slot, client, mocker):
+    url = reverse(
+        'agenda:export.schedule.json', kwargs={'event': slot.submission.event.slug}
+    )
+    content = client.get(url, follow=True).content
+    render = mocker.patch('pretalx.schedule.exporters.FrabJsonExporter.render')
+
+    response = client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate', follow=True)
+    assert response['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response['Vary']
+    assert gzip.decompress(response.content) == content
+    etag = response['ETag']
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag, follow=True)
+    assert response.status_code == 304
+
+    response = client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0', follow=True)
+    assert 'Content-Encoding' not in response
+    assert response.content == content
+    assert not render.called
+
+
+@pytest.mark.django_db
+def test_schedule_export_without_cache_is_not_compressed(slot, client, mocker):
+    compress = mocker.patch('pretalx.agenda.views.schedule.compress_export')
+    for name in ('json', 'xml'):
         response = client.get(
             reverse(
-                f'agenda:export.schedule.xml',
+                f'agenda:export.schedule.{name}',
                 kwargs={'event': slot.submission.event.slug},
             ),
-            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_ACCEPT_ENCODING='gzip',
             follow=True,
         )
-    assert response.status_code == 304
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response
+    assert not compress.called
+
+
+@pytest.mark.django_db(transaction=True)
+def test_schedule_export_cache_sees_room_and_speaker_changes(slot, client):
+    url = reverse(
+        'agenda:export.schedule.json', kwargs={'event': slot.submission.event.slug}
+    )
+    speaker = slot.submission.speakers.first()
+    with override_settings(CACHES=LOCMEM_CACHES):
+        response = client.get(url, follow=True)
+        assert str(slot.room.name) in response.content.decode()
+        etag = response['ETag']
+
+        slot.room.name = 'The Great Hall'
+        slot.room.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag, follow=True)
+        assert response.status_code == 200
+        assert 'The Great Hall' in response.content.decode()
+        etag = response['ETag']
+
+        speaker.name = 'Jane Renamed'
+        speaker.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag, follow=True)
+        assert response.status_code == 200
+        assert 'Jane Renamed' in response.content.decode()
+
+
+@pytest.mark.parametrize('header,encodings,expected', (
+    ('', ('br', 'gzip'), None),
+    ('gzip, deflate, br', ('br', 'gzip'), 'br'),
+    ('gzip, deflate', ('br', 'gzip'), 'gzip'),
+    ('br;q=0, gzip;q=0.5', ('br', 'gzip'), 'gzip'),
+    ('*', ('br', 'gzip'), 'br'),
+    ('*, br; q=0', ('br', 'gzip'), 'gzip'),
+    ('GZIP', ('gzip',), 'gzip'),
+    ('br', ('gzip',), None),
+))
+def test_schedule_export_accepted_encoding(header, encodings, expected):
+    from pretalx.common.exporter import get_accepted_encoding
+
+    assert get_accepted_encoding(header, encodings) == expected
+
+
+@pytest.mark.django_db(transaction=True)
+def test_schedule_export_etag_changes(slot, client):
+    url = reverse(
+        'agenda:export.schedule.json', kwargs={'event': slot.submission.event.slug}
+    )
+    etag = client.get(url, follow=True)['ETag']
+    assert client.get(url, follow=True)['ETag'] == etag
+
+    slot.submission.title = 'A new title'
+    slot.submission.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag, follow=True)
+    assert response.status_code == 200
+    assert 'A new title' in response.content.decode()
+    etag = response['ETag']
+
+    slot.submission.event.release_schedule('Another version')
+    assert client.get(url, follow=True)['ETag'] != etag
 
 
 @pytest.mark.django_db
@@ -54,17 +170,18 @@ def test_schedule_frab_xml_export_control_char(
     slot.submission.description = "control char: \a"
     slot.submission.save()
 
-    with django_assert_num_queries(24):
+    with django_assert_num_queries(21):
         response = client.get(
             reverse(
-                f'agenda:export.schedule.xml',
+                'agenda:export.schedule.xml',
                 kwargs={'event': slot.submission.event.slug},
             ),
             follow=True,
         )
+        raw_content = b''.join(response.streaming_content)
 
     parser = etree.XMLParser()
-    etree.fromstring(response.content, parser)
+    etree.fromstring(raw_content, parser)
 
 
 @pytest.mark.django_db
@@ -77,19 +194,19 @@ def test_schedule_frab_json_export(
     orga_user,
     schedule_schema,
 ):
-    with django_assert_num_queries(26):
+    with django_assert_num_queries(23):
         regular_response = client.get(
             reverse(
-                f'agenda:export.schedule.json',
+                'agenda:export.schedule.json',
                 kwargs={'event': slot.submission.event.slug},
             ),
             follow=True,
         )
     client.force_login(orga_user)
-    with django_assert_num_queries(23):
+    with django_assert_num_queries(19):
         orga_response = client.get(
             reverse(
-                f'agenda:export.schedule.json',
+                'agenda:export.schedule.json',
                 kwargs={'event': slot.submission.event.slug},
             ),
             follow=True,
@@ -113,37 +230,167 @@ def test_schedule_frab_json_export(
     assert regular_content != orga_content
 
 
+def _add_talks(event, room, question, indices):
+    from pretalx.person.models import SpeakerProfile, User
+    from pretalx.submission.models import Answer, Submission
+
+    for index in indices:
+        speaker = User.objects.create_user(
+            password='speakerpwd1!', name=f'Speaker {index}', email=f'{index}@speaker.org'
+        )
+        SpeakerProfile.objects.create(user=speaker, event=event, biography='Hi')
+        submission = Submission.objects.create(
+            title=f'Talk {index}', event=event, submission_type=event.cfp.default_type,
+        )
+        submission.speakers.add(speaker)
+        submission.accept()
+        Answer.objects.create(person=speaker, question=question, answer='True')
+        Answer.objects.create(submission=submission, question=question, answer='True')
+        event.wip_schedule.talks.filter(submission=submission).update(
+            room=room,
+            start=event.datetime_from + timedelta(minutes=30 * index),
+            end=event.datetime_from + timedelta(minutes=30 * index + 30),
+            is_visible=True,
+        )
+
+
+def _count_export_queries(event, room, talk_count):
+    from pretalx.schedule.exporters import FrabJsonExporter
+
+    exporter = FrabJsonExporter(Event.objects.get(pk=event.pk))
+    exporter.schedule = exporter.event.wip_schedule
+    exporter.is_orga = True
+    with CaptureQueriesContext(connection) as context:
+        content = json.loads(exporter.render()[2])
+    talks = content['schedule']['conference']['days'][0]['rooms'][str(room.name)]
+    assert len(talks) == talk_count
+    assert talks[0]['persons'][0]['biography'] == 'Hi'
+    assert talks[0]['answers']
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_schedule_frab_json_export_query_count(event, room, question):
+    # The exporter has to load everything in bulk, so it takes as many
+    # queries for one talk as for twenty.
+    _add_talks(event, room, question, range(1))
+    single_talk_queries = _count_export_queries(event, room, 1)
+    _add_talks(event, room, question, range(1, 20))
+    assert _count_export_queries(event, room, 20) == single_talk_queries
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('exporter_name', ('FrabXmlExporter', 'FrabXCalExporter'))
+def test_schedule_frab_xml_stream_matches_render(exporter_name, slot, room, question):
+    from pretalx.schedule import exporters
+
+    event = slot.submission.event
+    slot.submission.title = 'Quotes \'"<&> and \u00fcml\u00e4uts \a'
+    slot.submission.abstract = None
+    slot.submission.description = None
+    slot.submission.do_not_record = True
+    slot.submission.save()
+    _add_talks(event, room, question, range(1, 5))
+
+    event = Event.objects.get(pk=event.pk)
+    for schedule in (None, event.current_schedule, event.wip_schedule):
+        exporter = getattr(exporters, exporter_name)(event, schedule=schedule)
+        assert ''.join(exporter.render_stream()[2]) == exporter.render()[2]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('exporter_name', ('FrabXmlExporter', 'FrabXCalExporter'))
+def test_schedule_frab_xml_stream_large_schedule(exporter_name, event, room, question):
+    from pretalx.schedule import exporters
+
+    _add_talks(event, room, question, range(150))
+    event = Event.objects.get(pk=event.pk)
+    exporter = getattr(exporters, exporter_name)(event, schedule=event.wip_schedule)
+    chunks = list(exporter.render_stream()[2])
+    assert len(chunks) == len(exporter.data) + 2
+    assert ''.join(chunks) == exporter.render()[2]
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_schedule_export_stream_is_cached(slot, client, mocker):
+    from django.core.cache import cache
+    from pretalx.agenda.views.schedule import ExporterView
+    from pretalx.schedule.exporters import FrabXmlExporter
+
+    url = reverse('agenda:export.schedule.xml', kwargs={'event': slot.submission.event.slug})
+    stream = mocker.spy(FrabXmlExporter, 'render_stream')
+    content = b''.join(client.get(url, follow=True).streaming_content)
+    assert client.get(url, follow=True).content == content
+    assert stream.call_count == 1
+
+    cache.clear()
+    mocker.patch.object(ExporterView, 'max_cached_stream_size', 100)
+    assert b''.join(client.get(url, follow=True).streaming_content) == content
+    assert b''.join(client.get(url, follow=True).streaming_content) == content
+    assert stream.call_count == 3
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=LOCMEM_CACHES)
+def test_schedule_export_stream_is_cached_once(slot, client, mocker):
+    from django.core.cache import cache
+    from pretalx.schedule.exporters import FrabXmlExporter
+
+    url = reverse('agenda:export.schedule.xml', kwargs={'event': slot.submission.event.slug})
+    event = Event.objects.get(pk=slot.submission.event.pk)
+    cache_key = FrabXmlExporter(event, schedule=event.current_schedule).cache_key
+    cache.set(f'{cache_key}_streaming', True)
+    compress = mocker.patch('pretalx.agenda.views.schedule.compress_export')
+    b''.join(client.get(url, follow=True).streaming_content)
+    assert not compress.called
+
+
+@pytest.mark.django_db
+def test_schedule_export_stream_error(slot, client, mocker):
+    mocker.patch(
+        'pretalx.schedule.exporters.FrabXmlExporter.data',
+        new_callable=mocker.PropertyMock,
+        side_effect=ValueError,
+    )
+    response = client.get(
+        reverse('agenda:export.schedule.xml', kwargs={'event': slot.submission.event.slug}),
+        follow=True,
+    )
+    assert response.status_code == 404
+
+
 @pytest.mark.django_db
 def test_schedule_frab_xcal_export(
     slot, client, django_assert_num_queries, schedule_schema
 ):
-    with django_assert_num_queries(20):
+    with django_assert_num_queries(19):
         response = client.get(
             reverse(
-                f'agenda:export.schedule.xcal',
+                'agenda:export.schedule.xcal',
                 kwargs={'event': slot.submission.event.slug},
             ),
             follow=True,
         )
+        content = b''.join(response.streaming_content).decode()
     assert response.status_code == 200
 
-    content = response.content.decode()
     assert slot.submission.title in content
 
 
 @pytest.mark.django_db
 def test_schedule_ical_export(slot, client, django_assert_num_queries, schedule_schema):
-    with django_assert_num_queries(22):
+    with django_assert_num_queries(20):
         response = client.get(
             reverse(
-                f'agenda:export.schedule.ics',
+                'agenda:export.schedule.ics',
                 kwargs={'event': slot.submission.event.slug},
             ),
             follow=True,
         )
+        content = b''.join(response.streaming_content).decode()
     assert response.status_code == 200
 
-    content = response.content.decode()
     assert slot.submission.title in content
 
 
@@ -196,7 +443,7 @@ def test_schedule_speaker_ical_export(
 
 @pytest.mark.django_db
 def test_feed_view(slot, client, django_assert_num_queries, schedule_schema, schedule):
-    with django_assert_num_queries(19):
+    with django_assert_num_queries(18):
         response = client.get(slot.submission.event.urls.feed)
     assert response.status_code == 200
     assert schedule.version in response.content.decode()
@@ -232,7 +479,7 @@ def test_html_export_release(mocker, event):
 
     from django.core.management import call_command
 
-    call_command.assert_called_with('export_schedule_html', event.slug, '--zip')
+    call_command.assert_called_with('export_schedule_html', event.slug, '--incremental')
 
 
 @pytest.mark.django_db
@@ -247,6 +494,23 @@ def test_html_export_release_disabled(mocker, event):
     call_command.assert_not_called()
 
 
+@pytest.mark.django_db
+def test_schedule_export_prerender_exports(mocker, event, slot):
+    from pretalx.agenda.tasks import prerender_exports
+
+    cache = mocker.patch('pretalx.agenda.tasks.cache')
+    cache.get.return_value = None
+    prerender_exports.apply_async(kwargs={'event_id': event.id})
+
+    file_names = {call[0][1][0] for call in cache.set.call_args_list}
+    assert file_names == {'test-schedule.xml', 'test.xcal', 'test.json', 'test.ics'}
+
+    render = mocker.patch('pretalx.schedule.exporters.FrabJsonExporter.render')
+    cache.get.return_value = 'rendered'
+    prerender_exports.apply_async(kwargs={'event_id': event.id})
+    assert not render.called
+
+
 @pytest.mark.django_db
 def test_html_export_language(event, slot):
     from django.core.management import call_command
@@ -277,7 +541,7 @@ def test_schedule_export_schedule_html_task(mocker, event, slot):
 
     from django.core.management import call_command
 
-    call_command.assert_called_with('export_schedule_html', event.slug, '--zip')
+    call_command.assert_called_with('export_schedule_html', event.slug, '--incremental')
 
 
 @pytest.mark.django_db
@@ -290,7 +554,7 @@ def test_schedule_export_schedule_html_task_nozip(mocker, event, slot):
 
     from django.core.management import call_command
 
-    call_command.assert_called_with('export_schedule_html', event.slug)
+    call_command.assert_called_with('export_schedule_html', event.slug, '--incremental')
 
 
 @pytest.mark.django_db
@@ -307,22 +571,124 @@ def test_schedule_orga_trigger_export(
         )
     assert response.status_code == 200
     export_schedule_html.apply_async.assert_called_once_with(
-        kwargs={'event_id': event.id}
+        kwargs={'event_id': event.id, 'coalesce': True}
     )
 
 
+@pytest.mark.django_db
+def test_schedule_export_schedule_html_task_coalesces(mocker, event, slot):
+    import fcntl
+    import os.path
+    from pretalx.agenda.management.commands.export_schedule_html import Command
+    from pretalx.agenda.tasks import export_schedule_html
+
+    call_command = mocker.patch('django.core.management.call_command')
+    pending_path = Command.get_pending_path(event)
+    with open(pending_path, 'w'):
+        pass
+
+    with open(Command.get_lock_path(event), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        export_schedule_html(event_id=event.id, coalesce=True)
+        assert not call_command.called  # The running export starts over instead
+        assert os.path.exists(pending_path)
+
+    export_schedule_html(event_id=event.id, coalesce=True)
+    assert call_command.call_count == 1
+    assert not os.path.exists(pending_path)
+
+    export_schedule_html(event_id=event.id, coalesce=True)
+    assert call_command.call_count == 1  # Already covered by the previous run
+
+
+@pytest.mark.django_db
+def test_schedule_export_schedule_html_task_requeues_late_requests(mocker, event, slot):
+    import os.path
+    from pretalx.agenda.management.commands.export_schedule_html import Command
+    from pretalx.agenda.tasks import export_schedule_html
+
+    call_command = mocker.patch('django.core.management.call_command')
+    pending_path = Command.get_pending_path(event)
+    exists = os.path.exists
+    late_requests = []
+
+    def exists_with_late_request(path):
+        result = exists(path)
+        if path == pending_path and not late_requests:
+            # A request comes in right after the export checked for one
+            late_requests.append(path)
+            with open(pending_path, 'w'):
+                pass
+        return result
+
+    mocker.patch('pretalx.agenda.tasks.os.path.exists', exists_with_late_request)
+    export_schedule_html(event_id=event.id)
+    assert call_command.call_count == 2
+    assert not exists(pending_path)
+
+
+@pytest.mark.django_db
+def test_schedule_orga_export_status(orga_client, event, slot):
+    from django.core.management import call_command
+
+    with override_settings(COMPRESS_ENABLED=True, COMPRESS_OFFLINE=True):
+        call_command('rebuild')
+        call_command('export_schedule_html', event.slug)
+
+    response = orga_client.get(event.orga_urls.schedule_export)
+    content = response.content.decode()
+    assert response.status_code == 200
+    assert 'The current export was finished at' in content
+    for phase in ('Static files', 'Media files', 'Pages', 'Compression'):
+        assert phase in content
+    assert 'ZIP file' not in content
+
+
 @pytest.mark.django_db
 def test_schedule_orga_download_export(
     mocker, orga_client, django_assert_num_queries, event, slot
 ):
     from pretalx.agenda.tasks import export_schedule_html
 
-    export_schedule_html.apply_async(kwargs={'event_id': event.id, 'make_zip': True})
+    export_schedule_html.apply_async(kwargs={'event_id': event.id})
     with django_assert_num_queries(9):
         response = orga_client.get(
             event.orga_urls.schedule_export_download, follow=True
         )
-    assert len(b"".join(response.streaming_content)) > 1_000_000  # 1MB
+        content = b"".join(response.streaming_content)
+    assert len(content) > 1_000_000  # 1MB
+    assert int(response['Content-Length']) == len(content)
+    archive = zipfile.ZipFile(BytesIO(content))
+    assert archive.testzip() is None
+    assert f'test/test/talk/{slot.submission.code}/index.html' in archive.namelist()
+
+    response = orga_client.get(
+        event.orga_urls.schedule_export_download,
+        HTTP_RANGE='bytes=1000-1999',
+        HTTP_IF_RANGE=response['ETag'],
+    )
+    assert response.status_code == 206
+    assert response['Content-Range'] == f'bytes 1000-1999/{len(content)}'
+    assert b"".join(response.streaming_content) == content[1000:2000]
+
+    response = orga_client.get(
+        event.orga_urls.schedule_export_download,
+        HTTP_RANGE=f'bytes={len(content)}-',
+    )
+    assert response.status_code == 416
+
+
+@pytest.mark.django_db
+def test_schedule_orga_download_export_while_running(orga_client, event, slot):
+    from pretalx.agenda.management.commands.export_schedule_html import (
+        Command, ExportStatus,
+    )
+
+    export_schedule_html.apply_async(kwargs={'event_id': event.id})
+    ExportStatus.load(Command.get_status_path(event)).update(state='running')
+    response = orga_client.get(event.orga_urls.schedule_export_download, follow=True)
+    assert response.status_code == 200
+    assert 'The export is being updated right now.' in response.content.decode()
 
 
 @pytest.mark.django_db
@@ -364,9 +730,23 @@ def test_html_export_full(event, other_event, slot, canceled_talk):
         full_path = os.path.join(settings.HTMLEXPORT_ROOT, 'test', path)
         assert os.path.exists(full_path)
 
+    xml_path = os.path.join(
+        settings.HTMLEXPORT_ROOT, 'test', 'test/schedule/export/schedule.xml'
+    )
+    with open(xml_path, 'rb') as original, gzip.open(xml_path + '.gz') as compressed:
+        assert compressed.read() == original.read()
+    assert not glob(
+        os.path.join(settings.HTMLEXPORT_ROOT, 'test/**/*.gz.gz'), recursive=True
+    )
+
     for path in glob(os.path.join(settings.HTMLEXPORT_ROOT, 'test/media/*')):
         assert event.slug in path
         assert other_event.slug not in path
+    css_name = event.settings.agenda_css_file.split("/")[-1]
+    assert os.path.samefile(
+        os.path.join(settings.HTMLEXPORT_ROOT, 'test', f'media/test/{css_name}'),
+        os.path.join(settings.MEDIA_ROOT, 'test', css_name),
+    )
 
     full_path = os.path.join(settings.HTMLEXPORT_ROOT, 'test.zip')
     assert os.path.exists(full_path)
@@ -390,7 +770,7 @@ def test_html_export_full(event, other_event, slot, canceled_talk):
     assert speaker.name in speaker_html
 
     schedule_html = open(
-        os.path.join(settings.HTMLEXPORT_ROOT, 'test', f'test/schedule/index.html')
+        os.path.join(settings.HTMLEXPORT_ROOT, 'test', 'test/schedule/index.html')
     ).read()
     assert 'Contact us' in schedule_html  # locale
     assert canceled_talk.submission.title not in schedule_html
@@ -398,7 +778,7 @@ def test_html_export_full(event, other_event, slot, canceled_talk):
     schedule_json = json.load(
         open(
             os.path.join(
-                settings.HTMLEXPORT_ROOT, f'test/test/schedule/export/schedule.json'
+                settings.HTMLEXPORT_ROOT, 'test/test/schedule/export/schedule.json'
             )
         )
     )
@@ -406,7 +786,7 @@ def test_html_export_full(event, other_event, slot, canceled_talk):
 
     schedule_ics = open(
         os.path.join(
-            settings.HTMLEXPORT_ROOT, f'test/test/schedule/export/schedule.ics'
+            settings.HTMLEXPORT_ROOT, 'test/test/schedule/export/schedule.ics'
         )
     ).read()
     assert slot.submission.code in schedule_ics
@@ -414,7 +794,7 @@ def test_html_export_full(event, other_event, slot, canceled_talk):
 
     schedule_xcal = open(
         os.path.join(
-            settings.HTMLEXPORT_ROOT, f'test/test/schedule/export/schedule.xcal'
+            settings.HTMLEXPORT_ROOT, 'test/test/schedule/export/schedule.xcal'
         )
     ).read()
     assert event.slug in schedule_xcal
@@ -422,7 +802,7 @@ def test_html_export_full(event, other_event, slot, canceled_talk):
 
     schedule_xml = open(
         os.path.join(
-            settings.HTMLEXPORT_ROOT, f'test/test/schedule/export/schedule.xml'
+            settings.HTMLEXPORT_ROOT, 'test/test/schedule/export/schedule.xml'
         )
     ).read()
     assert slot.submission.title in schedule_xml
@@ -437,12 +817,89 @@ def test_html_export_full(event, other_event, slot, canceled_talk):
     assert slot.submission.title in talk_ics
 
 
+@pytest.mark.django_db
+def test_html_export_incremental(event, slot, other_slot):
+    from django.core.management import call_command
+    from django.conf import settings
+    import os.path
+
+    def talk_path(submission):
+        return os.path.join(
+            settings.HTMLEXPORT_ROOT, 'test', f'test/talk/{submission.code}/index.html'
+        )
+
+    with override_settings(COMPRESS_ENABLED=True, COMPRESS_OFFLINE=True):
+        call_command('rebuild')
+        call_command('export_schedule_html', event.slug)
+        for submission in (slot.submission, other_slot.submission):
+            with open(talk_path(submission), 'w') as page:
+                page.write('unchanged')
+        slot.submission.abstract = 'A brand new abstract'
+        slot.submission.save()
+        call_command('export_schedule_html', event.slug, '--incremental')
+
+    assert 'A brand new abstract' in open(talk_path(slot.submission)).read()
+    assert open(talk_path(other_slot.submission)).read() == 'unchanged'
+    with open(os.path.join(settings.HTMLEXPORT_ROOT, 'test.manifest.json')) as manifest:
+        assert f'test/talk/{slot.submission.code}/index.html' in json.load(manifest)
+
+    other_slot.is_visible = False
+    other_slot.save()
+    with override_settings(COMPRESS_ENABLED=True, COMPRESS_OFFLINE=True):
+        call_command('export_schedule_html', event.slug, '--incremental')
+    assert not os.path.exists(talk_path(other_slot.submission))
+    assert os.path.exists(talk_path(slot.submission))
+
+
+class SerialPool:
+    def __init__(self, processes):
+        self.processes = processes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def starmap(self, function, tasks):
+        assert len(tasks) <= self.processes
+        return [function(*task) for task in tasks]
+
+
+@pytest.mark.django_db
+def test_html_export_parallel(mocker, event, slot, other_slot):
+    from django.core.management import call_command
+    from django.conf import settings
+    import os.path
+    from pretalx.agenda.management.commands import export_schedule_html as command
+
+    mocker.patch.object(command, 'Pool', SerialPool)
+    mocker.patch.object(command, 'connections')
+    build_objects = mocker.spy(command, 'build_objects')
+    with override_settings(COMPRESS_ENABLED=True, COMPRESS_OFFLINE=True):
+        call_command('rebuild')
+        call_command('export_schedule_html', event.slug, '--jobs', '2')
+
+    views = [call[0][0] for call in build_objects.call_args_list]
+    assert views.count('pretalx.agenda.views.htmlexport.ExportTalkView') == 2
+    assert views.count('pretalx.agenda.views.htmlexport.ExportTalkICalView') == 2
+    assert 'pretalx.agenda.views.htmlexport.ExportScheduleView' not in views
+    for submission in (slot.submission, other_slot.submission):
+        assert os.path.exists(
+            os.path.join(
+                settings.HTMLEXPORT_ROOT, 'test', f'test/talk/{submission.code}/index.html'
+            )
+        )
+    with open(os.path.join(settings.HTMLEXPORT_ROOT, 'test.manifest.json')) as manifest:
+        assert f'test/talk/{other_slot.submission.code}.ics' in json.load(manifest)
+
+
 @pytest.mark.django_db
 def test_speaker_csv_export(slot, orga_client, django_assert_num_queries):
     with django_assert_num_queries(17):
         response = orga_client.get(
             reverse(
-                f'agenda:export',
+                'agenda:export',
                 kwargs={'event': slot.submission.event.slug, 'name': 'speakers.csv'},
             ),
             follow=True,
@@ -1,6 +1,10 @@
 import json
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from pretalx.submission.models import Answer
 
 
 @pytest.mark.django_db
@@ -93,6 +97,74 @@ def test_orga_can_see_all_submissions_even_nonpublic(
     assert content['results'][0]['title'] == slot.submission.title
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize('resource', ('submissions', 'speakers'))
+def test_orga_can_walk_lists_with_cursor(
+    orga_client, slot, accepted_submission, rejected_submission, submission, resource
+):
+    url = getattr(submission.event.api_urls, resource)
+    response = orga_client.get(url, follow=True)
+    expected = json.loads(response.content.decode())['results']
+
+    results = []
+    url += '?cursor=&limit=1'
+    while url:
+        response = orga_client.get(url, follow=True)
+        content = json.loads(response.content.decode())
+        assert response.status_code == 200
+        assert 'count' not in content
+        assert len(content['results']) == 1
+        results += content['results']
+        url = content['next']
+
+    assert len(results) == len(expected)
+    assert sorted(result['code'] for result in results) == sorted(
+        result['code'] for result in expected
+    )
+
+
+@pytest.mark.django_db
+def test_api_invalid_cursor(orga_client, submission):
+    response = orga_client.get(
+        submission.event.api_urls.submissions + '?cursor=invalid', follow=True
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('is_orga,resource', (
+    (True, 'submissions'),
+    (True, 'talks'),
+    (False, 'talks'),
+))
+def test_submission_list_query_count_is_constant(
+    client, orga_user, slot, other_slot, accepted_submission, rejected_submission,
+    choice_question, is_orga, resource,
+):
+    event = slot.submission.event
+    for submission in event.submissions.all():
+        answer = Answer.objects.create(submission=submission, question=choice_question)
+        answer.options.set([choice_question.options.first()])
+    if is_orga:
+        client.force_login(orga_user)
+    url = getattr(event.api_urls, resource)
+    client.get(url, follow=True)
+
+    query_counts = []
+    for limit in (1, 25):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url + f'?limit={limit}', follow=True)
+        content = json.loads(response.content.decode())
+        assert response.status_code == 200
+        assert len(content['results']) == min(limit, content['count'])
+        query_counts.append(len(queries))
+
+    assert content['count'] > 1
+    assert query_counts[0] == query_counts[1]
+    assert all(result['speakers'] for result in content['results'])
+    assert all(bool(result['answers']) == is_orga for result in content['results'])
+
+
 @pytest.mark.django_db
 def test_only_see_talks_when_a_release_exists(
     orga_client, confirmed_submission, rejected_submission, submission
@@ -207,9 +279,79 @@ def test_orga_can_see_current_schedule(orga_client, slot):
     response = orga_client.get(
         slot.submission.event.api_urls.schedules + 'latest', follow=True
     )
-    json.loads(response.content.decode())
+    content = json.loads(response.content.decode())
     assert response.status_code == 200
     assert slot.submission.title in response.content.decode()
+    assert content['changes']['action'] == 'create'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_user_can_see_compact_schedule(client, mocker, slot, other_slot, other_speaker):
+    from django.core.cache.backends.locmem import LocMemCache
+    from pretalx.api.serializers.submission import CompactScheduleSerializer
+
+    cache = LocMemCache('api', {})
+    mocker.patch('pretalx.api.views.submission.cache', cache)
+    url = slot.submission.event.api_urls.schedules + 'latest/compact/'
+    response = client.get(url, follow=True)
+    content = json.loads(response.content.decode())
+
+    assert response.status_code == 200
+    assert content['version'] == slot.schedule.version
+    assert len(content['slots']) == 2
+    talk = next(
+        talk for talk in content['slots'] if talk['submission'] == slot.submission.code
+    )
+    assert talk['room'] == slot.room.pk
+    assert talk['start'] and talk['end']
+    assert talk['speakers'] == [
+        speaker.code for speaker in slot.submission.speakers.all()
+    ]
+    assert response['ETag']
+    assert not response.has_header('Last-Modified')
+
+    mocker.patch.object(
+        CompactScheduleSerializer, 'get_slots', side_effect=Exception('Not cached')
+    )
+    response = client.get(url, follow=True)
+    assert json.loads(response.content.decode()) == content
+    response = client.get(url, follow=True, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 304
+    response = client.get(
+        url, follow=True, HTTP_IF_MODIFIED_SINCE='Wed, 20 Dec 2017 18:00:00 GMT'
+    )
+    assert response.status_code == 200
+
+    mocker.stopall()
+    slot.submission.speakers.add(other_speaker)
+    response = client.get(url, follow=True, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 200
+    content = json.loads(response.content.decode())
+    talk = next(
+        talk for talk in content['slots'] if talk['submission'] == slot.submission.code
+    )
+    assert other_speaker.code in talk['speakers']
+
+
+@pytest.mark.django_db
+def test_orga_can_see_compact_wip_schedule(orga_client, slot):
+    response = orga_client.get(
+        slot.submission.event.api_urls.schedules + 'wip/compact/', follow=True
+    )
+    content = json.loads(response.content.decode())
+
+    assert response.status_code == 200
+    assert content['version'] == 'wip'
+    assert slot.submission.code in [talk['submission'] for talk in content['slots']]
+    assert 'ETag' not in response
+
+
+@pytest.mark.django_db
+def test_user_cannot_see_compact_wip_schedule(client, slot):
+    response = client.get(
+        slot.submission.event.api_urls.schedules + 'wip/compact/', follow=True
+    )
+    assert response.status_code == 404
 
 
 @pytest.mark.django_db
@@ -1,5 +1,5 @@
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pytest
 import pytz
@@ -13,7 +13,7 @@ from pretalx.schedule.models import Availability, Schedule, TalkSlot
 @pytest.mark.usefixtures('accepted_submission')
 def test_talk_list(orga_client, event):
     response = orga_client.get(
-        reverse(f'orga:schedule.api.talks', kwargs={'event': event.slug}), follow=True
+        reverse('orga:schedule.api.talks', kwargs={'event': event.slug}), follow=True
     )
     content = json.loads(response.content.decode())
     assert response.status_code == 200
@@ -21,11 +21,176 @@ def test_talk_list(orga_client, event):
     assert content['results'][0]['title']
 
 
+@pytest.mark.django_db
+def test_talk_list_etag(orga_client, event, accepted_submission, speaker, mocker):
+    url = reverse('orga:schedule.api.talks', kwargs={'event': event.slug})
+    response = orga_client.get(url)
+    etag = response['ETag']
+    content = json.loads(response.content.decode())
+    assert content['results'][0]['url'] == accepted_submission.orga_urls.base
+
+    warnings = mocker.spy(Schedule, 'get_talk_warnings')
+    response = orga_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert not warnings.called
+
+    accepted_submission.title = 'A new title'
+    accepted_submission.save()
+    response = orga_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    etag = response['ETag']
+
+    speaker.name = 'Jane Renamed'
+    speaker.save()
+    response = orga_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert 'Jane Renamed' in response.content.decode()
+    etag = response['ETag']
+
+    Availability.objects.create(
+        event=event,
+        person=speaker.event_profile(event),
+        start=event.datetime_from,
+        end=event.datetime_to,
+    )
+    response = orga_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_talk_list_since(orga_client, event, room, accepted_submission, other_accepted_submission):
+    url = reverse('orga:schedule.api.talks', kwargs={'event': event.slug})
+    content = json.loads(orga_client.get(url).content.decode())
+    assert len(content['results']) == 2
+    since = content['now']
+
+    content = json.loads(orga_client.get(url, data={'since': since}).content.decode())
+    assert content['results'] == []
+    assert len(content['ids']) == 2
+
+    slot = event.wip_schedule.talks.get(submission=accepted_submission)
+    response = orga_client.patch(
+        reverse('orga:schedule.api.update', kwargs={'event': event.slug, 'pk': slot.pk}),
+        data=json.dumps({'room': room.pk, 'start': event.datetime_from.isoformat()}),
+    )
+    assert response.status_code == 200
+    other_accepted_submission.reject()
+
+    content = json.loads(orga_client.get(url, data={'since': since}).content.decode())
+    assert [talk['id'] for talk in content['results']] == [slot.pk]
+    assert content['results'][0]['room'] == room.pk
+    assert content['ids'] == [slot.pk]
+    assert content['warnings'][str(slot.pk)]
+
+
+@pytest.mark.django_db
+def test_talk_list_since_without_offset(orga_client, event, accepted_submission):
+    url = reverse('orga:schedule.api.talks', kwargs={'event': event.slug})
+    response = orga_client.get(url, data={'since': '2019-01-01T10:00'})
+    assert response.status_code == 200
+    content = json.loads(response.content.decode())
+    assert len(content['results']) == 1
+
+
+@pytest.mark.django_db
+def test_talk_list_since_sees_released_visibility(orga_client, event, room, confirmed_submission):
+    event.wip_schedule.talks.filter(submission=confirmed_submission).update(
+        start=event.datetime_from, room=room, is_visible=False
+    )
+    url = reverse('orga:schedule.api.talks', kwargs={'event': event.slug})
+    since = json.loads(orga_client.get(url).content.decode())['now']
+
+    schedule, _ = event.wip_schedule.freeze('v1', notify_speakers=False)
+    response = orga_client.get(url, data={'since': since, 'version': 'v1'})
+    content = json.loads(response.content.decode())
+    assert [talk['id'] for talk in content['results']] == [
+        schedule.talks.get(submission=confirmed_submission).pk
+    ]
+
+
+@pytest.mark.django_db
+def test_talk_schedule_api_batch_update(orga_client, event, room, accepted_submission, other_accepted_submission):
+    slots = list(event.wip_schedule.talks.all().order_by('pk'))
+    start = event.datetime_from
+    response = orga_client.patch(
+        reverse('orga:schedule.api.batch_update', kwargs={'event': event.slug}),
+        data=json.dumps({'talks': [
+            {'id': slots[0].pk, 'room': str(room.pk), 'start': start.isoformat()},
+            {'id': slots[1].pk, 'room': room.pk, 'start': start.isoformat()},
+        ]}),
+    )
+    assert response.status_code == 200
+    content = json.loads(response.content.decode())
+    assert sorted(talk['id'] for talk in content['results']) == [slot.pk for slot in slots]
+    for talk in content['results']:
+        assert talk['room'] == room.pk
+        assert 'room_overlap' in [warning['type'] for warning in talk['warnings']]
+    for slot in slots:
+        slot.refresh_from_db()
+        assert slot.room == room
+        assert slot.start == start
+        assert slot.end == start + timedelta(minutes=slot.submission.get_duration())
+
+    response = orga_client.patch(
+        reverse('orga:schedule.api.batch_update', kwargs={'event': event.slug}),
+        data=json.dumps({'talks': [{'id': slots[0].pk, 'room': None, 'start': None}]}),
+    )
+    content = json.loads(response.content.decode())
+    assert content['results'][0]['room'] is None
+    slots[0].refresh_from_db()
+    assert slots[0].start is None
+
+
+@pytest.mark.django_db
+def test_talk_schedule_api_batch_update_warnings(orga_client, event, room, accepted_submission, other_accepted_submission):
+    moved, other = [
+        event.wip_schedule.talks.get(submission=submission)
+        for submission in (accepted_submission, other_accepted_submission)
+    ]
+    event.wip_schedule.talks.update(room=room, start=event.datetime_from)
+    url = reverse('orga:schedule.api.batch_update', kwargs={'event': event.slug})
+
+    response = orga_client.patch(url, data=json.dumps({'talks': [
+        {'id': moved.pk, 'room': room.pk, 'start': (event.datetime_from + timedelta(days=1)).isoformat()},
+    ]}))
+    assert response.status_code == 200
+    content = json.loads(response.content.decode())
+    assert 'room_overlap' not in [warning['type'] for warning in content['results'][0]['warnings']]
+    assert 'room_overlap' not in [
+        warning['type'] for warning in content['warnings'][str(other.pk)]
+    ]
+
+    response = orga_client.patch(url, data=json.dumps({'talks': [
+        {'id': moved.pk, 'room': room.pk, 'start': event.datetime_from.isoformat()},
+    ]}))
+    content = json.loads(response.content.decode())
+    assert 'room_overlap' in [
+        warning['type'] for warning in content['warnings'][str(other.pk)]
+    ]
+
+
+@pytest.mark.django_db
+def test_talk_schedule_api_batch_update_errors(orga_client, event, accepted_submission):
+    slot = event.wip_schedule.talks.get(submission=accepted_submission)
+    url = reverse('orga:schedule.api.batch_update', kwargs={'event': event.slug})
+    response = orga_client.patch(url, data=json.dumps({'talks': [
+        {'id': slot.pk + 1000, 'room': None, 'start': None},
+    ]}))
+    assert response.status_code == 404
+    response = orga_client.patch(url, data=json.dumps({'talks': [
+        {'id': slot.pk, 'room': 1000, 'start': event.datetime_from.isoformat()},
+    ]}))
+    assert response.status_code == 400
+    slot.refresh_from_db()
+    assert slot.start is None
+
+
 @pytest.mark.django_db
 @pytest.mark.usefixtures('accepted_submission', 'slot')
 def test_talk_list_with_filter(orga_client, event, schedule):
     response = orga_client.get(
-        reverse(f'orga:schedule.api.talks', kwargs={'event': event.slug}),
+        reverse('orga:schedule.api.talks', kwargs={'event': event.slug}),
         data={'version': schedule.version},
         follow=True,
     )
@@ -42,7 +207,7 @@ def test_talk_schedule_api_update(orga_client, event, schedule, slot, room):
     assert slot.start != start
     response = orga_client.patch(
         reverse(
-            f'orga:schedule.api.update', kwargs={'event': event.slug, 'pk': slot.pk}
+            'orga:schedule.api.update', kwargs={'event': event.slug, 'pk': slot.pk}
         ),
         data=json.dumps({'room': room.pk, 'start': start.isoformat()}),
         follow=True,
@@ -63,7 +228,7 @@ def test_talk_schedule_api_update_reset(orga_client, event, schedule, slot, room
     assert slot.start
     response = orga_client.patch(
         reverse(
-            f'orga:schedule.api.update', kwargs={'event': event.slug, 'pk': slot.pk}
+            'orga:schedule.api.update', kwargs={'event': event.slug, 'pk': slot.pk}
         ),
         data=json.dumps(dict()),
         follow=True,
@@ -94,7 +259,7 @@ def test_api_availabilities(orga_client, event, room, speaker, confirmed_submiss
 
     response = orga_client.get(
         reverse(
-            f'orga:schedule.api.availabilities',
+            'orga:schedule.api.availabilities',
             kwargs={'event': event.slug, 'talkid': talk.pk, 'roomid': room.pk},
         ),
         follow=True,
@@ -216,6 +381,15 @@ def test_orga_can_toggle_schedule_visibility(orga_client, event):
     assert event.settings.show_schedule is True
 
 
+@pytest.mark.django_db
+def test_orga_can_auto_schedule(orga_client, event, room_availability, accepted_submission):
+    response = orga_client.post(event.orga_urls.auto_schedule, follow=True)
+    assert response.status_code == 200
+    slot = event.wip_schedule.talks.get(submission=accepted_submission)
+    assert slot.start
+    assert slot.room == room_availability.room
+
+
 @pytest.mark.django_db
 def test_create_room(orga_client, event, availability):
     assert event.rooms.count() == 0
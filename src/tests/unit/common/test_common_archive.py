@@ -0,0 +1,87 @@
+import gzip
+import os
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from pretalx.common.archive import ZipArchive
+
+
+@pytest.fixture
+def export_dir(tmpdir):
+    root = tmpdir.mkdir('export')
+    root.mkdir('talk').join('index.html').write('<p>Hällo</p>' * 1000)
+    root.join('talk', 'index.html.gz').write_binary(
+        gzip.compress(root.join('talk', 'index.html').read_binary())
+    )
+    root.mkdir('media').join('avatar.png').write_binary(os.urandom(100000))
+    root.join('media', 'ümlaut.txt').write('Ümlaut')
+    return tmpdir
+
+
+def test_zip_archive_is_valid(export_dir):
+    archive = ZipArchive(str(export_dir), 'export')
+    content = b''.join(archive.iter_range())
+
+    assert len(content) == archive.size
+    result = zipfile.ZipFile(BytesIO(content))
+    assert result.testzip() is None
+    assert sorted(result.namelist()) == [
+        'export/media/avatar.png',
+        'export/media/ümlaut.txt',
+        'export/talk/index.html',
+        'export/talk/index.html.gz',
+    ]
+    for name in result.namelist():
+        assert result.read(name) == export_dir.join(name).read_binary()
+    assert result.getinfo('export/talk/index.html').compress_type == zipfile.ZIP_DEFLATED
+    assert result.getinfo('export/media/avatar.png').compress_type == zipfile.ZIP_STORED
+
+
+def test_zip_archive_ignores_outdated_gzip_files(export_dir):
+    export_dir.join('export', 'talk', 'index.html').write('<p>Changed</p>')
+    os.utime(str(export_dir.join('export', 'talk', 'index.html.gz')), (0, 0))
+    archive = ZipArchive(str(export_dir), 'export')
+    result = zipfile.ZipFile(BytesIO(b''.join(archive.iter_range())))
+
+    assert result.read('export/talk/index.html') == b'<p>Changed</p>'
+    assert result.getinfo('export/talk/index.html').compress_type == zipfile.ZIP_STORED
+
+
+@pytest.mark.parametrize('start,stop', ((0, 10), (10, 200), (500, 150000), (150000, None)))
+def test_zip_archive_ranges(export_dir, start, stop):
+    archive = ZipArchive(str(export_dir), 'export')
+    content = b''.join(archive.iter_range())
+
+    assert b''.join(archive.iter_range(start, stop)) == content[start:stop]
+
+
+def test_zip_archive_missing_directory(tmpdir):
+    with pytest.raises(FileNotFoundError):
+        ZipArchive(str(tmpdir), 'export')
+
+
+def test_zip_archive_write_keeps_unchanged_entries(export_dir):
+    path = str(export_dir.join('export.zip'))
+    archive = ZipArchive(str(export_dir), 'export')
+    assert archive.write(path) == archive.size
+    assert ZipArchive(str(export_dir), 'export').write(path) < 1000
+
+    # Only the entries from the changed file on are written again
+    export_dir.join('export', 'media', 'ümlaut.txt').write('Ümlaut, changed')
+    archive = ZipArchive(str(export_dir), 'export')
+    assert archive.write(path) < archive.size - 100000
+    with open(path, 'rb') as content:
+        assert content.read() == b''.join(archive.iter_range())
+    result = zipfile.ZipFile(path)
+    assert result.testzip() is None
+    assert result.read('export/media/ümlaut.txt') == 'Ümlaut, changed'.encode()
+
+
+def test_zip_archive_write_replaces_other_files(export_dir):
+    path = export_dir.join('export.zip')
+    path.write_binary(b'Not a zip file' * 100000)
+    archive = ZipArchive(str(export_dir), 'export')
+    assert archive.write(str(path)) == archive.size
+    assert path.read_binary() == b''.join(archive.iter_range())
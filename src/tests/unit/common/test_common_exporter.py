@@ -1,6 +1,6 @@
 import pytest
 
-from pretalx.common.exporter import BaseExporter
+from pretalx.common.exporter import BaseExporter, get_exporters
 
 
 def test_common_base_exporter_raises_proper_exceptions():
@@ -17,3 +17,18 @@ def test_common_base_exporter_raises_proper_exceptions():
         exporter.render()
     with pytest.raises(NotImplementedError):
         str(exporter)
+
+
+@pytest.mark.django_db
+def test_common_get_exporters_is_cached_per_plugins(event, mocker):
+    from pretalx.common.signals import register_data_exporters
+
+    send = mocker.spy(register_data_exporters, 'send')
+    exporters = get_exporters(event)
+    assert exporters['schedule.xml'].__name__ == 'FrabXmlExporter'
+    assert get_exporters(event) is exporters
+    assert send.call_count == 1
+
+    event.plugins = 'tests'
+    assert get_exporters(event) == exporters
+    assert send.call_count == 2
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+import vobject
+
+from pretalx.common.ical import build_calendar, escape, fold, format_datetime
+
+VALUES = (
+    'A talk',
+    'Commas, semicolons; and \\ backslashes',
+    'Line\nbreaks\r\nof all\rkinds',
+    'A very long title, which is much longer than a single line of a calendar file can be. ' * 3,
+    'Ümläüts and other nön-ASCII chäracters in a title that needs to be folded 🎉 ' * 2,
+)
+ZONES = ('UTC', 'Europe/Berlin', 'America/New_York', 'Asia/Kolkata', 'Africa/Abidjan')
+
+
+def _vobject_event(event):
+    vevent = vobject.newFromBehavior('vevent')
+    for key, value in event.items():
+        vevent.add(key).value = value
+    return vevent
+
+
+def _vobject_calendar(events):
+    calendar = vobject.iCalendar()
+    calendar.add('prodid').value = '-//pretalx//example.org//'
+    for event in events:
+        calendar.add(_vobject_event(event))
+    return calendar.serialize()
+
+
+def _native_calendar(events, zone):
+    return ''.join(
+        build_calendar(
+            prodid='-//pretalx//example.org//',
+            events=(
+                ''.join((
+                    'BEGIN:VEVENT\r\n',
+                    fold('UID:' + escape(event['uid'])),
+                    fold('DTSTART' + format_datetime(event['dtstart'], zone)),
+                    fold('DTEND' + format_datetime(event['dtend'], zone)),
+                    fold('DESCRIPTION:' + escape(event['description'])),
+                    fold('DTSTAMP' + format_datetime(event['dtstamp'])),
+                    fold('SUMMARY:' + escape(event['summary'])),
+                    'END:VEVENT\r\n',
+                ))
+                for event in events
+            ),
+            zone=zone,
+        )
+    )
+
+
+def _events(count, zone):
+    tz = pytz.timezone(zone)
+    start = pytz.utc.localize(datetime(2019, 3, 30, 9))
+    return [
+        {
+            'uid': f'pretalx-test-{index}@example.org',
+            'dtstart': (start + timedelta(minutes=30 * index)).astimezone(tz),
+            'dtend': (start + timedelta(minutes=30 * index + 25)).astimezone(tz),
+            'description': VALUES[index % len(VALUES)],
+            'dtstamp': datetime(2019, 1, 1, 12, tzinfo=pytz.utc),
+            'summary': VALUES[-index % len(VALUES)],
+        }
+        for index in range(count)
+    ]
+
+
+@pytest.mark.parametrize('value', VALUES)
+def test_ical_text_matches_vobject(value):
+    serialized = _vobject_event({'uid': 'a', 'summary': value}).serialize()
+    assert fold('SUMMARY:' + escape(value)) in serialized
+    assert all(len(line.encode()) <= 75 for line in fold(value * 2).split('\r\n'))
+
+
+@pytest.mark.parametrize('zone', ZONES)
+def test_ical_datetime_matches_vobject(zone):
+    value = pytz.utc.localize(datetime(2019, 7, 1, 23, 45))
+    serialized = _vobject_event(
+        {'uid': 'a', 'dtstart': value.astimezone(pytz.timezone(zone))}
+    ).serialize()
+    assert 'DTSTART' + format_datetime(value, zone) + '\r\n' in serialized
+
+
+@pytest.mark.parametrize('zone', ZONES)
+@pytest.mark.parametrize('count', (0, 1, 10))
+def test_ical_calendar_matches_vobject(zone, count):
+    events = _events(count, zone)
+    assert _native_calendar(events, zone) == _vobject_calendar(events)
+
+
+def test_ical_calendar_many_events():
+    # A calendar with a thousand talks, which is about what a large
+    # conference has to offer.
+    events = _events(1000, 'Europe/Berlin')
+    assert _native_calendar(events, 'Europe/Berlin') == _vobject_calendar(events)
@@ -1,11 +1,15 @@
 from datetime import timedelta
 
 import pytest
+from django.contrib.auth.models import update_last_login
 from django.core import mail as djmail
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 
 from pretalx.common.models.log import ActivityLog
 from pretalx.event.services import periodic_event_services, task_periodic_event_services
+from pretalx.submission.models import Answer
 
 
 @pytest.mark.django_db
@@ -99,3 +103,68 @@ def test_periodic_event_services(event):
 @pytest.mark.django_db
 def test_periodic_event_fail():
     task_periodic_event_services('lololol')
+
+
+def get_export_version(event):
+    return event.__class__.objects.get(pk=event.pk).export_version
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_cache_ignores_login(slot):
+    event = slot.submission.event
+    speaker = slot.submission.speakers.first()
+    version = get_export_version(event)
+    update_last_login(None, speaker)
+    assert get_export_version(event) == version
+    speaker.name = 'Jane Renamed'
+    speaker.save()
+    assert get_export_version(event) != version
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_cache_ignores_unreleased_submissions(slot, submission):
+    version = get_export_version(submission.event)
+    submission.title = 'Not on the schedule yet'
+    submission.save()
+    assert get_export_version(submission.event) == version
+    slot.submission.title = 'On the schedule'
+    slot.submission.save()
+    assert get_export_version(submission.event) != version
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_cache_ignores_answers_to_private_questions(slot, question):
+    event = slot.submission.event
+    version = get_export_version(event)
+    answer = Answer.objects.create(answer='11', submission=slot.submission, question=question)
+    assert get_export_version(event) == version
+    question.is_public = True
+    question.save()
+    assert get_export_version(event) != version
+    version = get_export_version(event)
+    answer.answer = '12'
+    answer.save()
+    assert get_export_version(event) != version
+    version = get_export_version(event)
+    question.is_public = False
+    question.save()
+    assert get_export_version(event) != version
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_cache_invalidated_once_per_transaction(slot):
+    event = slot.submission.event
+    version = get_export_version(event)
+    with CaptureQueriesContext(connection) as context:
+        with transaction.atomic():
+            slot.room.name = 'The Great Hall'
+            slot.room.save()
+            slot.submission.title = 'Renamed'
+            slot.submission.save()
+            assert get_export_version(event) == version
+    assert get_export_version(event) != version
+    updates = [
+        query['sql'] for query in context.captured_queries
+        if query['sql'].startswith('UPDATE "event_event"')
+    ]
+    assert len(updates) == 1
@@ -1,6 +1,7 @@
 import pytest
 
 from pretalx.event.models import Event
+from pretalx.schedule.models import Schedule
 
 
 @pytest.mark.django_db
@@ -8,3 +9,12 @@ def test_shred_used_event(resource, answered_choice_question, personal_answer, r
     assert Event.objects.count() == 2
     rejected_submission.event.organiser.shred()
     assert Event.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_shred_event_with_compacted_schedule(event, slot, other_event):
+    event.settings.compact_schedule_versions = True
+    event.wip_schedule.freeze('v2', notify_speakers=False)
+    assert Schedule.objects.filter(event=event, delta_base__isnull=False).exists()
+    event.shred()
+    assert list(Event.objects.all()) == [other_event]
@@ -0,0 +1,150 @@
+import datetime
+import random
+from collections import Counter
+
+import pytest
+import pytz
+
+from pretalx.schedule.models import Availability
+from pretalx.schedule.services import TimeGrid, auto_schedule, place_talks
+
+START = datetime.datetime(2020, 1, 1, 9, tzinfo=pytz.utc)
+
+
+def minutes(value):
+    return START + datetime.timedelta(minutes=value)
+
+
+@pytest.mark.parametrize('start,end,inner,expected', (
+    (0, 60, True, 0b111111111111),
+    (0, 7, True, 0b1),
+    (0, 7, False, 0b11),
+    (3, 12, True, 0b10),
+    (3, 12, False, 0b111),
+    (-30, 10, True, 0b11),
+    (100, 100, True, 0),
+    (20, 10, True, 0),
+))
+def test_time_grid_mask(start, end, inner, expected):
+    grid = TimeGrid(START, minutes(60))
+    assert grid.mask(minutes(start), minutes(end), inner=inner) == expected
+
+
+@pytest.mark.parametrize('mask,length,expected', (
+    (0, 1, None),
+    (0b1, 1, 0),
+    (0b1000, 1, 3),
+    (0b1011, 2, 0),
+    (0b1101, 2, 2),
+    (0b111011, 3, 3),
+    (0b111011, 4, None),
+    ((1 << 300) - 1 << 20, 288, 20),
+))
+def test_time_grid_find_run(mask, length, expected):
+    assert TimeGrid.find_run(mask, length) == expected
+
+
+def test_place_talks_respects_rooms_and_speakers():
+    rooms = {1: 0b11111111, 2: 0b11110000}
+    speakers = {'a': 0b11111111, 'b': 0b11110000}
+    result = place_talks(
+        [
+            ('one', 4, None, ['a']),
+            ('two', 4, None, ['b']),
+            ('three', 4, None, ['a']),
+            ('four', 2, None, ['a', 'b']),
+        ],
+        rooms,
+        speakers,
+    )
+    assert result == {'one': (1, 0), 'two': (1, 4), 'three': (2, 4)}
+    assert rooms == {1: 0, 2: 0}
+
+
+def test_place_talks_clusters_tracks():
+    rooms = {1: 0b1111, 2: 0b1111}
+    speakers = {'a': 0b1111, 'b': 0b1111}
+    result = place_talks(
+        [
+            ('one', 2, 7, ['a']),
+            ('two', 2, None, ['b']),
+            ('three', 2, 7, ['b']),
+        ],
+        rooms,
+        speakers,
+        track_rooms={7: Counter({2: 1})},
+    )
+    assert result == {'one': (2, 0), 'two': (1, 0), 'three': (2, 2)}
+
+
+@pytest.mark.parametrize('count', (1000, 5000))
+def test_place_talks_large_inputs(count):
+    # A four day event with rooms open for ten hours each
+    # day, filled with talks of 30 and 60 minutes to about three quarters.
+    generator = random.Random(count)
+    day = ((1 << 120) - 1) << 108
+    rooms = {room: sum(day << (288 * i) for i in range(4)) for room in range(count // 40)}
+    speakers = {speaker: (1 << 4 * 288) - 1 for speaker in range(count // 2)}
+    talks = [
+        (
+            key,
+            generator.choice((6, 12)),
+            generator.choice((None, 1, 2, 3)),
+            generator.sample(range(count // 2), generator.choice((1, 1, 2))),
+        )
+        for key in range(count)
+    ]
+
+    free_rooms = dict(rooms)
+    free_speakers = dict(speakers)
+    result = place_talks(talks, rooms, speakers)
+
+    assert len(result) > count * 0.9
+    # Every talk is placed in free blocks of its room and of its speakers,
+    # and no two talks share a block of a room or a speaker.
+    for key, length, _, speaker_ids in talks:
+        if key not in result:
+            continue
+        room, block = result[key]
+        mask = ((1 << length) - 1) << block
+        assert free_rooms[room] & mask == mask
+        free_rooms[room] &= ~mask
+        for speaker_id in speaker_ids:
+            assert free_speakers[speaker_id] & mask == mask
+            free_speakers[speaker_id] &= ~mask
+    assert free_rooms == rooms
+    assert free_speakers == speakers
+
+
+@pytest.mark.django_db
+def test_auto_schedule(event, room, other_room, accepted_submission, other_accepted_submission):
+    for current in (room, other_room):
+        Availability.objects.create(
+            event=event,
+            room=current,
+            start=event.datetime_from,
+            end=event.datetime_from + datetime.timedelta(hours=4),
+        )
+    placed, unplaced = auto_schedule(event.wip_schedule)
+
+    assert len(placed) == 2
+    assert not unplaced
+    talks = list(event.wip_schedule.talks.filter(start__isnull=False))
+    assert len(talks) == 2
+    for talk in talks:
+        assert talk.room in (room, other_room)
+        assert talk.end - talk.start == datetime.timedelta(
+            minutes=talk.submission.get_duration()
+        )
+    assert event.wip_schedule.logged_actions().filter(
+        action_type='pretalx.schedule.auto'
+    ).exists()
+
+
+@pytest.mark.django_db
+def test_auto_schedule_without_room_availability(event, room, accepted_submission):
+    placed, unplaced = auto_schedule(event.wip_schedule)
+
+    assert not placed
+    assert [talk.submission for talk in unplaced] == [accepted_submission]
+    assert not event.wip_schedule.talks.filter(start__isnull=False).exists()
@@ -0,0 +1,69 @@
+import pytest
+
+from pretalx.schedule.intervals import IntervalSet
+
+
+@pytest.mark.parametrize('intervals,expected', (
+    ([], []),
+    ([(1, 3)], [(1, 3)]),
+    ([(5, 7), (1, 3)], [(1, 3), (5, 7)]),
+    ([(1, 3), (3, 5)], [(1, 5)]),
+    ([(1, 5), (2, 3)], [(1, 5)]),
+    ([(4, 8), (1, 3), (2, 5)], [(1, 8)]),
+))
+def test_interval_set_merges(intervals, expected):
+    assert list(IntervalSet(intervals)) == expected
+
+
+@pytest.mark.parametrize('one,two,union,intersection,difference', (
+    ([], [], [], [], []),
+    ([(1, 3)], [], [(1, 3)], [], [(1, 3)]),
+    ([], [(1, 3)], [(1, 3)], [], []),
+    ([(1, 3)], [(3, 5)], [(1, 5)], [], [(1, 3)]),
+    ([(1, 5)], [(2, 3)], [(1, 5)], [(2, 3)], [(1, 2), (3, 5)]),
+    ([(2, 3)], [(1, 5)], [(1, 5)], [(2, 3)], []),
+    (
+        [(2, 7), (10, 12), (14, 19)],
+        [(0, 3), (6, 8), (13, 15)],
+        [(0, 8), (10, 12), (13, 19)],
+        [(2, 3), (6, 7), (14, 15)],
+        [(3, 6), (10, 12), (15, 19)],
+    ),
+    ([(0, 10)], [(1, 2), (4, 5), (8, 12)], [(0, 12)], [(1, 2), (4, 5), (8, 10)], [(0, 1), (2, 4), (5, 8)]),
+))
+def test_interval_set_operations(one, two, union, intersection, difference):
+    one, two = IntervalSet(one), IntervalSet(two)
+    assert list(one | two) == union
+    assert list(one & two) == intersection
+    assert list(two & one) == intersection
+    assert list(one - two) == difference
+
+
+@pytest.mark.parametrize('start,end,expected', (
+    (0, 1, False),
+    (1, 3, True),
+    (1, 4, False),
+    (2, 3, True),
+    (5, 6, True),
+    (5, 9, True),
+    (4, 9, False),
+    (9, 10, False),
+))
+def test_interval_set_contains(start, end, expected):
+    assert IntervalSet([(1, 3), (5, 9)]).contains(start, end) is expected
+
+
+def test_interval_set_large_inputs():
+    # These operations are linear, so 10k intervals are no problem. The
+    # pairwise approach took minutes.
+    one = IntervalSet((i * 10, i * 10 + 6) for i in range(10000))
+    two = IntervalSet((i * 10 + 4, i * 10 + 8) for i in range(10000))
+
+    union = one | two
+    intersection = one & two
+    difference = one - two
+
+    assert len(union) == len(intersection) == len(difference) == 10000
+    assert list(union) == [(i * 10, i * 10 + 8) for i in range(10000)]
+    assert list(intersection) == [(i * 10 + 4, i * 10 + 6) for i in range(10000)]
+    assert list(difference) == [(i * 10, i * 10 + 4) for i in range(10000)]
@@ -1,3 +1,4 @@
+import json
 from datetime import timedelta
 
 import pytest
@@ -6,7 +7,7 @@ from django.utils.timezone import now
 
 from pretalx.mail.models import QueuedMail
 from pretalx.schedule.models import Schedule, TalkSlot
-from pretalx.submission.models import Submission
+from pretalx.submission.models import Submission, SubmissionStates
 
 
 @pytest.mark.django_db
@@ -212,3 +213,167 @@ def test_schedule_changes(event, slot, room, accepted_submission):
     schedule, _ = event.wip_schedule.freeze('test4')
     assert schedule.changes['count'] == 1
     assert len(schedule.changes['canceled_talks']) == 1
+
+
+@pytest.mark.parametrize('moved_count', [1, 10, 50])
+@pytest.mark.django_db
+def test_schedule_changes_query_count(
+    event, room, other_room, speaker, submission_type, django_assert_num_queries, moved_count
+):
+    start = now().replace(microsecond=0)
+    for index in range(moved_count):
+        submission = Submission.objects.create(
+            title=f'Talk {index}', event=event, submission_type=submission_type,
+            state=SubmissionStates.CONFIRMED,
+        )
+        submission.speakers.add(speaker)
+        TalkSlot.objects.create(
+            submission=submission, schedule=event.wip_schedule, room=room,
+            start=start + timedelta(hours=index), end=start + timedelta(hours=index, minutes=30),
+            is_visible=True,
+        )
+    event.wip_schedule.freeze('v1', notify_speakers=False)
+    for slot in event.wip_schedule.talks.all():
+        slot.room = other_room
+        slot.save()
+    schedule, _ = event.wip_schedule.freeze('v2', notify_speakers=False)
+    schedule = Schedule.objects.get(pk=schedule.pk)
+
+    with django_assert_num_queries(6):
+        changes = schedule._compute_changes()
+    assert changes['count'] == moved_count
+    assert len(changes['moved_talks']) == moved_count
+    assert changes['moved_talks'][0]['old_room'] == room.name
+    assert changes['moved_talks'][0]['new_room'] == other_room.name
+    assert [talk['submission'].title for talk in changes['moved_talks']] == [
+        f'Talk {index}' for index in range(moved_count)
+    ]
+
+    with django_assert_num_queries(2):
+        stored_changes = schedule.changes
+    assert stored_changes['count'] == moved_count
+
+
+@pytest.mark.django_db
+def test_freeze_stores_changes(event, slot, room):
+    current_slot = slot.submission.slots.get(schedule=event.wip_schedule)
+    current_slot.start += timedelta(hours=1)
+    current_slot.save()
+    schedule, _ = event.wip_schedule.freeze('test', notify_speakers=False)
+    computed = schedule._compute_changes()
+    assert schedule.changes_data
+
+    stored = Schedule.objects.get(pk=schedule.pk).changes
+    assert stored['count'] == computed['count'] == 1
+    assert stored['action'] == computed['action']
+    assert stored['moved_talks'][0]['submission'] == slot.submission
+    for key in ('old_start', 'new_start', 'old_room', 'new_room'):
+        assert stored['moved_talks'][0][key] == computed['moved_talks'][0][key]
+
+
+@pytest.mark.django_db
+def test_backfill_schedule_changes(event, slot):
+    from django.core.management import call_command
+
+    schedule, _ = event.wip_schedule.freeze('test', notify_speakers=False)
+    Schedule.objects.update(changes_data=None)
+    call_command('backfill_schedule_changes', event=event.slug)
+    assert not Schedule.objects.filter(version__isnull=False, changes_data__isnull=True).exists()
+    assert Schedule.objects.get(pk=schedule.pk).changes['action'] == 'update'
+
+
+def _schedule_snapshot(client, schedule):
+    from pretalx.schedule.exporters import FrabJsonExporter, FrabXmlExporter
+
+    schedule = Schedule.objects.get(pk=schedule.pk)
+    api_content = json.loads(client.get(
+        schedule.event.api_urls.schedules + schedule.version, follow=True
+    ).content.decode())
+    for submission in api_content['slots']:
+        # The slot attribute always refers to the current schedule version
+        submission.pop('slot')
+    return {
+        'talks': sorted(
+            (slot.submission_id, slot.room_id, slot.start, slot.end)
+            for slot in schedule.scheduled_talks
+        ),
+        'json': FrabJsonExporter(schedule.event, schedule).render()[2],
+        'xml': FrabXmlExporter(schedule.event, schedule).render()[2],
+        'api': api_content,
+    }
+
+
+@pytest.mark.parametrize('compact', (True, False))
+@pytest.mark.django_db
+def test_compacted_schedule_versions(
+    event, room, other_room, speaker, submission_type, orga_client, compact
+):
+    event.settings.compact_schedule_versions = compact
+    start = event.datetime_from.replace(hour=10)
+    slots = {}
+    for index, name in enumerate('ABCD'):
+        submission = Submission.objects.create(
+            title=f'Talk {name}', event=event, submission_type=submission_type,
+            state=SubmissionStates.CONFIRMED,
+        )
+        submission.speakers.add(speaker)
+        slots[name] = TalkSlot.objects.create(
+            submission=submission, schedule=event.wip_schedule,
+            room=None if name == 'D' else (room if index < 2 else other_room),
+            start=start + timedelta(hours=index), end=start + timedelta(hours=index, minutes=30),
+            is_visible=True,
+        )
+
+    def release(version):
+        schedule, _ = event.wip_schedule.freeze(version, notify_speakers=False)
+        event.refresh_from_db()
+        return schedule, _schedule_snapshot(orga_client, schedule)
+
+    versions = [release('v1')]
+    slot = event.wip_schedule.talks.get(submission=slots['B'].submission)
+    slot.room = other_room
+    slot.start += timedelta(hours=2)
+    slot.save()
+    submission = Submission.objects.create(
+        title='Talk E', event=event, submission_type=submission_type,
+        state=SubmissionStates.CONFIRMED,
+    )
+    TalkSlot.objects.create(
+        submission=submission, schedule=event.wip_schedule, room=room,
+        start=start, end=start + timedelta(minutes=30), is_visible=True,
+    )
+    versions.append(release('v2'))
+    event.wip_schedule.talks.filter(submission=slots['A'].submission).update(room=None, start=None, end=None)
+    versions.append(release('v3'))
+    versions.append(release('v4'))
+
+    for schedule, snapshot in versions:
+        schedule = Schedule.objects.get(pk=schedule.pk)
+        assert bool(schedule.delta_base) == (compact and schedule.version != 'v4')
+        assert _schedule_snapshot(orga_client, schedule) == snapshot
+    v1 = Schedule.objects.get(pk=versions[0][0].pk)
+    if compact:
+        assert v1.talks.count() < v1.resolved_talks.count() == 4
+    else:
+        assert v1.talks.count() == 4
+
+    v1.unfreeze()
+    wip_talks = event.wip_schedule.talks.all()
+    assert len(wip_talks) == 5
+    assert wip_talks.get(submission=slots['A'].submission).room == room
+
+    if compact:
+        # The slots are resolved in the database instead of being passed in
+        # one by one, so the query does not grow with the schedule.
+        params = v1.resolved_talks.query.sql_with_params()[1]
+        submission = Submission.objects.create(
+            title='Talk F', event=event, submission_type=submission_type,
+            state=SubmissionStates.CONFIRMED,
+        )
+        for __ in range(10):
+            TalkSlot.objects.create(
+                submission=submission, schedule=versions[-1][0], is_visible=True
+            )
+        resolved_talks = Schedule.objects.get(pk=v1.pk).resolved_talks
+        assert resolved_talks.count() == 14
+        assert len(resolved_talks.query.sql_with_params()[1]) == len(params)
\ No newline at end of file
@@ -4,6 +4,7 @@ import pytest
 from django.utils.timezone import now
 
 from pretalx.schedule.models import TalkSlot
+from pretalx.submission.models import Submission
 
 
 @pytest.mark.django_db
@@ -32,3 +33,148 @@ def test_slot_duration(submission, start, end, duration):
 def test_slot_string(slot, room):
     str(slot)
     str(room)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('zone', ('UTC', 'Europe/Berlin'))
+def test_slot_build_ical_matches_vobject(slot, zone):
+    import pytz
+    import vobject
+
+    submission = slot.submission
+    submission.abstract = 'An abstract, with; special\ncharacters'
+    submission.event.timezone = zone
+    creation_time = now()
+    tz = pytz.timezone(zone)
+
+    vevent = vobject.newFromBehavior('vevent')
+    vevent.add('summary').value = f'{submission.title} - {submission.display_speaker_names}'
+    vevent.add('dtstamp').value = creation_time
+    vevent.add('location').value = str(slot.room.name)
+    vevent.add('uid').value = f'pretalx-{submission.event.slug}-{submission.code}@example.org'
+    vevent.add('dtstart').value = slot.start.astimezone(tz)
+    vevent.add('dtend').value = slot.end.astimezone(tz)
+    vevent.add('description').value = submission.abstract
+    vevent.add('url').value = submission.urls.public.full()
+
+    assert slot.build_ical(creation_time=creation_time, netloc='example.org') == vevent.serialize()
+    slot.room = None
+    assert slot.build_ical() == ''
+
+
+@pytest.mark.django_db
+def test_slot_warnings(slot, room, speaker):
+    from pretalx.schedule.models import Availability
+
+    warnings = slot.warnings
+    assert [warning['type'] for warning in warnings] == ['room']
+
+    Availability.objects.create(
+        event=slot.event, room=room,
+        start=slot.start - timedelta(hours=1), end=slot.start + timedelta(minutes=30),
+    )
+    Availability.objects.create(
+        event=slot.event, room=room,
+        start=slot.start - timedelta(minutes=30), end=slot.real_end + timedelta(hours=1),
+    )
+    Availability.objects.create(
+        event=slot.event, person=speaker.event_profile(slot.event),
+        start=slot.real_end, end=slot.real_end + timedelta(hours=1),
+    )
+    slot = TalkSlot.objects.get(pk=slot.pk)
+    warnings = slot.warnings
+    assert [warning['type'] for warning in warnings] == ['speaker']
+    assert warnings[0]['speaker'] == {'name': speaker.get_display_name(), 'id': speaker.pk}
+
+
+@pytest.mark.django_db
+def test_schedule_talk_warnings_query_count(slot, other_slot, django_assert_num_queries):
+    talks = list(
+        slot.schedule.talks.select_related('submission', 'room').prefetch_related(
+            'submission__speakers'
+        )
+    )
+    with django_assert_num_queries(2):
+        result = slot.schedule.get_talk_warnings(talks)
+    assert set(result) == {slot.pk, other_slot.pk}
+    assert all(talk.warnings == result[talk.pk] for talk in talks)
+
+
+@pytest.mark.django_db
+def test_schedule_overlap_warnings(slot, other_slot, other_room, speaker):
+    schedule = slot.schedule
+    warnings = schedule.get_overlap_warnings()
+    assert [w['type'] for w in warnings[slot.pk]] == ['room_overlap']
+    assert warnings[slot.pk][0]['talk']['id'] == other_slot.pk
+    assert warnings[other_slot.pk][0]['talk']['id'] == slot.pk
+
+    other_slot.submission.speakers.add(speaker)
+    other_slot.room = other_room
+    other_slot.save()
+    warnings = schedule.get_overlap_warnings()
+    assert [w['type'] for w in warnings[slot.pk]] == ['speaker_overlap']
+    assert warnings[slot.pk][0]['speaker'] == {'name': speaker.get_display_name(), 'id': speaker.pk}
+    assert 'speaker_overlap' in [w['type'] for w in TalkSlot.objects.get(pk=other_slot.pk).warnings]
+
+    other_slot.start = slot.real_end
+    other_slot.end = slot.real_end + timedelta(minutes=30)
+    other_slot.save()
+    assert not schedule.get_overlap_warnings()
+
+
+@pytest.mark.django_db
+def test_schedule_overlap_warnings_restricted(slot, other_slot, other_room, speaker, other_speaker):
+    schedule = slot.schedule
+    warnings = schedule.get_overlap_warnings(room_ids={other_room.pk}, speaker_ids=set())
+    assert not warnings
+
+    warnings = schedule.get_overlap_warnings(room_ids={slot.room_id}, speaker_ids=set())
+    assert set(warnings) == {slot.pk, other_slot.pk}
+
+    other_slot.submission.speakers.add(speaker)
+    other_slot.room = other_room
+    other_slot.save()
+    warnings = schedule.get_overlap_warnings(
+        room_ids={other_room.pk}, speaker_ids={other_speaker.pk}
+    )
+    assert not warnings
+    warnings = schedule.get_overlap_warnings(room_ids=set(), speaker_ids={speaker.pk})
+    assert [w['type'] for w in warnings[other_slot.pk]] == ['speaker_overlap']
+
+
+@pytest.mark.django_db
+def test_schedule_overlap_warnings_large_schedule(event, room, other_room, speaker, django_assert_num_queries):
+    # 3000 talks in two rooms, where every room slot is shared by
+    # two talks, and one speaker gives a talk every few hours without clashes.
+    schedule = event.wip_schedule
+    Submission.objects.bulk_create(
+        Submission(
+            event=event, title=f'Talk {i}', code=f'T{i:05d}',
+            submission_type=event.cfp.default_type, state='confirmed',
+        )
+        for i in range(3000)
+    )
+    submissions = list(event.submissions.order_by('code'))
+    Submission.speakers.through.objects.bulk_create(
+        Submission.speakers.through(submission=submission, user=speaker)
+        for submission in submissions[::100]
+    )
+    start = now()
+    TalkSlot.objects.bulk_create(
+        TalkSlot(
+            submission=submission, schedule=schedule,
+            room=(room, other_room)[i % 2],
+            start=start + timedelta(minutes=30 * (i // 4)),
+            end=start + timedelta(minutes=30 * (i // 4) + 30),
+        )
+        for i, submission in enumerate(submissions)
+    )
+
+    with django_assert_num_queries(1):
+        warnings = schedule.get_overlap_warnings()
+
+    assert len(warnings) == 3000
+    assert all(
+        [w['type'] for w in talk_warnings] == ['room_overlap']
+        for talk_warnings in warnings.values()
+    )
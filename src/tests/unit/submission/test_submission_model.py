@@ -260,3 +260,24 @@ def test_submission_change_slot_count(accepted_submission):
     accepted_submission.save()
     accepted_submission.accept()
     assert accepted_submission.slots.filter(schedule=accepted_submission.event.wip_schedule).count() == 1
+
+
+@pytest.mark.django_db
+def test_submission_availabilities_intersect_speakers(submission, speaker, other_speaker):
+    import datetime
+
+    import pytz
+
+    from pretalx.schedule.models import Availability
+
+    submission.speakers.add(other_speaker)
+    day = datetime.datetime(2017, 1, 1, tzinfo=pytz.utc)
+    for user, hours in ((speaker, (1, 5)), (other_speaker, (3, 8))):
+        Availability.objects.create(
+            event=submission.event, person=user.event_profile(submission.event),
+            start=day.replace(hour=hours[0]), end=day.replace(hour=hours[1]),
+        )
+    availabilities = submission.availabilities
+    assert len(availabilities) == 1
+    assert availabilities[0].start == day.replace(hour=3)
+    assert availabilities[0].end == day.replace(hour=5)